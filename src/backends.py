@@ -0,0 +1,898 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+解压后端注册表 - 每种压缩格式可以有多个解压实现
+功能：按文件名判断压缩格式，按配置偏好、基准测试速度或默认优先级为每种格式选择可用的解压后端（标准库、py7zr、外部bsdtar等）
+"""
+
+import io
+import os
+import re
+import json
+import time
+import shutil
+import tarfile
+import zipfile
+import tempfile
+import importlib
+import threading
+import subprocess
+from contextlib import contextmanager
+
+from volumes import ConcatenatedFile, split_volume_parts
+
+# 文件名后缀 -> 压缩格式（长后缀在前）
+FORMAT_SUFFIXES = (
+    ('.tar.gz', 'tar'), ('.tgz', 'tar'), ('.tar.bz2', 'tar'), ('.tbz2', 'tar'),
+    ('.tar.xz', 'tar'), ('.txz', 'tar'), ('.tar', 'tar'), ('.tar.zst', 'zstd'), ('.tzst', 'zstd'),
+    ('.zip', 'zip'), ('.rar', 'rar'), ('.7z', '7z'), ('.666z', '7z'),
+)
+
+# py7zr每次解码最多输出的字节数（py7zr.properties.get_memory_limit 的上限）
+PY7ZR_CHUNK_SIZE = 128 * 1024 * 1024
+# 无法从属性中得到字典大小的解码器按该内存估计（bzip2、deflate等）
+DEFAULT_CODER_MEMORY = 8 * 1024 * 1024
+# 验证密码时最多解码的字节数：密码错误时解密出的数据在开头就无法解码，不需要解码整个成员
+VERIFY_PREFIX_SIZE = 1024 * 1024
+
+# 某种格式没有可用后端时的提示
+MISSING_BACKEND_HINTS = {
+    'rar': "RAR文件支持不可用，请安装rarfile库",
+    '7z': "7z文件支持不可用，请安装py7zr库",
+    'zstd': "zstd压缩的TAR需要外部bsdtar（libarchive）",
+}
+
+
+def archive_format(file_path):
+    """根据文件名判断压缩格式：zip / tar / rar / 7z / zstd，无法识别时返回None
+
+    按字节切分的分卷按去掉序号后的文件名判断（name.zip.001 -> zip，name.001 -> 7z）。
+    按文件头识别见 signatures.FormatSniffer。
+    """
+    lower_name = os.path.basename(file_path).lower()
+    if lower_name.endswith('.001'):
+        return archive_format(lower_name[:-4]) or '7z'
+    for suffix, fmt in FORMAT_SUFFIXES:
+        if lower_name.endswith(suffix):
+            return fmt
+    return None
+
+
+def make_py7zr_callback(report):
+    """创建py7zr的解压回调，把每次回报的解压字节数交给 report(字节数)
+
+    py7zr在自己的线程中调用回调；py7zr未安装时返回None。
+    """
+    try:
+        from py7zr.callbacks import ExtractCallback
+    except ImportError:
+        return None
+
+    class ByteCallback(ExtractCallback):
+        def report_start_preparation(self):
+            pass
+
+        def report_start(self, processing_file_path, processing_bytes):
+            pass
+
+        def report_update(self, decompressed_bytes):
+            report(int(decompressed_bytes))
+
+        def report_end(self, processing_file_path, wrote_bytes):
+            pass
+
+        def report_warning(self, message):
+            pass
+
+        def report_postprocess(self):
+            pass
+
+    return ByteCallback()
+
+
+def first_stream_member(members, describe):
+    """返回按压缩包顺序第一个有数据的文件成员（即第一个数据块的第一个成员），没有时返回None
+
+    describe(成员) 返回 (是否目录, 解压后大小)；空文件没有数据流，无法用来验证密码。
+    """
+    for member in members:
+        is_dir, size = describe(member)
+        if not is_dir and size:
+            return member
+    return None
+
+
+class PrefixDecoded(Exception):
+    """验证密码时已正确解码了足够长的前缀（用于提前结束py7zr的解码）"""
+
+
+class BoundedNullWriter:
+    """py7zr的输出对象：丢弃解码出的数据，累计达到 limit 字节时抛出 PrefixDecoded"""
+
+    def __init__(self, factory):
+        self.factory = factory
+        self.written = 0
+
+    def write(self, data):
+        self.written += len(data)
+        self.factory.written += len(data)
+        if self.written >= self.factory.limit:
+            raise PrefixDecoded()
+        return len(data)
+
+    def read(self, size=None):
+        return b""
+
+    def seek(self, offset, whence=0):
+        return 0
+
+    def flush(self):
+        pass
+
+    def size(self):
+        return self.written
+
+    def close(self):
+        pass
+
+
+class BoundedNullWriterFactory:
+    """为每个成员创建 BoundedNullWriter（py7zr的 WriterFactory 接口），written 为全部成员的解码字节数"""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.written = 0
+
+    def create(self, filename):
+        return BoundedNullWriter(self)
+
+
+class BackendUnavailableError(ValueError):
+    """某种格式没有可用的解压后端"""
+
+
+class ExtractorBackend:
+    """解压后端基类
+
+    extract 把压缩包解压到目录；engine 提供选择性解压和流式解压的规则
+    （is_wanted_member / extract_archive_members）。支持密码的后端还需要实现
+    needs_password 和 verify_password。
+    """
+
+    name = ""
+    formats = ()
+    priority = 0  # 没有基准测试结果时的默认顺序（越大越优先）
+    supports_password = False
+    supports_volumes = False  # 能否从第一个分卷解压整个分卷组
+    # 单独验证密码和完整解压一样慢时为True：排在第一的候选密码直接完整解压，密码错误时解压很快失败
+    extract_to_verify = False
+
+    def is_available(self):
+        return True
+
+    def extract(self, engine, archive_path, extract_dir, depth=0, password=None):
+        raise NotImplementedError
+
+    def needs_password(self, archive_path):
+        raise NotImplementedError
+
+    def verify_password(self, archive_path, password):
+        """验证密码，正确返回None，错误返回异常"""
+        raise NotImplementedError
+
+    def is_wrong_password(self, error):
+        """extract() 抛出的异常是否表示密码错误"""
+        return False
+
+    def list_member_sizes(self, archive_path):
+        """不解压地列出文件成员 [(名称, 解压后大小)]，无法列出时返回None"""
+        return None
+
+    def estimate_memory(self, archive_path, password=None):
+        """估算在本进程中解压需要的内存（字节），无法估算或不占用本进程内存时返回None"""
+        return None
+
+    def startup_overhead(self):
+        """每次解压固定的启动耗时（秒），基准测试时从解压耗时中扣除"""
+        return 0.0
+
+
+class LibraryBackend(ExtractorBackend):
+    """基于Python库的后端，库在第一次使用时才导入"""
+
+    module_name = ""
+
+    def __init__(self):
+        self._module = None
+
+    def is_available(self):
+        try:
+            self.module
+            return True
+        except ImportError:
+            return False
+
+    @property
+    def module(self):
+        if self._module is None:
+            self._module = importlib.import_module(self.module_name)
+        return self._module
+
+    def open(self, source, password=None):
+        """打开压缩包，source 为路径或文件对象"""
+        raise NotImplementedError
+
+    @contextmanager
+    def open_archive(self, archive_path, password=None):
+        """打开压缩包；按字节切分的分卷（.001/.002...）通过拼接文件对象顺序读取"""
+        parts = split_volume_parts(archive_path) if self.supports_volumes else None
+        if parts is None:
+            with self.open(archive_path, password) as archive:
+                yield archive
+        else:
+            with ConcatenatedFile(parts) as source, self.open(source, password) as archive:
+                yield archive
+
+    def extract(self, engine, archive_path, extract_dir, depth=0, password=None):
+        with self.open_archive(archive_path, password) as archive:
+            engine.extract_archive_members(archive, extract_dir, depth)
+
+
+class ZipfileBackend(LibraryBackend):
+    name = "zipfile"
+    formats = ('zip',)
+    priority = 50
+    supports_volumes = True
+    module_name = "zipfile"
+
+    def open(self, source, password=None):
+        return zipfile.ZipFile(source, 'r')
+
+    def list_member_sizes(self, archive_path):
+        try:
+            with self.open_archive(archive_path) as archive:
+                return [(info.filename, info.file_size) for info in archive.infolist() if not info.is_dir()]
+        except Exception:
+            return None
+
+
+class TarfileBackend(LibraryBackend):
+    name = "tarfile"
+    formats = ('tar',)
+    priority = 50
+    supports_volumes = True
+    module_name = "tarfile"
+
+    def open(self, source, password=None):
+        if isinstance(source, (str, os.PathLike)):
+            return tarfile.open(source, 'r:*')
+        return tarfile.open(fileobj=source, mode='r:*')
+
+
+class RarfileBackend(LibraryBackend):
+    name = "rarfile"
+    formats = ('rar',)
+    priority = 50
+    supports_volumes = True  # .partN.rar 由rarfile自动读取后续分卷
+    module_name = "rarfile"
+
+    def open_archive(self, archive_path, password=None):
+        # RAR多卷压缩包由rarfile自己读取后续分卷
+        return self.open(archive_path, password)
+
+    def open(self, source, password=None):
+        archive = self.module.RarFile(source)
+        if password:
+            archive.setpassword(password)
+        return archive
+
+    def list_member_sizes(self, archive_path):
+        try:
+            with self.open_archive(archive_path) as archive:
+                return [(info.filename, info.file_size) for info in archive.infolist() if not info.is_dir()]
+        except Exception:
+            return None
+
+
+class Py7zrBackend(LibraryBackend):
+    name = "py7zr"
+    formats = ('7z',)
+    priority = 50
+    supports_password = True
+    supports_volumes = True
+    module_name = "py7zr"
+
+    def open(self, source, password=None):
+        return self.module.SevenZipFile(source, mode="r", password=password or None)
+
+    def extract(self, engine, archive_path, extract_dir, depth=0, password=None):
+        """有内存上限时通过文件对象打开并占用估算的解码内存
+
+        py7zr打开路径时为每个数据块启动一个解码线程（最多CPU核数个），每个线程一次最多输出128MB；
+        传入文件对象时按顺序逐个解码，内存占用只有一个数据块的字典和输出块。
+        """
+        budget = engine.memory_budget
+        if not budget.limited:
+            return super().extract(engine, archive_path, extract_dir, depth, password)
+        parts = split_volume_parts(archive_path)
+        source = ConcatenatedFile(parts) if parts is not None else open(archive_path, 'rb')
+        with source, self.open(source, password) as archive:
+            with budget.reserve(self.decoder_memory(archive)):
+                engine.extract_archive_members(archive, extract_dir, depth)
+
+    @staticmethod
+    def coder_memory(coder):
+        """按解码器属性估算字典占用的内存：LZMA2属性为1字节的字典大小编码，LZMA为5字节（后4字节是字典大小）"""
+        method = coder.get('method')
+        properties = coder.get('properties') or b''
+        if method == b'\x21' and len(properties) >= 1:
+            bits = properties[0]
+            return 0xFFFFFFFF if bits > 40 else (2 | (bits & 1)) << (bits // 2 + 11)
+        if method == b'\x03\x01\x01' and len(properties) >= 5:
+            return int.from_bytes(properties[1:5], 'little')
+        return DEFAULT_CODER_MEMORY
+
+    @classmethod
+    def decoder_memory(cls, archive):
+        """顺序解码时一个数据块需要的最大内存：各解码器的字典 + 一次解码输出的块"""
+        try:
+            folders = archive.header.main_streams.unpackinfo.folders
+        except AttributeError:
+            return PY7ZR_CHUNK_SIZE
+        estimate = 0
+        for folder in folders:
+            output = min(PY7ZR_CHUNK_SIZE, max(folder.unpacksizes or [0]))
+            # 字典缓冲区按页占用内存，实际占用不超过数据块解压后的大小
+            dictionaries = sum(min(cls.coder_memory(coder), max(folder.unpacksizes or [0]) or DEFAULT_CODER_MEMORY)
+                               for coder in folder.coders)
+            estimate = max(estimate, dictionaries + output)
+        return estimate or PY7ZR_CHUNK_SIZE
+
+    def estimate_memory(self, archive_path, password=None):
+        try:
+            with self.open_archive(archive_path, password) as archive:
+                return self.decoder_memory(archive)
+        except Exception:
+            # 文件头已加密时没有密码无法读取数据块信息
+            return None
+
+    def list_member_sizes(self, archive_path):
+        try:
+            with self.open_archive(archive_path) as archive:
+                return [(info.filename, info.uncompressed or 0) for info in archive.list() if not info.is_directory]
+        except Exception:
+            # 文件头已加密时没有密码无法列出
+            return None
+
+    def needs_password(self, archive_path):
+        try:
+            with self.open_archive(archive_path) as archive:
+                return archive.needs_password()
+        except Exception:
+            # 文件头已加密，打开时就需要密码
+            return True
+
+    def headers_encrypted(self, archive_path):
+        """文件头是否已加密（没有密码时无法打开）"""
+        try:
+            with self.open_archive(archive_path):
+                return False
+        except Exception:
+            return True
+
+    def verify_password(self, archive_path, password):
+        """解码第一个数据块的第一个成员的开头来验证密码，解码出的数据直接丢弃
+
+        加密文件头的压缩包用同一个密码加密文件头，能打开并列出文件就说明密码正确，不再解码成员。
+        否则只解码第一个成员（固实压缩包中后面的成员要先解码它前面的全部数据）的前
+        VERIFY_PREFIX_SIZE 字节：密码错误时解密出的数据在开头就会解码失败；成员比这更小时
+        完整解码并检查CRC。不写任何文件，也不会把大文件完整解码一遍。
+        """
+        try:
+            if self.headers_encrypted(archive_path):
+                with self.open_archive(archive_path, password) as archive:
+                    archive.list()
+                return None
+            with self.open_archive(archive_path, password) as archive:
+                first = first_stream_member(archive.list(), lambda info: (info.is_directory, info.uncompressed))
+                if first is not None:
+                    archive.extract(targets=[first.filename], factory=BoundedNullWriterFactory(VERIFY_PREFIX_SIZE))
+            return None
+        except PrefixDecoded:
+            return None
+        except Exception as e:
+            return e
+
+
+class ToolBackend(ExtractorBackend):
+    """调用外部命令行工具的后端"""
+
+    executables = ()
+    noop_args = ('--version',)  # 只启动工具、不做任何工作的参数，用来测量进程启动耗时
+
+    def __init__(self):
+        self._executable = None
+
+    def is_available(self):
+        return self.executable is not None
+
+    @property
+    def executable(self):
+        if self._executable is None:
+            for name in self.executables:
+                path = shutil.which(name)
+                if path:
+                    self._executable = path
+                    break
+        return self._executable
+
+    def process_options(self):
+        """启动工具进程的选项（Windows上不弹出控制台窗口）"""
+        if os.name != 'posix' and hasattr(subprocess, 'CREATE_NO_WINDOW'):
+            return {'creationflags': subprocess.CREATE_NO_WINDOW}
+        return {}
+
+    def startup_overhead(self):
+        """启动一次工具、不解压任何内容的耗时（取3次中的最小值）"""
+        elapsed = []
+        for attempt in range(3):
+            start = time.perf_counter()
+            try:
+                subprocess.run([self.executable] + list(self.noop_args), stdin=subprocess.DEVNULL,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, **self.process_options())
+            except OSError:
+                return 0.0
+            elapsed.append(time.perf_counter() - start)
+        return min(elapsed)
+
+    def run_tool(self, args, **kwargs):
+        """运行工具，失败时抛出带有错误输出的异常"""
+        result = subprocess.run([self.executable] + args, stdout=subprocess.PIPE, stderr=subprocess.PIPE, **kwargs)
+        if result.returncode != 0:
+            message = result.stderr.decode('utf-8', 'replace').strip() or f"退出码 {result.returncode}"
+            raise RuntimeError(f"{self.name} 解压失败: {message}")
+        return result.stdout
+
+
+class BsdtarBackend(ToolBackend):
+    """libarchive的bsdtar，支持zip/tar/rar/7z和zstd压缩的TAR（不支持加密压缩包）"""
+
+    name = "bsdtar"
+    formats = ('zip', 'tar', 'rar', '7z', 'zstd')
+    priority = 40
+    executables = ('bsdtar',)
+
+    def extract(self, engine, archive_path, extract_dir, depth=0, password=None):
+        os.makedirs(extract_dir, exist_ok=True)
+        try:
+            self.extract_members(engine, archive_path, extract_dir)
+        finally:
+            # bsdtar不输出进度，解压结束后按写出的文件大小回报
+            extracted_bytes = directory_size(extract_dir)
+            engine.expect_bytes(extracted_bytes)
+            engine.report_bytes(extracted_bytes)
+
+    def extract_members(self, engine, archive_path, extract_dir):
+        if not engine.config.selective_extract:
+            self.run_tool(['-xf', archive_path, '-C', extract_dir])
+            return
+
+        # 选择性解压：先列出成员，只解压需要的文件
+        names = self.run_tool(['-tf', archive_path]).decode('utf-8', 'surrogateescape').splitlines()
+        wanted = [name for name in names if name and not name.endswith('/') and engine.is_wanted_member(name)]
+        skipped_count = len([name for name in names if name and not name.endswith('/')]) - len(wanted)
+        if wanted:
+            with tempfile.NamedTemporaryFile('w', suffix='.lst', delete=False, encoding='utf-8',
+                                             errors='surrogateescape') as list_file:
+                list_file.write('\n'.join(wanted) + '\n')
+            try:
+                self.run_tool(['-xf', archive_path, '-C', extract_dir, '-T', list_file.name])
+            finally:
+                os.remove(list_file.name)
+        if skipped_count:
+            engine.log_message(f"选择性解压: 跳过 {skipped_count} 个无关文件")
+
+
+class SevenZipToolError(RuntimeError):
+    """外部7z命令失败，exit_code 为7z的退出码"""
+
+    def __init__(self, exit_code, reason, output=""):
+        super().__init__(f"{reason}（7z退出码 {exit_code}）" + (f": {output}" if output else ""))
+        self.exit_code = exit_code
+        self.reason = reason
+
+
+class SevenZipToolBackend(ToolBackend):
+    """本地安装的7-Zip命令行（7z/7za/7zz），多线程解压大型7z压缩包
+
+    密码通过标准输入传给7z，不出现在命令行参数中（其他用户用ps看不到）；
+    在POSIX系统上以新会话启动，7z没有控制终端，只能从标准输入读取密码。
+    解压进度（-bsp1）按文件列表中的总大小换算为字节数，实时回报给 engine.report_bytes。
+    """
+
+    name = "7z"
+    formats = ('7z', 'zip', 'rar')
+    priority = 60
+    supports_password = True
+    supports_volumes = True  # 7z从 .001 或 .part1.rar 自动读取后续分卷
+    extract_to_verify = True  # 7z t 要完整解码被测试的成员，与 7z x 的代价相同
+    executables = ('7z', '7za', '7zz')
+    noop_args = ()  # 不带参数时只输出用法
+
+    # 7z退出码 -> 失败原因
+    EXIT_CODE_REASONS = {
+        1: "警告：部分文件无法处理",
+        2: "致命错误：密码错误或文件损坏",
+        7: "命令行参数错误",
+        8: "内存不足",
+        255: "用户中止",
+    }
+    WRONG_PASSWORD_MARKERS = ("Wrong password", "Can not open encrypted archive")
+    PROGRESS_PATTERN = re.compile(rb'(\d{1,3})%')
+
+    @property
+    def executable(self):
+        if self._executable is None:
+            super().executable
+        if self._executable is None and os.name == 'nt':
+            # Windows默认安装路径
+            default_path = os.path.join(os.environ.get('ProgramFiles', r'C:\Program Files'), '7-Zip', '7z.exe')
+            if os.path.isfile(default_path):
+                self._executable = default_path
+        return self._executable
+
+    def run_7z(self, args, password=None, on_progress=None):
+        """运行7z命令，返回输出文本；失败时抛出 SevenZipToolError
+
+        password 为None时不提供密码，7z需要密码时读到空输入直接失败，不会等待输入。
+        """
+        popen_options = self.process_options()
+        if os.name == 'posix':
+            popen_options['start_new_session'] = True
+
+        process = subprocess.Popen([self.executable] + args, stdin=subprocess.PIPE,
+                                   stdout=subprocess.PIPE, stderr=subprocess.STDOUT, **popen_options)
+        try:
+            if password is not None:
+                process.stdin.write(password.encode('utf-8') + b'\n')
+            process.stdin.close()
+        except OSError:
+            pass
+
+        # 逐块读取输出，进度行使用退格符刷新，按百分比解析
+        output = bytearray()
+        last_percent = None
+        for chunk in iter(lambda: process.stdout.read1(4096), b''):
+            output.extend(chunk)
+            if on_progress is not None:
+                matches = self.PROGRESS_PATTERN.findall(chunk)
+                if matches:
+                    percent = min(100, int(matches[-1]))
+                    if percent != last_percent:
+                        last_percent = percent
+                        on_progress(percent)
+        exit_code = process.wait()
+
+        text = output.decode('utf-8', 'replace')
+        if exit_code not in (0, 1):
+            self.raise_for_exit_code(exit_code, text)
+        return exit_code, text
+
+    def raise_for_exit_code(self, exit_code, text):
+        """把7z的退出码和错误输出转换为失败原因"""
+        if any(marker in text for marker in self.WRONG_PASSWORD_MARKERS):
+            reason = "密码错误"
+        else:
+            reason = self.EXIT_CODE_REASONS.get(exit_code, "未知错误")
+        errors = [line.strip() for line in text.splitlines() if line.strip().startswith(('ERROR', 'Error'))]
+        raise SevenZipToolError(exit_code, reason, " ".join(errors[-3:]))
+
+    def list_members(self, archive_path, password=None):
+        """列出压缩包成员，返回 [(名称, 大小, 是否目录, 是否加密)]"""
+        _, text = self.run_7z(['l', '-slt', '-sccUTF-8', '--', archive_path], password)
+        members = []
+        entry = {}
+        in_members = False
+        for line in text.splitlines() + ['']:
+            if line.startswith('----------'):
+                in_members = True
+                continue
+            if not in_members:
+                continue
+            if not line.strip():
+                if 'Path' in entry:
+                    is_dir = entry.get('Folder') == '+' or entry.get('Attributes', '').startswith('D')
+                    members.append((entry['Path'], int(entry.get('Size') or 0), is_dir, entry.get('Encrypted') == '+'))
+                entry = {}
+                continue
+            key, sep, value = line.partition(' = ')
+            if sep:
+                entry[key.strip()] = value
+        return members
+
+    def list_member_sizes(self, archive_path):
+        try:
+            return [(name, size) for name, size, is_dir, _ in self.list_members(archive_path) if not is_dir]
+        except SevenZipToolError:
+            return None
+
+    def needs_password(self, archive_path):
+        try:
+            members = self.list_members(archive_path)
+        except SevenZipToolError:
+            # 文件头已加密，列出文件时就需要密码
+            return True
+        return any(encrypted for _, _, _, encrypted in members)
+
+    def is_wrong_password(self, error):
+        return isinstance(error, SevenZipToolError) and error.reason == "密码错误"
+
+    def verify_password(self, archive_path, password):
+        """列出文件并测试第一个数据块的第一个成员来验证密码（原因见 Py7zrBackend.verify_password）"""
+        try:
+            first = first_stream_member(self.list_members(archive_path, password),
+                                        lambda member: (member[2], member[1]))
+            if first is not None:
+                self.run_7z(['t', '-y', '-sccUTF-8', '--', archive_path, first[0]], password)
+            return None
+        except Exception as e:
+            return e
+
+    def extract(self, engine, archive_path, extract_dir, depth=0, password=None):
+        os.makedirs(extract_dir, exist_ok=True)
+        args = ['x', '-y', '-mmt', '-bsp1', '-bb0', '-sccUTF-8', '-o' + extract_dir]
+        list_path = None
+        files = [member for member in self.list_members(archive_path, password) if not member[2]]
+        if engine.config.selective_extract:
+            # 选择性解压：只把需要的成员写入列表文件
+            wanted = [member for member in files if engine.is_wanted_member(member[0])]
+            total_bytes = sum(member[1] for member in wanted)
+            skipped_count = len(files) - len(wanted)
+            if skipped_count:
+                engine.log_message(f"选择性解压: 跳过 {skipped_count} 个无关文件")
+            if not wanted:
+                return
+            with tempfile.NamedTemporaryFile('w', suffix='.lst', delete=False, encoding='utf-8') as list_file:
+                list_file.write('\n'.join(member[0] for member in wanted) + '\n')
+            list_path = list_file.name
+            args += ['-scsUTF-8', '-i@' + list_path]
+        else:
+            total_bytes = sum(size for _, size, _, _ in files)
+        engine.expect_bytes(total_bytes)
+
+        reported = [0]
+
+        def on_progress(percent):
+            done = total_bytes * percent // 100
+            engine.report_bytes(done - reported[0])
+            reported[0] = done
+
+        try:
+            exit_code, text = self.run_7z(args + ['--', archive_path], password, on_progress)
+        finally:
+            if list_path:
+                os.remove(list_path)
+        if exit_code == 1:
+            engine.log_message(f"7z解压完成但有警告: {os.path.basename(archive_path)}")
+
+
+def directory_size(directory):
+    """目录中所有文件的总大小"""
+    total = 0
+    for root, _, files in os.walk(directory):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+# 默认注册的后端，新增后端调用 register_backend 即可
+BACKEND_CLASSES = [ZipfileBackend, TarfileBackend, RarfileBackend, Py7zrBackend, BsdtarBackend,
+                   SevenZipToolBackend]
+
+
+def register_backend(backend_class):
+    """注册新的解压后端（可作为类装饰器使用）"""
+    if backend_class not in BACKEND_CLASSES:
+        BACKEND_CLASSES.append(backend_class)
+    return backend_class
+
+
+# 基准测试样本的文件名后缀
+BENCHMARK_SUFFIXES = {'zip': '.zip', 'tar': '.tar.gz', '7z': '.7z'}
+# 基准测试结果文件的格式版本；以前的版本记录的是包含进程启动的耗时，读到时重新测试
+BENCHMARK_CACHE_VERSION = 2
+
+
+def create_benchmark_sample(fmt, directory, size=4 * 1024 * 1024):
+    """生成用于基准测试的小压缩包（一半随机数据、一半可压缩数据），无法生成时返回None"""
+    random_part = os.urandom(size // 2)
+    repeated_part = b"0123456789abcdef" * (size // 32)
+    path = os.path.join(directory, "benchmark" + BENCHMARK_SUFFIXES.get(fmt, ''))
+    if fmt == 'zip':
+        with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as archive:
+            archive.writestr('random.mp4', random_part)
+            archive.writestr('repeated.mp4', repeated_part)
+    elif fmt == 'tar':
+        with tarfile.open(path, 'w:gz') as archive:
+            for name, data in (('random.mp4', random_part), ('repeated.mp4', repeated_part)):
+                info = tarfile.TarInfo(name)
+                info.size = len(data)
+                archive.addfile(info, io.BytesIO(data))
+    elif fmt == '7z':
+        try:
+            py7zr = importlib.import_module('py7zr')
+        except ImportError:
+            return None
+        with py7zr.SevenZipFile(path, 'w') as archive:
+            archive.writestr(random_part, 'random.mp4')
+            archive.writestr(repeated_part, 'repeated.mp4')
+    else:
+        return None
+    return path
+
+
+class BackendRegistry:
+    """为每种压缩格式选择解压后端
+
+    选择顺序：配置的偏好后端（按给定顺序）-> 基准测试最快的后端 -> 默认优先级。
+    后端在第一次需要时才创建和检查可用性；基准测试结果保存在 cache_path 中，
+    同一组可用后端只测试一次。基准测试不持有注册表的锁：同一格式的其他调用等待
+    测试结果，其他格式和已经选好后端的调用不受影响。外部工具的耗时扣除进程启动
+    耗时，比较的是解压本身的速度。
+    """
+
+    def __init__(self, preferences=None, benchmark=True, cache_path=None, backend_classes=None, log=None):
+        self.preferences = {fmt: list(names) for fmt, names in (preferences or {}).items()}
+        self.benchmark = benchmark
+        self.cache_path = cache_path
+        self.backend_classes = list(BACKEND_CLASSES if backend_classes is None else backend_classes)
+        self._log = log
+        self._lock = threading.Lock()
+        self._format_locks = {}  # 格式 -> 该格式选择后端（和基准测试）的锁
+        self._backends = {}  # 名称 -> 已创建的后端
+        self._order = {}  # (格式, 是否需要密码, 是否需要分卷) -> 排好序的后端列表
+        self._timings = self._load_timings()
+
+    def _load_timings(self):
+        if not self.cache_path:
+            return {}
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if not isinstance(data, dict) or data.get('version') != BENCHMARK_CACHE_VERSION:
+            return {}
+        timings = data.get('timings')
+        return timings if isinstance(timings, dict) else {}
+
+    def _save_timings(self):
+        if not self.cache_path:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.cache_path) or '.', exist_ok=True)
+            temp_path = self.cache_path + '.tmp'
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump({'version': BENCHMARK_CACHE_VERSION, 'timings': self._timings}, f,
+                          ensure_ascii=False, indent=2)
+            os.replace(temp_path, self.cache_path)
+        except OSError:
+            pass
+
+    def log_message(self, message):
+        if self._log is not None:
+            self._log(message)
+
+    def get(self, name):
+        """按名称获取后端实例（延迟创建）"""
+        with self._lock:
+            return self._get(name)
+
+    def _get(self, name):
+        if name not in self._backends:
+            for backend_class in self.backend_classes:
+                if backend_class.name == name:
+                    self._backends[name] = backend_class()
+                    break
+            else:
+                return None
+        return self._backends[name]
+
+    def available_backends(self, fmt, need_password=False):
+        """该格式所有可用的后端（未排序）"""
+        with self._lock:
+            return self._available(fmt, need_password)
+
+    def _available(self, fmt, need_password):
+        backends = []
+        for backend_class in self.backend_classes:
+            if fmt not in backend_class.formats or (need_password and not backend_class.supports_password):
+                continue
+            backend = self._get(backend_class.name)
+            if backend.is_available():
+                backends.append(backend)
+        return backends
+
+    def select(self, fmt, need_password=False, engine=None, need_volumes=False):
+        """选择该格式的解压后端，没有可用后端时抛出 BackendUnavailableError
+
+        engine 用于基准测试（按实际的解压选项测试），不提供时不做基准测试。
+        need_volumes 为True时只选择能解压分卷组的后端。
+        """
+        key = (fmt, need_password, need_volumes)
+        with self._lock:
+            ordered = self._order.get(key)
+            format_lock = self._format_locks.setdefault(fmt, threading.Lock())
+        if ordered is None:
+            # 基准测试可能需要几秒，只让同一格式的调用等待，不持有注册表的锁
+            with format_lock:
+                with self._lock:
+                    ordered = self._order.get(key)
+                    if ordered is None:
+                        backends = [backend for backend in self._available(fmt, need_password)
+                                    if backend.supports_volumes or not need_volumes]
+                if ordered is None:
+                    ordered = self._rank(fmt, backends, engine, need_password)
+                    with self._lock:
+                        self._order[key] = ordered
+        if not ordered:
+            raise BackendUnavailableError(MISSING_BACKEND_HINTS.get(fmt, f"没有可用的{fmt}解压后端"))
+        return ordered[0]
+
+    def _rank(self, fmt, backends, engine, need_password=False):
+        preferred = self.preferences.get(fmt, [])
+        preferred_backends = [backend for name in preferred for backend in backends if backend.name == name]
+        others = [backend for backend in backends if backend not in preferred_backends]
+
+        timings = {}
+        if not preferred_backends and len(others) > 1 and self.benchmark and engine is not None:
+            timings = self._benchmark(fmt, others, engine)
+
+        others.sort(key=lambda backend: (timings.get(backend.name, float('inf')), -backend.priority))
+        ordered = preferred_backends + others
+        if ordered:
+            if preferred_backends:
+                reason = "配置偏好"
+            elif timings:
+                reason = "基准测试 " + ", ".join(f"{name} {seconds * 1000:.0f}ms" for name, seconds in sorted(timings.items(), key=lambda item: item[1]))
+            else:
+                reason = "默认优先级"
+            label = f"{fmt}（加密）" if need_password else fmt
+            self.log_message(f"{label} 解压后端: {ordered[0].name}（{reason}）")
+        return ordered
+
+    def _benchmark(self, fmt, backends, engine):
+        """测试各后端解压同一个样本的耗时（秒，扣除进程启动耗时），已测过的后端直接使用缓存结果
+
+        调用方持有该格式的锁，不持有注册表的锁。
+        """
+        with self._lock:
+            cached = dict(self._timings.get(fmt, {}))
+        pending = [backend for backend in backends if backend.name not in cached]
+        if pending:
+            with tempfile.TemporaryDirectory() as bench_dir:
+                sample = create_benchmark_sample(fmt, bench_dir)
+                if sample is None:
+                    return {}
+                for backend in pending:
+                    overhead = backend.startup_overhead()
+                    elapsed = []
+                    for attempt in range(2):
+                        target = os.path.join(bench_dir, f"{backend.name}_{attempt}")
+                        start = time.perf_counter()
+                        try:
+                            with engine.untracked():
+                                backend.extract(engine, sample, target)
+                        except Exception:
+                            break
+                        elapsed.append(time.perf_counter() - start)
+                    if elapsed:
+                        # 启动耗时的测量有误差，不让净耗时变成0或负数
+                        cached[backend.name] = max(min(elapsed) - overhead, min(elapsed) * 0.01)
+            with self._lock:
+                self._timings.setdefault(fmt, {}).update(cached)
+                self._save_timings()
+        return {backend.name: cached[backend.name] for backend in backends if backend.name in cached}
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+阶段基准测试 - 在可复现的语料上测量处理流程各阶段的耗时
+功能：生成（或复用）测试语料，多轮运行处理引擎，统计解压、格式识别、内部压缩包处理、MP4输出和清理各阶段的耗时，并与保存的基准结果比较
+
+用法：
+    cd src && python -m benchmark --save-baseline baseline.json
+    python -m benchmark --baseline baseline.json --rounds 5
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import threading
+import statistics
+from contextlib import contextmanager
+
+from corpus import CorpusGenerator, DEFAULT_PASSWORD, ensure_corpus
+from engine import EngineConfig, ExtractionEngine
+
+# 阶段名称 -> 显示名称（按流程顺序）
+STAGES = {
+    "extract": "解压主压缩包",
+    "detect": "格式识别",
+    "nested": "内部压缩包",
+    "deliver": "MP4输出",
+    "cleanup": "清理",
+}
+
+
+class StageTimer:
+    """按阶段累计耗时（各线程分别计时，嵌套的阶段不重复计入外层阶段）"""
+
+    def __init__(self, clock=time.perf_counter):
+        self.clock = clock
+        self.totals = {}
+        self.counts = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @contextmanager
+    def stage(self, name):
+        stack = self._local.__dict__.setdefault('stack', [])
+        frame = [name, self.clock(), 0.0]  # 阶段, 开始时间, 内层阶段耗时
+        stack.append(frame)
+        try:
+            yield
+        finally:
+            stack.pop()
+            elapsed = self.clock() - frame[1]
+            if stack:
+                stack[-1][2] += elapsed
+            with self._lock:
+                self.totals[name] = self.totals.get(name, 0.0) + elapsed - frame[2]
+                self.counts[name] = self.counts.get(name, 0) + 1
+
+
+class TimedEngine(ExtractionEngine):
+    """在各阶段方法外面计时的处理引擎"""
+
+    def __init__(self, config, timer, **kwargs):
+        super().__init__(config, **kwargs)
+        self.timer = timer
+
+    def extract_single_archive(self, source_file, job):
+        with self.timer.stage("extract"):
+            return super().extract_single_archive(source_file, job)
+
+    def detect_archive_format(self, file_path):
+        with self.timer.stage("detect"):
+            return super().detect_archive_format(file_path)
+
+    def process_internal_archives(self, job):
+        with self.timer.stage("nested"):
+            return super().process_internal_archives(job)
+
+    def deliver_mp4_files(self, job, output_dir):
+        with self.timer.stage("deliver"):
+            return super().deliver_mp4_files(job, output_dir)
+
+    def cleanup_current_temp_files(self, job):
+        with self.timer.stage("cleanup"):
+            return super().cleanup_current_temp_files(job)
+
+    def final_cleanup(self, cleanup_files):
+        with self.timer.stage("cleanup"):
+            return super().final_cleanup(cleanup_files)
+
+
+def run_round(corpus_dir, archives, workers=1, log=None):
+    """运行一轮：处理全部语料，返回 (各阶段耗时, 总耗时, 输出的MP4数量)"""
+    work_dir = tempfile.mkdtemp(prefix="desktop_automation_bench_")
+    try:
+        config = EngineConfig(os.path.join(work_dir, "out"), max_workers=workers, password=DEFAULT_PASSWORD,
+                              data_dir=os.path.join(work_dir, "data"), benchmark_backends=False,
+                              check_scratch_space=False)
+        os.makedirs(config.output_dir)
+        timer = StageTimer()
+        engine = TimedEngine(config, timer, log=log or (lambda message: None))
+        start = time.perf_counter()
+        result = engine.run([os.path.join(corpus_dir, name) for name in archives])
+        total = time.perf_counter() - start
+        if result.failed_files:
+            raise RuntimeError("语料处理失败: " + "; ".join(
+                f"{os.path.basename(path)}: {result.failed_reasons.get(path)}" for path in result.failed_files))
+        return dict(timer.totals), total, len(result.mp4_files)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def run_benchmark(corpus_dir, generator, rounds=3, workers=1, log=None):
+    """多轮运行，各阶段取中位数"""
+    manifest = ensure_corpus(corpus_dir, generator)
+    archives = sorted(manifest["archives"])
+    expected_mp4 = sum(entry["mp4"] for entry in manifest["archives"].values())
+
+    stage_rounds = {name: [] for name in STAGES}
+    totals = []
+    for _ in range(rounds):
+        stages, total, mp4_count = run_round(corpus_dir, archives, workers, log)
+        if mp4_count != expected_mp4:
+            raise RuntimeError(f"输出的MP4数量不对: {mp4_count}，应为 {expected_mp4}")
+        for name in STAGES:
+            stage_rounds[name].append(stages.get(name, 0.0))
+        totals.append(total)
+
+    return {
+        "stages": {name: statistics.median(values) for name, values in stage_rounds.items()},
+        "total": statistics.median(totals),
+        "rounds": rounds,
+        "workers": workers,
+        "corpus": manifest["parameters"],
+        "corpus_bytes": sum(entry["size"] for entry in manifest["archives"].values()),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "time": time.time(),
+    }
+
+
+def compare(results, baseline, tolerance=0.2, min_delta=0.005):
+    """与基准结果比较，返回 [(阶段, 本次耗时, 基准耗时, 变化比例, 是否变慢超过容差)]
+
+    变慢不到 min_delta 秒的阶段不算变慢（耗时很短的阶段波动比例很大）。
+    """
+    rows = []
+    entries = list(results["stages"].items()) + [("total", results["total"])]
+    baseline_entries = dict(baseline.get("stages", {}), total=baseline.get("total"))
+    for name, seconds in entries:
+        reference = baseline_entries.get(name)
+        if not reference:
+            rows.append((name, seconds, None, None, False))
+            continue
+        change = (seconds - reference) / reference
+        rows.append((name, seconds, reference, change, change > tolerance and seconds - reference >= min_delta))
+    return rows
+
+
+def format_report(results, rows=None):
+    lines = [f"语料 {results['corpus_bytes'] / (1024 * 1024):.1f} MB，{results['rounds']} 轮（中位数），"
+             f"并行任务数 {results['workers']}，Python {results['python']}"]
+    rows = rows or [(name, seconds, None, None, False) for name, seconds in
+                    list(results["stages"].items()) + [("total", results["total"])]]
+    for name, seconds, reference, change, regressed in rows:
+        label = STAGES.get(name, "总耗时")
+        line = f"  {label:<10} {seconds * 1000:10.1f} ms"
+        if reference is not None:
+            line += f"  基准 {reference * 1000:10.1f} ms  {change * 100:+6.1f}%"
+            if regressed:
+                line += "  变慢"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m benchmark", description="处理流程各阶段的基准测试")
+    parser.add_argument("--corpus", default=os.path.join(tempfile.gettempdir(), "desktop_automation_corpus"),
+                        help="语料目录（不存在或参数不同时重新生成）")
+    parser.add_argument("--rounds", type=int, default=3, help="运行轮数，各阶段取中位数")
+    parser.add_argument("-j", "--workers", type=int, default=1, help="并行任务数")
+    parser.add_argument("--seed", type=int, default=20240719, help="语料的随机种子")
+    parser.add_argument("--small-files", type=int, default=200, help="每个压缩包中的小文件数量")
+    parser.add_argument("--large-count", type=int, default=2, help="大体积假MP4的数量")
+    parser.add_argument("--large-mb", type=int, default=32, help="大体积假MP4的大小（MB）")
+    parser.add_argument("--baseline", help="与该基准结果比较，有阶段变慢超过容差时退出码为1")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="允许变慢的比例（默认0.2，即20%%）")
+    parser.add_argument("--save-baseline", metavar="FILE", help="把本次结果保存为基准")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    generator = CorpusGenerator(seed=args.seed, small_files=args.small_files,
+                                large_count=args.large_count, large_mb=args.large_mb)
+    results = run_benchmark(args.corpus, generator, args.rounds, args.workers)
+
+    rows = None
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline.get("corpus") != results["corpus"]:
+            print("警告: 基准结果使用的语料参数不同，比较结果仅供参考", file=sys.stderr)
+        rows = compare(results, baseline, args.tolerance)
+    print(format_report(results, rows))
+
+    if args.save_baseline:
+        temp_path = args.save_baseline + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        os.replace(temp_path, args.save_baseline)
+        print(f"基准结果已保存到: {args.save_baseline}")
+    return 1 if rows and any(row[4] for row in rows) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+命令行入口 - 无界面批量处理压缩包
+功能：对命令行给出的压缩包（路径、通配符或列表文件）运行与GUI相同的处理流程，适合服务器、定时任务和容器
+
+用法（在仓库根目录运行）：
+    python src/cli.py -o /data/output "/data/incoming/*.zip"
+    python src/cli.py -o /data/output --list archives.txt
+"""
+
+import os
+import sys
+import glob
+import argparse
+import logging
+import threading
+
+from engine import DEFAULT_DATA_DIR, EngineConfig, ExtractionEngine, ScratchSpaceError
+
+
+def expand_sources(patterns, list_file=None):
+    """展开通配符和列表文件，返回去重后的压缩包路径（保持顺序）"""
+    if list_file:
+        with open(list_file, 'r', encoding='utf-8') as f:
+            patterns = list(patterns) + [line.strip() for line in f
+                                         if line.strip() and not line.lstrip().startswith('#')]
+
+    sources = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern, recursive=True)) if glob.has_magic(pattern) else [pattern]
+        for path in matches:
+            path = os.path.abspath(path)
+            if os.path.isfile(path) and path not in sources:
+                sources.append(path)
+    return sources
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="python src/cli.py",
+        description="批量解压压缩包并提取MP4视频（无界面模式）")
+    parser.add_argument("sources", nargs="*", help="压缩包路径或通配符，例如 \"/data/*.zip\"")
+    parser.add_argument("--list", dest="list_file", help="每行一个压缩包路径或通配符的列表文件")
+    parser.add_argument("-o", "--output", required=True, help="基础输出目录")
+    parser.add_argument("--mode", choices=("unified", "individual"), default="unified",
+                        help="unified: 统一输出到一个文件夹；individual: 每个文件输出到独立文件夹")
+    parser.add_argument("-j", "--workers", type=int, default=min(4, os.cpu_count() or 1), help="并行任务数")
+    parser.add_argument("--password", default="", help="默认密码")
+    parser.add_argument("--backup-passwords", default="", help="备用密码（多个密码用逗号分隔）")
+    parser.add_argument("--max-depth", type=int, default=10, help="最大嵌套深度")
+    parser.add_argument("--no-cleanup", action="store_true", help="保留临时目录和中间文件")
+    parser.add_argument("--no-recursive", action="store_true", help="不解压内部压缩文件")
+    parser.add_argument("--no-smart-format", action="store_true", help="只按扩展名识别压缩格式（不读取文件头）")
+    parser.add_argument("--no-selective", action="store_true", help="解压压缩包中的所有文件")
+    parser.add_argument("--no-stream", action="store_true", help="关闭嵌套压缩包的流式解压")
+    parser.add_argument("--no-zero-copy", action="store_true", help="总是复制MP4文件（不移动/硬链接）")
+    parser.add_argument("--no-dedup", action="store_true", help="关闭MP4内容去重")
+    parser.add_argument("--persistent-dedup", action="store_true", help="跨批次去重（记住已输出的MP4）")
+    parser.add_argument("--backend", action="append", default=[], metavar="FORMAT=NAME[,NAME]",
+                        help="指定格式的解压后端偏好，例如 7z=bsdtar,py7zr（可重复）")
+    parser.add_argument("--no-benchmark", action="store_true", help="不做基准测试，按默认优先级选择解压后端")
+    parser.add_argument("--scratch", action="append", default=[], metavar="DIR",
+                        help="临时解压目录（例如本地SSD或tmpfs），可重复指定多个候选，选择第一个空间足够的；默认使用输出目录")
+    parser.add_argument("--no-space-check", action="store_true", help="开始前不检查临时目录的可用空间")
+    parser.add_argument("--resume", action="store_true",
+                        help="从上次中断的批次继续：跳过已完成的压缩包，清理并重做中断的压缩包")
+    parser.add_argument("--journal", metavar="FILE", help="批次日志文件（默认在数据目录中，每个输出目录一个）")
+    parser.add_argument("--incremental", action="store_true",
+                        help="跳过以前已成功处理过、没有变化的压缩包（按路径、大小、修改时间和快速摘要识别）")
+    parser.add_argument("--redeliver", action="store_true",
+                        help="与 --incremental 一起使用：把跳过的压缩包以前输出的MP4重新输出到本批次的输出目录")
+    parser.add_argument("--no-fingerprint-hash", action="store_true",
+                        help="压缩包指纹不计算快速摘要（只按路径、大小和修改时间识别）")
+    parser.add_argument("--trace", metavar="DIR",
+                        help="每个批次在该目录中保存一个Chrome trace文件（各处理阶段的耗时，可在 chrome://tracing 中查看）")
+    parser.add_argument("--metrics", metavar="FILE",
+                        help="把运行指标以Prometheus文本格式写入该文件（例如node_exporter的textfile目录中的 *.prom），处理过程中定期更新")
+    parser.add_argument("--metrics-interval", type=float, default=15.0, metavar="SECONDS",
+                        help="处理过程中更新指标文件的最短间隔（默认15秒）")
+    parser.add_argument("--memory-limit", type=float, metavar="MB",
+                        help="并行解压共用的内存上限（MB）：7z按顺序解码并按估算的解码内存排队，内部ZIP超出预算时缓冲到磁盘")
+    parser.add_argument("--cleanup-workers", type=int, default=2, metavar="N",
+                        help="后台删除临时目录的线程数（默认2）：临时目录改名移入回收区后在后台删除，0表示同步删除")
+    parser.add_argument("--watch", action="append", default=[], metavar="DIR",
+                        help="监视模式：持续监视收件目录（可重复），新压缩包写完后自动处理，按 Ctrl+C 停止")
+    parser.add_argument("--settle", type=float, default=5.0, metavar="SECONDS",
+                        help="监视模式：文件大小和修改时间保持不变多少秒后才处理（默认5秒）")
+    parser.add_argument("--poll-interval", type=float, default=1.0, metavar="SECONDS",
+                        help="监视模式：不能使用inotify时扫描目录的间隔（默认1秒）")
+    parser.add_argument("--no-inotify", action="store_true", help="监视模式：总是定时扫描目录")
+    parser.add_argument("--data-dir", default=DEFAULT_DATA_DIR, help="密码统计、去重索引和基准测试结果的保存目录")
+    parser.add_argument("-q", "--quiet", action="store_true", help="只输出警告和错误")
+    return parser
+
+
+def parse_backend_preferences(values):
+    """解析 --backend 参数：["7z=bsdtar,py7zr"] -> {"7z": ["bsdtar", "py7zr"]}"""
+    preferences = {}
+    for value in values:
+        fmt, sep, names = value.partition('=')
+        if not sep or not fmt.strip() or not names.strip():
+            raise ValueError(f"无效的后端偏好: {value}")
+        preferences[fmt.strip().lower()] = [name.strip() for name in names.split(',') if name.strip()]
+    return preferences
+
+
+def config_from_args(args):
+    """根据命令行参数生成引擎配置"""
+    return EngineConfig(
+        output_dir=os.path.abspath(args.output),
+        output_mode=args.mode,
+        auto_cleanup=not args.no_cleanup,
+        recursive_extract=not args.no_recursive,
+        max_nesting_depth=args.max_depth,
+        smart_format_detection=not args.no_smart_format,
+        selective_extract=not args.no_selective,
+        stream_nested_archives=not args.no_stream,
+        zero_copy_delivery=not args.no_zero_copy,
+        dedup_mp4=not args.no_dedup,
+        persistent_dedup=args.persistent_dedup,
+        max_workers=args.workers,
+        password=args.password,
+        backup_passwords=args.backup_passwords.split(','),
+        data_dir=args.data_dir,
+        backend_preferences=parse_backend_preferences(args.backend),
+        benchmark_backends=not args.no_benchmark,
+        scratch_dirs=[os.path.abspath(path) for path in args.scratch],
+        check_scratch_space=not args.no_space_check,
+        resume=args.resume,
+        journal_path=os.path.abspath(args.journal) if args.journal else None,
+        incremental=args.incremental or args.redeliver,
+        redeliver_processed=args.redeliver,
+        fingerprint_hash=not args.no_fingerprint_hash,
+        trace_dir=os.path.abspath(args.trace) if args.trace else None,
+        metrics_path=os.path.abspath(args.metrics) if args.metrics else None,
+        metrics_interval=args.metrics_interval,
+        memory_limit=int(args.memory_limit * 1024 * 1024) if args.memory_limit else None,
+        cleanup_workers=args.cleanup_workers,
+    )
+
+
+def main(argv=None):
+    """命令行主函数，返回退出码：0 全部成功，1 有失败的文件，2 参数错误"""
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING if args.quiet else logging.INFO,
+                        format='%(asctime)s - %(levelname)s - %(message)s',
+                        stream=sys.stderr)
+
+    try:
+        sources = expand_sources(args.sources, args.list_file)
+    except OSError as e:
+        parser.error(f"无法读取列表文件: {e}")
+    if not sources and not args.watch:
+        parser.error("没有找到要处理的压缩包")
+
+    try:
+        config = config_from_args(args)
+    except ValueError as e:
+        parser.error(str(e))
+    os.makedirs(config.output_dir, exist_ok=True)
+
+    if args.watch:
+        return watch(args, config)
+
+    try:
+        result = ExtractionEngine(config).run(sources)
+    except ScratchSpaceError as e:
+        print(f"错误: {e}", file=sys.stderr)
+        return 1
+
+    for failed_file in result.failed_files:
+        print(f"失败: {failed_file} - {result.failed_reasons.get(failed_file, '未知错误')}", file=sys.stderr)
+    for mp4_file in result.mp4_files:
+        print(mp4_file)
+    return 1 if result.failed_files else 0
+
+
+def watch(args, config):
+    """监视模式：一直运行到 Ctrl+C，每个压缩包处理完成后输出MP4路径"""
+    from watcher import WatchDaemon
+
+    directories = [os.path.abspath(directory) for directory in args.watch]
+    for directory in directories:
+        if not os.path.isdir(directory):
+            print(f"错误: 监视目录不存在: {directory}", file=sys.stderr)
+            return 2
+    output_lock = threading.Lock()
+
+    def print_result(result):
+        with output_lock:
+            for failed_file in result.failed_files:
+                print(f"失败: {failed_file} - {result.failed_reasons.get(failed_file, '未知错误')}", file=sys.stderr)
+            for mp4_file in result.mp4_files:
+                print(mp4_file, flush=True)
+
+    logger = logging.getLogger("watch")
+    daemon = WatchDaemon(config, directories, settle_seconds=args.settle, poll_interval=args.poll_interval,
+                         workers=args.workers, use_inotify=not args.no_inotify, log=logger.info,
+                         on_result=print_result)
+    try:
+        daemon.run()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
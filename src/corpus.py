@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试语料生成 - 生成可复现的本地压缩包语料，用于基准测试
+功能：按随机种子生成嵌套的 zip/tar.gz/tar.xz/7z 压缩包、改名为 .666z 的7z、加密的7z，包含大量小文件和少量大体积的假MP4；相同参数生成的文件内容完全相同
+"""
+
+import io
+import os
+import json
+import gzip
+import lzma
+import random
+import tarfile
+import zipfile
+
+try:
+    import py7zr
+except ImportError:
+    py7zr = None
+
+DEFAULT_PASSWORD = "chinatkclub.com"
+MB = 1024 * 1024
+
+# ZIP成员和TAR成员使用固定的时间，生成结果不随运行时间变化
+FIXED_DATE_TIME = (2024, 7, 19, 12, 0, 0)
+FIXED_MTIME = 1721390400
+
+# MP4文件头（ftyp box），之后是随机的不可压缩数据
+MP4_HEADER = b'\x00\x00\x00\x18ftypmp42\x00\x00\x00\x00mp42isom'
+
+
+class CorpusGenerator:
+    """按参数生成基准测试语料
+
+    small_files: 每个压缩包中的小文件数量；small_size: 小文件大小（字节）；
+    large_count / large_mb: 大体积假MP4的数量和大小；video_size: 普通假MP4的大小（字节）。
+    """
+
+    def __init__(self, seed=20240719, small_files=200, small_size=4096, large_count=2, large_mb=32,
+                 video_size=256 * 1024, password=DEFAULT_PASSWORD):
+        self.seed = seed
+        self.small_files = small_files
+        self.small_size = small_size
+        self.large_count = large_count
+        self.large_mb = large_mb
+        self.video_size = video_size
+        self.password = password
+        self.rng = random.Random(seed)
+
+    @property
+    def parameters(self):
+        return {
+            "seed": self.seed, "small_files": self.small_files, "small_size": self.small_size,
+            "large_count": self.large_count, "large_mb": self.large_mb, "video_size": self.video_size,
+            "py7zr": py7zr is not None,
+        }
+
+    def video(self, size=None):
+        size = self.video_size if size is None else size
+        return MP4_HEADER + self.rng.randbytes(max(0, size - len(MP4_HEADER)))
+
+    def small_members(self, prefix):
+        """大量小文件（文本和可压缩的数据各一半）"""
+        members = {}
+        for i in range(self.small_files):
+            if i % 2:
+                members[f"{prefix}/data/file_{i:04d}.bin"] = self.rng.randbytes(self.small_size)
+            else:
+                line = f"{prefix} 第{i}行 {self.rng.random()}\n".encode('utf-8')
+                members[f"{prefix}/text/file_{i:04d}.txt"] = (line * (self.small_size // len(line) + 1))[:self.small_size]
+        return members
+
+    @staticmethod
+    def zip_bytes(members, compression=zipfile.ZIP_DEFLATED):
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, 'w', compression) as zf:
+            for name, data in members.items():
+                info = zipfile.ZipInfo(name, date_time=FIXED_DATE_TIME)
+                info.compress_type = compression
+                zf.writestr(info, data)
+        return buffer.getvalue()
+
+    @staticmethod
+    def tar_bytes(members):
+        buffer = io.BytesIO()
+        with tarfile.open(fileobj=buffer, mode='w', format=tarfile.USTAR_FORMAT) as tf:
+            for name, data in members.items():
+                info = tarfile.TarInfo(name)
+                info.size = len(data)
+                info.mtime = FIXED_MTIME
+                info.mode = 0o644
+                tf.addfile(info, io.BytesIO(data))
+        return buffer.getvalue()
+
+    def tar_gz_bytes(self, members):
+        return gzip.compress(self.tar_bytes(members), mtime=0)
+
+    def tar_xz_bytes(self, members):
+        return lzma.compress(self.tar_bytes(members))
+
+    @staticmethod
+    def seven_zip_bytes(members, password=None):
+        """7z压缩包（需要py7zr；7z容器本身带随机盐，只有内容可复现）"""
+        buffer = io.BytesIO()
+        with py7zr.SevenZipFile(buffer, 'w', password=password) as archive:
+            for name, data in members.items():
+                archive.writestr(data, name)
+        return buffer.getvalue()
+
+    def build(self):
+        """生成所有压缩包，返回 {文件名: 字节内容} 和每个压缩包中的MP4数量"""
+        archives = {}
+        expected = {}
+
+        # 三层嵌套：zip -> (zip, tar.gz -> zip)
+        deep_zip = self.zip_bytes({"deep/level3.mp4": self.video()})
+        inner_tar_gz = self.tar_gz_bytes({"tar/level2.mp4": self.video(), "tar/deep.zip": deep_zip})
+        inner_zip = self.zip_bytes({"inner/level2.mp4": self.video(), **self.small_members("inner")})
+        archives["nested.zip"] = self.zip_bytes({
+            "top.mp4": self.video(), "inner.zip": inner_zip, "bundle.tar.gz": inner_tar_gz,
+            **self.small_members("nested"),
+        })
+        expected["nested.zip"] = 4
+
+        # tar.gz 和 tar.xz，内部再嵌一个 tar.xz
+        inner_tar_xz = self.tar_xz_bytes({"xz/inner.mp4": self.video()})
+        archives["bundle.tar.gz"] = self.tar_gz_bytes({
+            "bundle/a.mp4": self.video(), "bundle/inner.tar.xz": inner_tar_xz, **self.small_members("bundle"),
+        })
+        expected["bundle.tar.gz"] = 2
+        archives["bundle.tar.xz"] = self.tar_xz_bytes({"xz/b.mp4": self.video(), **self.small_members("xz")})
+        expected["bundle.tar.xz"] = 1
+
+        # 少量大体积的假MP4（不压缩，测试输出和复制的吞吐量）
+        archives["large.zip"] = self.zip_bytes(
+            {f"large/movie_{i}.mp4": self.video(self.large_mb * MB) for i in range(self.large_count)},
+            zipfile.ZIP_STORED)
+        expected["large.zip"] = self.large_count
+
+        # 7z、改名为 .666z 的7z、加密的7z（需要py7zr）
+        if py7zr is not None:
+            archives["plain.7z"] = self.seven_zip_bytes({"7z/c.mp4": self.video(), **self.small_members("7z")})
+            expected["plain.7z"] = 1
+            archives["renamed.666z"] = self.seven_zip_bytes({"666z/d.mp4": self.video()})
+            expected["renamed.666z"] = 1
+            archives["encrypted.7z"] = self.seven_zip_bytes({"secret/e.mp4": self.video()}, self.password)
+            expected["encrypted.7z"] = 1
+            # ZIP中的加密7z（嵌套 + 密码）
+            archives["wrapped_7z.zip"] = self.zip_bytes({
+                "wrapped/inner.7z": self.seven_zip_bytes({"wrapped/f.mp4": self.video()}, self.password),
+            })
+            expected["wrapped_7z.zip"] = 1
+        return archives, expected
+
+    def generate(self, directory):
+        """把语料写入目录，并写入 manifest.json（参数和预期的MP4数量）"""
+        os.makedirs(directory, exist_ok=True)
+        archives, expected = self.build()
+        for name, data in archives.items():
+            with open(os.path.join(directory, name), 'wb') as f:
+                f.write(data)
+        manifest = {
+            "parameters": self.parameters,
+            "archives": {name: {"size": len(data), "mp4": expected[name]} for name, data in archives.items()},
+        }
+        with open(os.path.join(directory, "manifest.json"), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        return manifest
+
+
+def load_manifest(directory):
+    """读取语料目录中的 manifest.json，不存在或损坏时返回None"""
+    try:
+        with open(os.path.join(directory, "manifest.json"), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def ensure_corpus(directory, generator):
+    """语料目录不存在或参数不同时重新生成，返回 manifest"""
+    manifest = load_manifest(directory)
+    if (manifest is not None and manifest.get("parameters") == generator.parameters
+            and all(os.path.exists(os.path.join(directory, name)) for name in manifest.get("archives", {}))):
+        return manifest
+    return generator.generate(directory)
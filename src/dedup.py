@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+MP4内容去重 - 同一个视频只输出一次
+功能：依次比较文件大小、头尾采样摘要和完整摘要，识别内容完全相同的MP4；可选持久化索引实现跨批次去重
+"""
+
+import os
+import json
+import hashlib
+import threading
+
+
+class Mp4Record:
+    """已输出的MP4文件记录，摘要按需计算"""
+
+    __slots__ = ('path', 'size', 'sample_hash', 'full_hash')
+
+    def __init__(self, path, size, sample_hash=None, full_hash=None):
+        self.path = path
+        self.size = size
+        self.sample_hash = sample_hash
+        self.full_hash = full_hash
+
+
+class Mp4Deduplicator:
+    """按内容识别重复的MP4文件
+
+    比较顺序：大小 -> 头尾采样摘要 -> 完整摘要，只有前两步都相同时才读取完整文件。
+    不同大小的文件可以并行检查，相同大小的文件通过 size_lock 串行处理，
+    避免两个并行任务同时输出同一个视频。
+    """
+
+    def __init__(self, index_path=None, sample_size=1024 * 1024):
+        self.index_path = index_path
+        self.sample_size = sample_size
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()  # 多个批次共用同一个对象时，保存索引依次进行
+        self._size_locks = {}
+        self._records = {}  # 文件大小 -> [Mp4Record]
+        if index_path:
+            self._load_index()
+
+    def _load_index(self):
+        """加载持久化索引，丢弃已被删除或修改过的文件"""
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            return
+        for entry in entries if isinstance(entries, list) else []:
+            try:
+                if os.path.getsize(entry["path"]) != entry["size"]:
+                    continue
+            except (OSError, KeyError, TypeError):
+                continue
+            record = Mp4Record(entry["path"], entry["size"], entry.get("sample_hash"), entry.get("full_hash"))
+            self._records.setdefault(record.size, []).append(record)
+
+    def save_index(self):
+        """原子写入持久化索引"""
+        if not self.index_path:
+            return
+        with self._save_lock:
+            with self._lock:
+                entries = [{"path": record.path, "size": record.size,
+                            "sample_hash": record.sample_hash, "full_hash": record.full_hash}
+                           for records in self._records.values() for record in records
+                           if os.path.exists(record.path)]
+            os.makedirs(os.path.dirname(self.index_path) or '.', exist_ok=True)
+            temp_path = self.index_path + '.tmp'
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(entries, f, ensure_ascii=False)
+            os.replace(temp_path, self.index_path)
+
+    def size_lock(self, size):
+        """获取指定文件大小的锁"""
+        with self._lock:
+            return self._size_locks.setdefault(size, threading.Lock())
+
+    def sample_hash(self, path):
+        """文件头部和尾部采样摘要"""
+        size = os.path.getsize(path)
+        digest = hashlib.blake2b(str(size).encode())
+        with open(path, 'rb') as f:
+            digest.update(f.read(self.sample_size))
+            if size > self.sample_size:
+                f.seek(max(self.sample_size, size - self.sample_size))
+                digest.update(f.read(self.sample_size))
+        return digest.hexdigest()
+
+    @staticmethod
+    def full_hash(path, chunk_size=4 * 1024 * 1024):
+        """完整文件摘要"""
+        digest = hashlib.blake2b()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def find_duplicate(self, path, size=None):
+        """查找内容相同的已输出文件，返回其路径；调用方应持有 size_lock(size)"""
+        size = os.path.getsize(path) if size is None else size
+        with self._lock:
+            records = list(self._records.get(size, []))
+        if not records:
+            return None
+
+        sample_hash = self.sample_hash(path)
+        full_hash = None
+        for record in records:
+            try:
+                if record.sample_hash is None:
+                    record.sample_hash = self.sample_hash(record.path)
+                if record.sample_hash != sample_hash:
+                    continue
+                if full_hash is None:
+                    full_hash = self.full_hash(path)
+                if record.full_hash is None:
+                    record.full_hash = self.full_hash(record.path)
+            except OSError:
+                # 已输出的文件被移走或删除，不再参与比较
+                continue
+            if record.full_hash == full_hash:
+                return record.path
+        return None
+
+    def register(self, path, size=None):
+        """记录一个已输出的文件"""
+        size = os.path.getsize(path) if size is None else size
+        record = Mp4Record(path, size)
+        with self._lock:
+            self._records.setdefault(size, []).append(record)
+        return record
+
+
+def write_manifest(manifest_path, duplicates):
+    """写入重复文件清单（JSON）"""
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        json.dump(duplicates, f, ensure_ascii=False, indent=2)
@@ -0,0 +1,1755 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+压缩包处理引擎 - 不依赖图形界面的解压和视频提取流程
+功能：根据普通的配置对象批量解压压缩包、递归处理内部压缩文件并输出MP4，GUI和命令行共用同一套流程
+"""
+
+import os
+import shutil
+import tarfile
+import zipfile
+import threading
+import logging
+from pathlib import Path
+import tempfile
+import time
+import hashlib
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from backends import (PY7ZR_CHUNK_SIZE, BackendRegistry, BackendUnavailableError, SevenZipToolError,
+                      archive_format, make_py7zr_callback)
+from dedup import Mp4Deduplicator, write_manifest
+from file_index import TempTreeIndex
+from fingerprints import ArchiveFingerprintStore
+from journal import BatchJournal, default_journal_path
+from memory import MemoryBudget, format_size, peak_rss, sample_rss
+from metrics import ProcessingMetrics
+from password_stats import PasswordStatsStore
+from progress import BatchProgress, ByteProgress, format_eta, format_rate
+from signatures import FormatSniffer
+from tracing import Tracer
+from trash import TrashBin
+from volumes import group_volumes, is_later_volume, parse_volume, volume_parts
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DATA_DIR = os.path.join(os.path.expanduser("~"), ".desktop_automation_tool")
+
+# Windows文件名中不允许的字符（解压时替换为下划线）
+WINDOWS_INVALID_CHARS = str.maketrans({char: '_' for char in ':<>|"?*'})
+
+
+class EngineConfig:
+    """处理选项
+
+    与GUI中的各个选项一一对应，命令行和其他程序直接构造即可。
+    """
+
+    def __init__(self, output_dir, output_mode="unified", file_output_dirs=None,
+                 auto_cleanup=True, recursive_extract=True, max_nesting_depth=10,
+                 smart_format_detection=True, selective_extract=True,
+                 stream_nested_archives=True, zero_copy_delivery=True,
+                 dedup_mp4=True, persistent_dedup=False, max_workers=None,
+                 password="", backup_passwords=None, spool_threshold=64 * 1024 * 1024,
+                 password_check_workers=4, data_dir=None, backend_preferences=None,
+                 benchmark_backends=True, scratch_dirs=None, check_scratch_space=True,
+                 resume=False, journal_path=None, incremental=False, redeliver_processed=False,
+                 fingerprint_hash=True, unified_output_dir=None, trace_dir=None, metrics_path=None,
+                 metrics_interval=15.0, memory_limit=None, copy_buffer_size=1024 * 1024, cleanup_workers=2):
+        self.output_dir = output_dir  # 基础输出目录
+        self.output_mode = output_mode  # unified/individual
+        # 统一输出模式的固定输出目录；为空时每个批次在基础输出目录中新建 批量提取结果_时间 目录
+        self.unified_output_dir = unified_output_dir
+        self.file_output_dirs = dict(file_output_dirs or {})  # 每个文件对应的输出目录
+        self.auto_cleanup = auto_cleanup
+        self.recursive_extract = recursive_extract
+        self.max_nesting_depth = max_nesting_depth
+        self.smart_format_detection = smart_format_detection
+        self.selective_extract = selective_extract
+        self.stream_nested_archives = stream_nested_archives
+        self.zero_copy_delivery = zero_copy_delivery
+        self.dedup_mp4 = dedup_mp4
+        self.persistent_dedup = persistent_dedup
+        self.max_workers = max_workers if max_workers is not None else min(4, os.cpu_count() or 1)
+        self.password = password  # 默认密码
+        self.backup_passwords = list(backup_passwords or [])  # 备用密码
+        # 小于该大小的内部ZIP在内存中缓冲，超过后自动转存到临时文件
+        self.spool_threshold = spool_threshold
+        # 并行验证7z候选密码的线程数
+        self.password_check_workers = password_check_workers
+        # 跨运行保存的数据（密码命中统计、去重索引、后端基准测试结果）
+        self.data_dir = data_dir or DEFAULT_DATA_DIR
+        # 解压后端偏好：{格式: [后端名称, ...]}，例如 {"7z": ["bsdtar", "py7zr"]}
+        self.backend_preferences = dict(backend_preferences or {})
+        # 没有配置偏好且有多个可用后端时，用基准测试选择最快的后端
+        self.benchmark_backends = benchmark_backends
+        # 候选临时目录（例如本地SSD或tmpfs），按顺序选择第一个空间足够的；为空时使用输出目录
+        self.scratch_dirs = [path for path in (scratch_dirs or []) if path]
+        # 开始解压前根据文件列表估算需要的临时空间，空间不足时直接报错
+        self.check_scratch_space = check_scratch_space
+        # 从上次中断的批次继续：跳过批次日志中已完成的压缩包，中断的压缩包清理后重做
+        self.resume = resume
+        # 批次日志（每个压缩包的处理阶段和输出文件，追加写入）；默认每个输出目录一个日志
+        self.journal_path = journal_path or default_journal_path(self.data_dir, output_dir)
+        # 增量处理：跳过以前已成功处理过、没有变化的压缩包
+        self.incremental = incremental
+        # 跳过的压缩包把以前输出的MP4重新输出到本批次的输出目录（以前的输出已不存在时重新处理）
+        self.redeliver_processed = redeliver_processed
+        # 压缩包指纹包含快速摘要（头、中、尾采样），可以识别换了路径或名称的同一个压缩包
+        self.fingerprint_hash = fingerprint_hash
+        # 每个批次导出一个Chrome trace文件（各处理阶段的耗时），为空时不记录
+        self.trace_dir = trace_dir
+        # Prometheus文本格式的运行指标文件（供node_exporter的textfile collector采集），为空时不输出
+        self.metrics_path = metrics_path
+        # 处理过程中最多每 metrics_interval 秒写一次指标文件（每个压缩包完成时和批次结束时总会写入）
+        self.metrics_interval = metrics_interval
+        # 并行解压共用的内存上限（字节）：7z解码内存和内部ZIP的内存缓冲从中分配，为空时不限制
+        self.memory_limit = memory_limit
+        # 解压和复制文件时每个线程复用的缓冲区大小
+        self.copy_buffer_size = copy_buffer_size
+        # 删除临时目录的后台线程数：临时目录改名移入回收区后在后台删除，批次结束时等待；0表示同步删除
+        self.cleanup_workers = cleanup_workers
+
+
+class ScratchSpaceError(RuntimeError):
+    """没有空间足够的临时目录"""
+
+
+class ArchiveJob:
+    """单个源压缩包的处理任务
+
+    每个任务拥有独立的临时目录、输出目录和结果记录，
+    并行处理时各任务之间互不覆盖。
+    """
+
+    def __init__(self, source_file, index):
+        self.source_file = source_file
+        self.index = index
+        self.temp_dir = ""
+        self.file_index = TempTreeIndex()  # 临时目录文件索引
+        self.output_dir = ""  # 当前任务的MP4输出目录
+        self.mp4_files = []
+        self.delivery_log = []  # (源文件, 输出文件, 输出方式)
+        self.duplicates = []  # 内容重复而未输出的MP4
+        self.cleanup_files = []
+        self.failed_files = []
+        self.failed_reasons = {}
+        self.success = False
+        self.error = ""
+        self.start_time = None
+        self.end_time = None
+        self.reused = False  # 直接采用批次日志或指纹记录中的结果，没有重新处理
+        self.delivering = False  # 正在输出MP4（复制的字节不计入解压字节数）
+        self.extracted_bytes = 0  # 解压写出的字节数（包括内部压缩包）
+        self.scratch_bytes = 0  # 仍在临时目录中的解压字节数（清理后归零）
+        self.peak_rss = None  # 处理期间采样到的进程峰值常驻内存（字节）
+        # 流式解压时从嵌套压缩包中写入磁盘的文件的嵌套深度（没有记录的按所在目录的压缩包深度 + 1）
+        self.nested_depths = {}
+        self.rss_sampled_at = 0.0
+        # 分卷压缩包的所有分卷（不是分卷时只有源文件本身）
+        self.volume_parts = volume_parts(source_file)
+        try:
+            self.input_bytes = sum(os.path.getsize(part) for part in self.volume_parts)
+        except OSError:
+            self.input_bytes = 0
+        self.progress = ByteProgress(self.input_bytes)  # 按字节统计的解压和输出进度
+
+    @property
+    def elapsed(self):
+        """任务耗时（秒）"""
+        if self.start_time is None:
+            return 0.0
+        return (self.end_time or time.time()) - self.start_time
+
+    def mark_failed(self, file_path, reason):
+        """记录任务中失败的文件"""
+        if file_path not in self.failed_files:
+            self.failed_files.append(file_path)
+        self.failed_reasons[file_path] = reason
+
+    def clear_failure(self, file_path):
+        """从失败记录中移除文件（例如手动密码重试成功后）"""
+        if file_path in self.failed_files:
+            self.failed_files.remove(file_path)
+        self.failed_reasons.pop(file_path, None)
+
+    def observe_rss(self, rss):
+        """记录一次内存采样（并行处理时是整个进程的内存）"""
+        if rss is not None and (self.peak_rss is None or rss > self.peak_rss):
+            self.peak_rss = rss
+
+
+class BatchResult:
+    """一个批次的处理结果"""
+
+    def __init__(self, jobs=None):
+        self.jobs = jobs or []
+        self.mp4_files = []
+        self.duplicates = []
+        self.cleanup_files = []
+        self.failed_files = []
+        self.failed_reasons = {}
+        self.unified_output_dir = None
+        self.total_bytes = 0
+        self.elapsed = 0.0
+
+    def add_job(self, job):
+        """合并单个任务的结果"""
+        self.mp4_files.extend(job.mp4_files)
+        self.duplicates.extend(job.duplicates)
+        self.cleanup_files.extend(job.cleanup_files)
+        for failed_file in job.failed_files:
+            if failed_file not in self.failed_files:
+                self.failed_files.append(failed_file)
+            self.failed_reasons[failed_file] = job.failed_reasons.get(failed_file, "未知错误")
+        if not job.reused:
+            self.total_bytes += job.input_bytes
+
+    @property
+    def successful_count(self):
+        return sum(1 for job in self.jobs if job.success)
+
+    @property
+    def throughput(self):
+        """(压缩包/分钟, MB/s)"""
+        processed = sum(1 for job in self.jobs if not job.reused)
+        return ExtractionEngine.calculate_throughput(processed, self.total_bytes, self.elapsed)
+
+
+class ExtractionEngine:
+    """批量解压和MP4提取流程
+
+    log(message) 接收日志，progress(value, status) 接收进度（0-100），
+    password_prompt(archive_path, last_error) 在所有候选密码都失败时询问新密码，
+    返回None表示跳过。未提供 password_prompt 时密码失败的压缩包直接报错。
+    """
+
+    def __init__(self, config, log=None, progress=None, password_prompt=None):
+        self.config = config
+        self._log = log or logger.info
+        self._progress = progress
+        self.password_prompt = password_prompt
+
+        self.password_stats = PasswordStatsStore(os.path.join(config.data_dir, "password_stats.json"))
+        self.fingerprints = ArchiveFingerprintStore(os.path.join(config.data_dir, "archive_fingerprints.json"),
+                                                    config.fingerprint_hash)
+        self.backends = BackendRegistry(config.backend_preferences, config.benchmark_backends,
+                                        os.path.join(config.data_dir, "backend_benchmark.json"),
+                                        log=self.log_message)
+        self.deduplicator = None
+        # 多个引擎共用的去重索引（监视模式），为空时每个批次新建
+        self.shared_deduplicator = None
+        self.unified_output_dir = None
+        self.scratch_dir = None  # 本批次的临时目录根目录
+        self._owns_scratch_dir = False  # 临时目录根目录是否由本批次创建
+        self.total_jobs = 0
+        self.batch_progress = 0
+        self.batch_bytes = None  # 当前批次的字节进度（BatchProgress）
+        self.journal = None  # 当前批次的批次日志（BatchJournal）
+        self.trash = None  # 当前批次的回收区（TrashBin），临时目录在后台删除
+        self.tracer = Tracer(enabled=False)  # 当前批次的处理阶段追踪
+        self.memory_budget = MemoryBudget(config.memory_limit)  # 并行解压共用的内存预算
+        self.metrics = (ProcessingMetrics(config.metrics_path, config.metrics_interval, log=self.log_message)
+                        if config.metrics_path else None)
+        self.metrics_slot = "0"  # 批次量表的 slot 标签，监视模式下每个工作线程不同
+
+        # 每个工作线程当前处理的任务，解压和复制的字节数记到该任务上
+        self._local = threading.local()
+        # 字节进度的状态栏最多每 progress_interval 秒更新一次
+        self.progress_interval = 0.25
+        # 处理过程中最多每 rss_interval 秒采样一次进程内存
+        self.rss_interval = 0.5
+        self._last_status_time = 0.0
+        self._status_lock = threading.Lock()
+
+        # 并行处理：询问密码同一时间只能进行一个
+        self._dialog_lock = threading.Lock()
+
+        # 按文件头识别压缩格式（结果缓存在内存中，文件不会被重命名）
+        self.sniffer = FormatSniffer()
+
+        # 选择性解压时需要保留的文件扩展名（输出文件和可能的内部压缩包）
+        self.output_extensions = ('.mp4',)
+        self.archive_extensions = ('.zip', '.rar', '.7z', '.666z', '.001', '.gz', '.tgz', '.bz2', '.xz', '.tar')
+
+        # 流式解压：可以直接从父压缩包成员读取的嵌套格式
+        self.streamable_zip_extensions = ('.zip',)
+        self.streamable_tar_extensions = ('.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tbz2', '.tar.xz', '.txz')
+
+        # MP4输出方式的显示名称
+        self.delivery_strategy_names = {"move": "移动", "hardlink": "硬链接", "copy": "复制"}
+
+        # 临时空间预检：无法列出文件时按压缩包大小的倍数估计，估算结果再留出余量
+        self.scratch_estimate_ratio = 1.0
+        self.scratch_safety_factor = 1.2
+
+    def log_message(self, message):
+        self._log(message)
+
+    def update_progress(self, value, status=""):
+        self.batch_progress = value
+        if self._progress is not None:
+            self._progress(value, status)
+
+    @contextmanager
+    def tracking(self, job):
+        """在当前线程中把字节进度记到 job 上"""
+        previous = getattr(self._local, 'job', None)
+        self._local.job = job
+        try:
+            yield job
+        finally:
+            self._local.job = previous
+
+    @contextmanager
+    def trace(self, name, archive_path=None, **args):
+        """记录一个处理阶段的span：压缩包名称、输入字节数（压缩包大小）和期间写出的字节数
+
+        输出运行指标时同时记录该阶段的耗时。
+        """
+        if not self.tracer.enabled and self.metrics is None:
+            yield None
+            return
+        job = getattr(self._local, 'job', None)
+        if archive_path is not None and self.tracer.enabled:
+            args["archive"] = os.path.basename(archive_path)
+            try:
+                args["bytes_in"] = sum(os.path.getsize(part) for part in volume_parts(archive_path))
+            except OSError:
+                pass
+        written = job.progress.done if job is not None else 0
+        start = time.perf_counter()
+        with self.tracer.span(name, **args) as span:
+            try:
+                yield span
+            finally:
+                if span is not None and job is not None:
+                    span.args.setdefault("bytes_out", job.progress.done - written)
+                if self.metrics is not None:
+                    self.metrics.observe_stage(name, time.perf_counter() - start)
+
+    def write_trace(self):
+        """导出本批次的Chrome trace文件，写入失败只记录日志"""
+        if not self.tracer.enabled:
+            return
+        path = os.path.join(self.config.trace_dir, f"trace_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}.json")
+        try:
+            self.tracer.write_chrome_trace(path)
+            self.log_message(f"处理阶段追踪已保存到: {path}（可在 chrome://tracing 或 Perfetto 中打开）")
+        except OSError as e:
+            self.log_message(f"保存处理阶段追踪失败: {str(e)}")
+
+    @contextmanager
+    def untracked(self):
+        """暂停当前线程的字节进度（例如解压基准测试样本时）"""
+        with self.tracking(None):
+            yield
+
+    def expect_bytes(self, count):
+        """解压后端根据文件列表报告将要写出的字节数"""
+        job = getattr(self._local, 'job', None)
+        if job is not None and count > 0:
+            job.progress.expect(count)
+
+    def report_bytes(self, count, job=None):
+        """解压后端和MP4复制回报新写出的字节数"""
+        job = job or getattr(self._local, 'job', None)
+        if job is None or count <= 0:
+            return
+        job.progress.advance(count)
+        if not job.delivering:
+            job.extracted_bytes += count
+            job.scratch_bytes += count
+            if self.metrics is not None:
+                self.metrics.scratch_add(count)
+        if self.batch_bytes is not None:
+            self.batch_bytes.advance(count)
+        if self.metrics is not None:
+            self.metrics.progress()
+        now = time.monotonic()
+        if now - job.rss_sampled_at >= self.rss_interval:
+            job.rss_sampled_at = now
+            job.observe_rss(sample_rss())
+        self.report_byte_progress(job)
+
+    def byte_reporter(self):
+        """返回把字节数记到当前任务上的函数，可以在其他线程中调用（例如py7zr的回报线程）"""
+        job = getattr(self._local, 'job', None)
+        return lambda count: self.report_bytes(count, job)
+
+    def report_byte_progress(self, job, force=False):
+        """在状态栏显示当前压缩包和整个批次的进度、速度和剩余时间"""
+        if self._progress is None:
+            return
+        now = time.monotonic()
+        with self._status_lock:
+            if not force and now - self._last_status_time < self.progress_interval and job.progress.fraction < 1:
+                return
+            self._last_status_time = now
+
+        job_progress = job.progress
+        status = (f"{os.path.basename(job.source_file)} {job_progress.fraction * 100:.0f}% "
+                  f"{format_rate(job_progress.current_rate())}（平均 {format_rate(job_progress.average_rate())}，"
+                  f"剩余 {format_eta(job_progress.eta())}）")
+        value = self.batch_progress
+        if self.batch_bytes is not None:
+            batch = self.batch_bytes
+            value = 10 + batch.fraction * 80
+            status += (f" | 批次 {batch.fraction * 100:.0f}% {format_rate(batch.current_rate())}"
+                       f"（平均 {format_rate(batch.average_rate())}，剩余 {format_eta(batch.eta())}）")
+        self.update_progress(value, status)
+
+    def run(self, source_files):
+        """处理一批源压缩包，返回 BatchResult"""
+        source_files = list(source_files)
+        self.log_message(f"开始高级批量处理工作流程，共 {len(source_files)} 个文件...")
+        self.tracer = Tracer(enabled=bool(self.config.trace_dir))
+        run_start = time.time()
+        self.update_progress(0, "初始化...")
+
+        # 分卷压缩包每组只处理一次（从第一个分卷开始）
+        source_files, orphan_volumes = group_volumes(source_files)
+        for orphan in orphan_volumes:
+            self.log_message(f"缺少第一个分卷，跳过: {os.path.basename(orphan)}")
+
+        # 内容相同的压缩包（同一个文件换了路径或名称）只处理一次
+        source_files, identities = self.identify_sources(source_files)
+
+        # 增量处理：以前已成功处理过的压缩包不再解压
+        processed = self.find_processed_archives(source_files, identities) if self.config.incremental else {}
+
+        # 断点续处理：读取上次的批次日志，已完成的压缩包不再处理
+        journal_state = self.load_journal_state() if self.config.resume else None
+        pending_files = [source_file for source_file in source_files
+                         if source_file not in processed
+                         and not self.is_completed_in_journal(journal_state, source_file)]
+
+        # 从选择临时目录开始的步骤都在 try 中：任何一步出错时都会关闭日志、删除本批次创建的临时目录
+        self.trash = None
+        metrics_started = False
+        processing_started = False
+        finished = False
+        try:
+            # 步骤0: 选择空间足够的临时目录（空间不足时在解压前报错）
+            self.prepare_scratch_directory(pending_files)
+            if self.config.cleanup_workers > 0:
+                trash_dir = os.path.join(self.scratch_dir or self.config.output_dir, ".desktop_automation_trash")
+                self.trash = TrashBin(trash_dir, self.config.cleanup_workers, delete=self.delete_trash_tree)
+
+            # MP4内容去重（可选跨批次持久化索引）；独立输出模式下每个压缩包的输出目录都应包含它的全部MP4，不去重
+            self.deduplicator = None
+            if self.config.dedup_mp4 and self.config.output_mode == "unified":
+                self.deduplicator = self.shared_deduplicator
+            if self.deduplicator is None and self.config.dedup_mp4 and self.config.output_mode == "unified":
+                index_path = (os.path.join(self.config.data_dir, "mp4_dedup_index.json")
+                              if self.config.persistent_dedup else None)
+                self.deduplicator = Mp4Deduplicator(index_path)
+
+            # 步骤1: 根据输出模式创建输出目录
+            self.unified_output_dir = None
+            if self.config.output_mode == "unified":
+                previous_dir = journal_state.unified_output_dir if journal_state is not None else None
+                if previous_dir and os.path.isdir(previous_dir):
+                    self.unified_output_dir = previous_dir
+                    self.log_message(f"继续使用上次的输出目录: {previous_dir}")
+                elif self.config.unified_output_dir:
+                    self.unified_output_dir = self.config.unified_output_dir
+                    os.makedirs(self.unified_output_dir, exist_ok=True)
+                else:
+                    self.create_unified_output_directory()
+                self.log_message("使用统一输出模式")
+            else:
+                self.log_message("使用独立输出模式")
+            self.update_progress(5, "创建输出目录完成")
+
+            # 步骤2: 为每个源文件创建独立任务并处理
+            jobs = [ArchiveJob(source_file, i) for i, source_file in enumerate(source_files)]
+            result = BatchResult(jobs)
+            result.unified_output_dir = self.unified_output_dir
+            for orphan in orphan_volumes:
+                result.failed_files.append(orphan)
+                result.failed_reasons[orphan] = "缺少第一个分卷"
+            for job in jobs:
+                if len(job.volume_parts) > 1:
+                    self.log_message(f"分卷压缩包: {os.path.basename(job.source_file)}（{len(job.volume_parts)} 个分卷）")
+            self.total_jobs = total_files = len(jobs)
+            self.batch_bytes = BatchProgress(jobs)
+
+            self.open_journal(journal_state, source_files)
+            if self.metrics is not None:
+                self.metrics.start_batch(total_files, self.metrics_slot)
+                metrics_started = True
+
+            # 上次已完成的压缩包直接采用日志中的结果，中断的压缩包先清理再重做
+            if journal_state is not None:
+                self.restore_jobs_from_journal(jobs, journal_state)
+            for job in jobs:
+                if not job.reused and job.source_file in processed:
+                    self.reuse_processed_archive(job, processed[job.source_file])
+            pending_jobs = [job for job in jobs if not job.reused]
+            completed = 0
+            for job in jobs:
+                if job.reused:
+                    completed += 1
+                    result.add_job(job)
+                    if self.metrics is not None:
+                        self.metrics.finish_job(job, completed, self.metrics_slot)
+
+            max_workers = self.get_max_workers(len(pending_jobs))
+            self.log_message(f"并行任务数: {max_workers}")
+            batch_start = time.time()
+            processing_started = True
+
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                futures = [executor.submit(self.run_archive_job, job) for job in pending_jobs]
+                for future in as_completed(futures):
+                    job = future.result()
+                    completed += 1
+                    result.add_job(job)
+                    if self.metrics is not None:
+                        self.metrics.finish_job(job, completed, self.metrics_slot)
+
+                    # 更新进度（按字节计算，已完成的任务计为100%）
+                    archives_per_min, mb_per_sec = self.calculate_throughput(
+                        completed, result.total_bytes, time.time() - batch_start)
+                    progress = 10 + self.batch_bytes.fraction * 80
+                    self.update_progress(progress, f"已处理 {completed}/{total_files} 个文件 "
+                                                   f"({archives_per_min:.1f} 个/分钟, {mb_per_sec:.2f} MB/s，"
+                                                   f"剩余 {format_eta(self.batch_bytes.eta())})")
+
+            # 保存重复文件清单和去重索引
+            if self.deduplicator is not None:
+                self.save_dedup_results(result)
+
+            # 步骤3: 最终清理
+            if self.config.auto_cleanup:
+                with self.trace("final_cleanup", files=len(result.cleanup_files)):
+                    self.final_cleanup(result.cleanup_files)
+                for job in jobs:
+                    self.release_scratch(job)
+                self.update_progress(95, "清理完成")
+
+            self.save_fingerprints(jobs, identities)
+            self.journal_record("batch_finished")
+            finished = True
+        finally:
+            self.close_trash()
+            self.close_journal()
+            self.write_trace()
+            if metrics_started:
+                self.metrics.finish_batch(time.time() - run_start, self.metrics_slot)
+            # 出错时删除本批次创建的临时目录（还没开始解压时其中没有需要保留的文件）
+            if not finished and (self.config.auto_cleanup or not processing_started):
+                self.remove_scratch_directory()
+
+        result.elapsed = time.time() - batch_start
+        archives_per_min, mb_per_sec = result.throughput
+        self.update_progress(100, "批量处理完成！")
+        self.log_message(f"批量处理完成！成功处理 {result.successful_count}/{total_files} 个文件，提取了 {len(result.mp4_files)} 个MP4文件")
+        self.log_message(f"总吞吐量: {archives_per_min:.1f} 个压缩包/分钟, {mb_per_sec:.2f} MB/s")
+        process_peak = peak_rss()
+        if process_peak is not None:
+            self.log_message(f"进程峰值内存: {format_size(process_peak)}")
+        if self.memory_budget.limited:
+            self.log_message(f"解压内存预算: 最多占用 {format_size(self.memory_budget.peak)}，"
+                             f"上限 {format_size(self.memory_budget.limit)}")
+
+        if result.failed_files:
+            self.log_message(f"失败文件数量: {len(result.failed_files)}")
+
+        return result
+
+    def estimate_scratch_bytes(self, source_file):
+        """根据文件列表估算解压单个压缩包需要的临时空间（字节）
+
+        内部压缩包解压后与原压缩包同时存在，按两倍计算；
+        无法列出文件时（例如压缩的TAR、文件头加密的7z）按压缩包大小估计。
+        """
+        fmt = archive_format(source_file)
+        for backend in self.backends.available_backends(fmt) if fmt else []:
+            members = backend.list_member_sizes(source_file)
+            if members is None:
+                continue
+            required = 0
+            for name, size in members:
+                if self.config.selective_extract and not self.is_wanted_member(name):
+                    continue
+                is_archive = name.lower().endswith(self.archive_extensions)
+                required += size * 2 if is_archive and self.config.recursive_extract else size
+            return required
+        try:
+            return int(os.path.getsize(source_file) * self.scratch_estimate_ratio)
+        except OSError:
+            return 0
+
+    def required_scratch_bytes(self, estimates, same_device_as_output):
+        """一批压缩包同时占用的最大临时空间
+
+        开启自动清理时只有并行处理中的任务占用空间；但临时目录与输出目录
+        在同一磁盘时，输出的MP4会一直留在该磁盘上，按全部任务计算。
+        """
+        if self.config.auto_cleanup and not same_device_as_output:
+            workers = self.get_max_workers(len(estimates))
+            peak = sum(sorted(estimates, reverse=True)[:workers])
+        else:
+            peak = sum(estimates)
+        return int(peak * self.scratch_safety_factor)
+
+    def prepare_scratch_directory(self, source_files):
+        """选择本批次的临时目录，空间不足时抛出 ScratchSpaceError
+
+        候选目录按配置顺序检查，选择第一个可用空间足够的；没有配置时使用输出目录。
+        单独配置的临时目录中为每个批次创建一个子目录，清理时不会误删其他程序的文件。
+        """
+        candidates = self.config.scratch_dirs or [self.config.output_dir]
+        self.scratch_dir = None
+        self._owns_scratch_dir = False
+
+        chosen = candidates[0]
+        if self.config.check_scratch_space:
+            estimates = [self.estimate_scratch_bytes(source_file) for source_file in source_files]
+            try:
+                output_device = os.stat(self.config.output_dir).st_dev
+            except OSError:
+                output_device = None
+
+            chosen = None
+            report = []
+            for candidate in candidates:
+                try:
+                    os.makedirs(candidate, exist_ok=True)
+                    free = shutil.disk_usage(candidate).free
+                    same_device = os.stat(candidate).st_dev == output_device
+                except OSError as e:
+                    report.append(f"{candidate}: 不可用（{e}）")
+                    continue
+                required = self.required_scratch_bytes(estimates, same_device)
+                report.append(f"{candidate}: 需要 {required / (1024 ** 3):.2f} GB，可用 {free / (1024 ** 3):.2f} GB")
+                if free >= required:
+                    chosen = candidate
+                    break
+            self.log_message("临时空间预检: " + "; ".join(report))
+            if chosen is None:
+                raise ScratchSpaceError("没有空间足够的临时目录: " + "; ".join(report))
+
+        if os.path.abspath(chosen) == os.path.abspath(self.config.output_dir):
+            self.scratch_dir = self.config.output_dir
+        else:
+            os.makedirs(chosen, exist_ok=True)
+            self.scratch_dir = tempfile.mkdtemp(prefix=f"desktop_automation_{datetime.now().strftime('%Y%m%d_%H%M%S')}_",
+                                                dir=chosen)
+            self._owns_scratch_dir = True
+        self.log_message(f"使用临时目录: {self.scratch_dir}")
+        return self.scratch_dir
+
+    def identify_sources(self, source_files):
+        """计算源压缩包的指纹并去掉重复的压缩包，返回 (要处理的文件, {路径: 指纹})
+
+        大小相同时才计算快速摘要；关闭快速摘要时只能识别相同的路径。
+        """
+        self.fingerprints.use_hash = self.config.fingerprint_hash
+        selected = []
+        identities = {}
+        for source_file in source_files:
+            try:
+                identity = self.fingerprints.identify(source_file, volume_parts(source_file))
+            except OSError:
+                selected.append(source_file)  # 文件无法访问，处理时报告失败
+                continue
+            duplicate = next((other for other in identities.values() if identity.same_content(other)), None)
+            if duplicate is not None:
+                self.log_message(f"与 {os.path.basename(duplicate.path)} 是同一个压缩包，跳过: {os.path.basename(source_file)}")
+                continue
+            identities[source_file] = identity
+            selected.append(source_file)
+        return selected, identities
+
+    def find_processed_archives(self, source_files, identities):
+        """查找以前已成功处理过的压缩包，返回 {路径: 指纹记录}"""
+        processed = {}
+        for source_file in source_files:
+            identity = identities.get(source_file)
+            if identity is None:
+                continue
+            try:
+                entry, same_path = self.fingerprints.find(identity)
+            except OSError:
+                continue
+            if entry is None:
+                continue
+            name = os.path.basename(source_file)
+            if self.config.redeliver_processed and not all(os.path.isfile(path) for path in entry.get("outputs", [])):
+                self.log_message(f"以前输出的MP4已不存在，重新处理: {name}")
+                continue
+            if not same_path:
+                self.log_message(f"{name} 与以前处理过的 {os.path.basename(entry.get('path', ''))} 是同一个压缩包")
+            processed[source_file] = entry
+        if processed:
+            self.log_message(f"增量处理: {len(processed)} 个压缩包以前已处理过")
+        return processed
+
+    def reuse_processed_archive(self, job, entry):
+        """采用以前处理的结果：直接报告以前的MP4，或重新输出到本批次的输出目录"""
+        job.reused = True
+        job.success = True
+        outputs = [path for path in entry.get("outputs", []) if os.path.isfile(path)]
+        name = os.path.basename(job.source_file)
+        if self.config.redeliver_processed:
+            if self.config.output_mode == "individual":
+                self.setup_individual_output_directory(job.source_file, job)
+            else:
+                job.output_dir = self.unified_output_dir
+            strategy_counts = {}
+            for path in outputs:
+                output_path = self.reserve_output_path(job.output_dir, os.path.basename(path))
+                strategy = self.deliver_file(path, output_path, keep_source=True)
+                strategy_counts[strategy] = strategy_counts.get(strategy, 0) + 1
+                job.mp4_files.append(output_path)
+                if self.deduplicator is not None:
+                    self.deduplicator.register(output_path)
+            summary = ", ".join(f"{self.delivery_strategy_names[key]} {count} 个" for key, count in strategy_counts.items())
+            self.log_message(f"以前已处理过，重新输出 {len(outputs)} 个MP4: {name}" + (f"（{summary}）" if summary else ""))
+        else:
+            job.mp4_files = outputs
+            self.log_message(f"以前已处理过，跳过: {name}（{len(outputs)} 个MP4）")
+        job.progress.finish()
+        self.journal_record("delivered", job, outputs=job.mp4_files)
+        self.journal_record("finished", job, success=True, failed_reasons={})
+
+    def save_fingerprints(self, jobs, identities):
+        """记录本批次完全成功的压缩包（包括因内容重复而没有输出的MP4对应的文件）"""
+        recorded = 0
+        for job in jobs:
+            if job.reused or not job.success or job.failed_files:
+                continue
+            try:
+                identity = identities.get(job.source_file) or self.fingerprints.identify(job.source_file, job.volume_parts)
+                outputs = job.mp4_files + [duplicate["duplicate_of"] for duplicate in job.duplicates]
+                self.fingerprints.record(identity, outputs)
+                recorded += 1
+            except OSError as e:
+                self.log_message(f"记录压缩包指纹失败 {os.path.basename(job.source_file)}: {str(e)}")
+        if recorded:
+            try:
+                self.fingerprints.save()
+            except OSError as e:
+                self.log_message(f"保存压缩包指纹失败: {str(e)}")
+
+    def load_journal_state(self):
+        """读取上次的批次日志，没有日志时返回None（按新批次处理）"""
+        state = BatchJournal.load(self.config.journal_path)
+        if state is None:
+            self.log_message("没有找到批次日志，从头开始处理")
+            return None
+        finished = sum(1 for entry in state.entries.values() if entry.finished)
+        interrupted = sum(1 for entry in state.entries.values() if entry.interrupted)
+        self.log_message(f"从批次日志继续: {finished} 个压缩包已完成，{interrupted} 个压缩包中断")
+        return state
+
+    @staticmethod
+    def is_completed_in_journal(journal_state, source_file):
+        if journal_state is None:
+            return False
+        entry = journal_state.entry(source_file)
+        return entry is not None and entry.finished
+
+    def open_journal(self, journal_state, source_files):
+        """打开批次日志：继续处理时追加记录，否则清空后开始新的批次"""
+        self.journal = None
+        try:
+            self.journal = BatchJournal(self.config.journal_path).open(append=journal_state is not None)
+        except OSError as e:
+            self.log_message(f"无法打开批次日志，本批次不能断点续处理: {str(e)}")
+            return
+        self.journal_record("batch_resumed" if journal_state is not None else "batch_started",
+                            sources=[os.path.abspath(path) for path in source_files],
+                            unified_output_dir=self.unified_output_dir, scratch_dir=self.scratch_dir)
+
+    def close_journal(self):
+        if self.journal is not None:
+            self.journal.close()
+            self.journal = None
+
+    def journal_record(self, stage, job=None, **fields):
+        """写入一条批次日志，写入失败只记录日志，不影响处理"""
+        if self.journal is None:
+            return
+        try:
+            self.journal.append(stage, os.path.abspath(job.source_file) if job is not None else None, **fields)
+        except (OSError, ValueError) as e:
+            self.log_message(f"写入批次日志失败: {str(e)}")
+
+    def restore_jobs_from_journal(self, jobs, journal_state):
+        """根据批次日志恢复已完成的任务，并清理中断任务留下的文件"""
+        for job in jobs:
+            entry = journal_state.entry(job.source_file)
+            if entry is None:
+                continue
+            if entry.finished:
+                job.reused = True
+                job.success = entry.success
+                job.output_dir = entry.output_dir
+                job.mp4_files = [path for path in entry.outputs if path and os.path.isfile(path)]
+                for failed_file, reason in entry.failed_reasons.items():
+                    job.mark_failed(failed_file, reason)
+                job.progress.finish()
+                if self.deduplicator is not None:
+                    for mp4_file in job.mp4_files:
+                        self.deduplicator.register(mp4_file)
+                self.log_message(f"已完成，跳过: {os.path.basename(job.source_file)}（{len(job.mp4_files)} 个MP4）")
+            elif entry.interrupted:
+                self.rollback_interrupted_job(entry)
+
+        # 上次批次单独创建的临时目录根目录
+        previous_scratch = journal_state.scratch_dir
+        if (previous_scratch and previous_scratch != self.scratch_dir
+                and os.path.basename(previous_scratch).startswith("desktop_automation_")
+                and os.path.isdir(previous_scratch)):
+            shutil.rmtree(previous_scratch, ignore_errors=True)
+            self.log_message(f"删除上次批次的临时目录: {previous_scratch}")
+
+    def rollback_interrupted_job(self, entry):
+        """删除中断的压缩包已输出的文件和临时目录，之后从头处理"""
+        self.log_message(f"上次在\"{entry.stage}\"阶段中断，重新处理: {os.path.basename(entry.source_file)}")
+        for path in entry.outputs:
+            try:
+                if path and os.path.isfile(path):
+                    os.remove(path)
+                    self.log_message(f"删除中断时输出的文件: {os.path.basename(path)}")
+            except OSError as e:
+                self.log_message(f"删除文件失败 {os.path.basename(path)}: {str(e)}")
+        if entry.temp_dir and os.path.isdir(entry.temp_dir):
+            shutil.rmtree(entry.temp_dir, ignore_errors=True)
+            self.log_message(f"删除中断时的临时目录: {os.path.basename(entry.temp_dir)}")
+        if self.config.output_mode == "individual" and entry.output_dir:
+            try:
+                os.rmdir(entry.output_dir)  # 只删除空的独立输出目录
+            except OSError:
+                pass
+
+    def save_dedup_results(self, result):
+        """写入本批次的重复文件清单，并保存跨批次去重索引"""
+        try:
+            if result.duplicates:
+                manifest_dir = self.unified_output_dir or self.config.output_dir
+                manifest_path = os.path.join(manifest_dir,
+                                             f"重复文件清单_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+                write_manifest(manifest_path, result.duplicates)
+                self.log_message(f"跳过 {len(result.duplicates)} 个重复MP4，清单已保存到: {manifest_path}")
+            self.deduplicator.save_index()
+        except Exception as e:
+            self.log_message(f"保存去重结果失败: {str(e)}")
+
+    def get_max_workers(self, total_files):
+        """获取并行任务数（至少1个，不超过文件数量）"""
+        try:
+            max_workers = int(self.config.max_workers)
+        except (TypeError, ValueError):
+            max_workers = 1
+        return max(1, min(max_workers, total_files))
+
+    @staticmethod
+    def calculate_throughput(archive_count, total_bytes, elapsed):
+        """计算吞吐量，返回 (压缩包/分钟, MB/s)"""
+        if elapsed <= 0:
+            return 0.0, 0.0
+        return archive_count * 60 / elapsed, total_bytes / (1024 * 1024) / elapsed
+
+    def run_archive_job(self, job):
+        """处理单个源压缩包：解压 -> 处理内部压缩文件 -> 提取MP4"""
+        source_name = os.path.basename(job.source_file)
+        job.start_time = time.time()
+        job.observe_rss(sample_rss())
+        with self.tracking(job), self.trace("archive", job.source_file) as span:
+            self.process_archive_job(job)
+            job.observe_rss(sample_rss())
+            if span is not None and job.peak_rss is not None:
+                span.args["peak_rss"] = job.peak_rss
+        peak = f"，峰值内存 {format_size(job.peak_rss)}" if job.peak_rss is not None else ""
+        self.log_message(f"文件处理结束: {source_name}，耗时 {job.elapsed:.1f} 秒{peak}")
+        return job
+
+    def process_archive_job(self, job):
+        """任务的各个步骤，失败时记录到任务中"""
+        source_name = os.path.basename(job.source_file)
+        try:
+            self.log_message(f"处理文件 ({job.index + 1}/{self.total_jobs}): {source_name}")
+
+            # 为每个文件创建临时目录
+            self.create_temp_directory_for_file(job.source_file, job.index, job)
+
+            # 设置当前文件的输出目录
+            if self.config.output_mode == "individual":
+                self.setup_individual_output_directory(job.source_file, job)
+            else:
+                job.output_dir = self.unified_output_dir
+            self.journal_record("started", job, temp_dir=job.temp_dir, output_dir=job.output_dir)
+
+            # 解压当前文件，并建立临时目录索引
+            with self.trace("extract_single_archive", job.source_file):
+                self.extract_single_archive(job.source_file, job)
+            job.progress.settle()
+            job.file_index.add_tree(job.temp_dir)
+            self.journal_record("extracted", job)
+
+            # 处理内部压缩文件
+            if self.config.recursive_extract:
+                with self.trace("process_internal_archives", job.source_file):
+                    self.process_internal_archives(job)
+                self.journal_record("nested_done", job)
+
+            # 提取MP4文件
+            job.delivering = True
+            with self.trace("deliver_mp4_files", job.source_file) as span:
+                self.deliver_mp4_files(job, job.output_dir)
+                job.delivering = False
+                if span is not None:
+                    span.args["files"] = len(job.mp4_files)
+                    span.args["bytes_out"] = sum(os.path.getsize(path) for path in job.mp4_files if os.path.exists(path))
+            self.journal_record("delivered", job, outputs=job.mp4_files)
+
+            # 清理当前文件的临时目录
+            if self.config.auto_cleanup:
+                with self.trace("cleanup_temp", job.source_file):
+                    self.cleanup_current_temp_files(job)
+                self.release_scratch(job)
+                self.journal_record("cleaned", job)
+
+            job.success = True
+
+        except Exception as e:
+            self.log_message(f"处理文件失败 {source_name}: {str(e)}")
+            job.error = str(e)
+            job.mark_failed(job.source_file, str(e))
+        finally:
+            job.delivering = False
+            job.end_time = time.time()
+            job.progress.finish()
+        # 进程被终止（或 KeyboardInterrupt）时没有这条记录，继续处理时按中断处理
+        self.journal_record("finished", job, success=job.success, failed_reasons=job.failed_reasons)
+
+    def release_scratch(self, job):
+        """任务的临时目录已删除：从临时空间占用中减去该任务解压的字节数"""
+        if self.metrics is not None and job.scratch_bytes:
+            self.metrics.scratch_release(job.scratch_bytes)
+        job.scratch_bytes = 0
+
+    def create_unified_output_directory(self):
+        """创建统一输出目录"""
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        self.unified_output_dir = os.path.join(self.config.output_dir, f"批量提取结果_{timestamp}")
+        os.makedirs(self.unified_output_dir, exist_ok=True)
+        self.log_message(f"创建统一输出目录: {self.unified_output_dir}")
+        return self.unified_output_dir
+
+    def setup_individual_output_directory(self, source_file, job=None):
+        """为单个文件设置独立输出目录"""
+        # 获取用户配置的输出目录，如果没有则使用默认目录
+        individual_output_dir = self.config.file_output_dirs.get(source_file, self.config.output_dir)
+
+        # 创建以文件名命名的子目录
+        filename_without_ext = os.path.splitext(os.path.basename(source_file))[0]
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        output_dir = os.path.join(individual_output_dir, f"{filename_without_ext}_{timestamp}")
+        os.makedirs(output_dir, exist_ok=True)
+        if job is not None:
+            job.output_dir = output_dir
+
+        self.log_message(f"创建独立输出目录: {output_dir}")
+        return output_dir
+
+    def create_temp_directory_for_file(self, source_file, index, job):
+        """为单个文件创建临时工作目录"""
+        filename = os.path.splitext(os.path.basename(source_file))[0]
+        temp_dir = os.path.join(self.scratch_dir or self.config.output_dir, f"temp_{index}_{filename}")
+        os.makedirs(temp_dir, exist_ok=True)
+        job.temp_dir = temp_dir
+        self.log_message(f"创建临时目录: {temp_dir}")
+        return temp_dir
+
+    def extract_single_archive(self, source_file, job):
+        """解压单个压缩包到任务的临时目录"""
+        self.log_message(f"开始解压: {os.path.basename(source_file)}")
+
+        try:
+            fmt = self.detect_archive_format(source_file)
+            if fmt is None:
+                raise ValueError(f"不支持的文件格式: {Path(source_file).suffix.lower()}")
+            if fmt == '7z':
+                with self.trace("extract_7z_file", source_file):
+                    self.extract_7z_file(source_file, job.temp_dir, job)
+            else:
+                backend = self.backends.select(fmt, engine=self, need_volumes=len(job.volume_parts) > 1)
+                backend.extract(self, source_file, job.temp_dir)
+                self.log_message(f"{fmt}文件解压成功（{backend.name}）: {os.path.basename(source_file)}")
+
+        except Exception as e:
+            raise Exception(f"解压文件失败 {os.path.basename(source_file)}: {str(e)}")
+
+    def is_wanted_member(self, member_name):
+        """判断压缩包成员是否需要解压（选择性解压模式）
+
+        保留MP4文件和内部压缩包；开启智能格式检测时，没有扩展名的文件
+        可能是伪装的压缩包，也一并保留。
+        """
+        name = member_name.replace('\\', '/').rsplit('/', 1)[-1].lower()
+        if name.endswith(self.output_extensions) or name.endswith(self.archive_extensions):
+            return True
+        if parse_volume(name) is not None:
+            # 分卷压缩包的后续分卷（.002、.part2.rar 等）
+            return True
+        return '.' not in name and self.config.smart_format_detection
+
+    def get_max_nesting_depth(self):
+        """获取嵌套压缩包的最大解压深度（未开启递归解压时为0）"""
+        if not self.config.recursive_extract:
+            return 0
+        try:
+            return max(1, int(self.config.max_nesting_depth))
+        except (TypeError, ValueError):
+            return 10
+
+    def extract_archive_members(self, archive, extract_dir, depth=0):
+        """解压已打开的压缩包，选择性解压模式下只解压需要的成员
+
+        先读取压缩包的文件列表，只解压MP4和内部压缩包，图片、字幕等无关文件
+        不会被解压和写入磁盘。
+        """
+        if self.config.stream_nested_archives and isinstance(archive, (zipfile.ZipFile, tarfile.TarFile)):
+            self.stream_extract_archive(archive, extract_dir, depth)
+            return
+
+        selective = self.config.selective_extract
+        skipped_count = 0
+        skipped_bytes = 0
+
+        if isinstance(archive, tarfile.TarFile):
+            # 逐个成员顺序解压，避免对压缩流做两遍扫描（没有文件列表，按压缩包大小估计进度）
+            for member in archive:
+                if member.isdir():
+                    continue
+                if member.isfile() and (not selective or self.is_wanted_member(member.name)):
+                    self.extract_member(archive, member, extract_dir)
+                elif not selective:
+                    archive.extract(member, extract_dir)
+                else:
+                    skipped_count += 1
+                    skipped_bytes += member.size
+        elif not hasattr(archive, 'infolist'):
+            # py7zr.SevenZipFile：按成员名称列表解压，解压字节数由py7zr的回报线程给出
+            callback = make_py7zr_callback(self.byte_reporter())
+            targets = []
+            target_bytes = 0
+            for info in archive.list():
+                if info.is_directory:
+                    continue
+                if not selective or self.is_wanted_member(info.filename):
+                    targets.append(info.filename)
+                    target_bytes += info.uncompressed or 0
+                else:
+                    skipped_count += 1
+                    skipped_bytes += info.uncompressed or 0
+            self.expect_bytes(target_bytes)
+            if not selective:
+                archive.extractall(path=extract_dir, callback=callback)
+            elif targets:
+                archive.extract(path=extract_dir, targets=targets, callback=callback)
+        else:
+            # zipfile.ZipFile / rarfile.RarFile 接口一致
+            members = []
+            for info in archive.infolist():
+                if info.is_dir():
+                    continue
+                if not selective or self.is_wanted_member(info.filename):
+                    members.append(info)
+                else:
+                    skipped_count += 1
+                    skipped_bytes += info.file_size
+            self.expect_bytes(sum(info.file_size for info in members))
+            for info in members:
+                if getattr(info, 'is_symlink', lambda: False)():
+                    archive.extract(info, extract_dir)
+                else:
+                    self.extract_member(archive, info, extract_dir)
+
+        if skipped_count:
+            self.log_message(f"选择性解压: 跳过 {skipped_count} 个无关文件 ({skipped_bytes / (1024 * 1024):.1f} MB)")
+
+    def stream_extract_archive(self, archive, extract_dir, depth=0):
+        """流式解压ZIP/TAR压缩包，内部的ZIP/TAR直接从父成员的文件对象打开
+
+        内部TAR以流模式逐个读取成员；内部ZIP需要随机访问，先缓冲到
+        SpooledTemporaryFile（小文件留在内存中）。嵌套压缩包不再写入临时目录，
+        只有MP4等最终文件和无法流式处理的压缩包（7z、rar等）会写入磁盘。
+        """
+        is_tar = isinstance(archive, tarfile.TarFile)
+        members = archive if is_tar else archive.infolist()
+        max_depth = self.get_max_nesting_depth()
+        job = getattr(self._local, 'job', None)
+        if not is_tar:
+            self.expect_bytes(sum(info.file_size for info in members if not info.is_dir() and (
+                not self.config.selective_extract or self.is_wanted_member(info.filename))))
+
+        streamed_count = 0
+        skipped_count = 0
+        for member in members:
+            if is_tar:
+                if not member.isfile():
+                    continue
+                member_name, member_size = member.name, member.size
+            else:
+                if member.is_dir():
+                    continue
+                member_name, member_size = member.filename, member.file_size
+
+            lower_name = member_name.lower()
+
+            if depth < max_depth and lower_name.endswith(self.streamable_tar_extensions):
+                # 内部TAR：直接以流模式读取父成员
+                member_file = archive.extractfile(member) if is_tar else archive.open(member)
+                with member_file, tarfile.open(fileobj=member_file, mode='r|*') as inner_tar:
+                    self.stream_extract_archive(inner_tar, self.nested_extract_dir(extract_dir, member_name), depth + 1)
+                streamed_count += 1
+
+            elif depth < max_depth and lower_name.endswith(self.streamable_zip_extensions):
+                # 内部ZIP：缓冲到内存（超过阈值时自动转存临时文件）后打开；内存预算不足时直接使用临时文件
+                member_file = archive.extractfile(member) if is_tar else archive.open(member)
+                with member_file, self.memory_budget.borrow(min(member_size, self.config.spool_threshold)) as spool_size, \
+                        self.spool_file(spool_size) as spool:
+                    self.copy_stream(member_file, spool)
+                    spool.seek(0)
+                    with zipfile.ZipFile(spool) as inner_zip:
+                        self.stream_extract_archive(inner_zip, self.nested_extract_dir(extract_dir, member_name),
+                                                    depth + 1)
+                streamed_count += 1
+
+            elif not self.config.selective_extract or self.is_wanted_member(member_name):
+                target_path = self.extract_member(archive, member, extract_dir)
+                if depth > 0 and job is not None and not lower_name.endswith(self.output_extensions):
+                    # 可能是无法流式处理的压缩包（7z、rar等），之后按实际嵌套深度处理
+                    job.nested_depths[target_path] = depth + 1
+
+            else:
+                skipped_count += 1
+
+        if streamed_count:
+            self.log_message(f"流式解压: 直接处理了 {streamed_count} 个嵌套压缩包")
+        if skipped_count:
+            self.log_message(f"选择性解压: 跳过 {skipped_count} 个无关文件")
+
+    def extract_member(self, archive, member, extract_dir):
+        """把ZIP/TAR/RAR的一个文件成员分块写到解压目录，并回报写出的字节数
+
+        成员路径中的绝对路径、盘符和 .. 会被去掉，不会写到解压目录之外。
+        """
+        if isinstance(archive, tarfile.TarFile):
+            member_name = member.name
+            source = archive.extractfile(member)
+        else:
+            member_name = member.filename
+            source = archive.open(member)
+
+        target_path = self.member_target_path(extract_dir, member_name)
+        os.makedirs(os.path.dirname(target_path), exist_ok=True)
+        with source, open(target_path, 'wb') as target:
+            self.copy_stream(source, target)
+        return target_path
+
+    @classmethod
+    def nested_extract_dir(cls, extract_dir, member_name):
+        """流式解压的内部压缩包的解压目录（与普通成员一样去掉 .. 等不安全的路径部分）"""
+        return os.path.splitext(cls.member_target_path(extract_dir, member_name))[0] + "_extracted"
+
+    @staticmethod
+    def member_target_path(extract_dir, member_name):
+        """压缩包成员在解压目录中的安全路径"""
+        parts = []
+        for part in member_name.replace('\\', '/').split('/'):
+            if os.name == 'nt':
+                part = part.translate(WINDOWS_INVALID_CHARS).rstrip('. ')
+            if part and part not in ('.', '..'):
+                parts.append(part)
+        if not parts:
+            raise ValueError(f"无效的成员路径: {member_name}")
+        target_path = os.path.join(extract_dir, *parts)
+        # 已解压的符号链接也不能把文件引到解压目录之外
+        real_dir = os.path.realpath(extract_dir)
+        if not os.path.realpath(target_path).startswith(real_dir + os.sep):
+            raise ValueError(f"成员路径超出解压目录: {member_name}")
+        return target_path
+
+    @staticmethod
+    def spool_file(max_size):
+        """内部ZIP的缓冲文件：max_size 为0时直接使用磁盘上的临时文件
+
+        SpooledTemporaryFile(max_size=0) 永远不会转存到磁盘，不能用来表示“不占内存”。
+        """
+        if max_size > 0:
+            return tempfile.SpooledTemporaryFile(max_size=max_size)
+        return tempfile.TemporaryFile()
+
+    def copy_buffer(self):
+        """当前线程复用的复制缓冲区（大小固定，不随成员大小增长）"""
+        buffer = getattr(self._local, 'copy_buffer', None)
+        if buffer is None or len(buffer) != self.config.copy_buffer_size:
+            buffer = self._local.copy_buffer = memoryview(bytearray(self.config.copy_buffer_size))
+        return buffer
+
+    def copy_stream(self, source, target):
+        """通过固定大小的缓冲区分块复制文件对象，每块回报一次字节数"""
+        report = self.byte_reporter()
+        buffer = self.copy_buffer()
+        readinto = getattr(source, 'readinto', None)
+        while True:
+            if readinto is not None:
+                count = readinto(buffer)
+                if not count:
+                    break
+                target.write(buffer[:count])
+            else:
+                chunk = source.read(len(buffer))
+                if not chunk:
+                    break
+                count = len(chunk)
+                target.write(chunk)
+            report(count)
+
+    def process_internal_archives(self, job):
+        """递归处理内部压缩文件（工作队列 + 深度限制）
+
+        每一轮只检查新解压出来的目录，不重复扫描整个临时目录；
+        超过最大嵌套深度或与上层压缩包内容相同（循环嵌套）的压缩包会被跳过。
+        """
+        self.log_message("开始处理内部压缩文件...")
+        max_depth = self.get_max_nesting_depth()
+
+        # 步骤1: 按文件头识别第一层压缩文件，加入工作队列
+        # 队列元素: (压缩文件路径, 嵌套深度, 上层压缩包的内容签名)
+        with self.trace("detect_formats", job.source_file):
+            archive_files = self.find_archives(job, job.file_index.files())
+        self.log_message(f"发现 {len(archive_files)} 个内部压缩文件")
+        queue = deque((archive_file, job.nested_depths.get(archive_file, 1), ()) for archive_file in archive_files)
+        visited = set()
+
+        # 步骤2: 逐个解压，新解压出的压缩文件加入队列
+        total_archives = 0
+        successful_extractions = 0
+        while queue:
+            archive_file, depth, ancestors = queue.popleft()
+            real_path = os.path.realpath(archive_file)
+            if real_path in visited or not os.path.exists(archive_file):
+                continue
+            visited.add(real_path)
+
+            if depth > max_depth:
+                self.log_message(f"超过最大嵌套深度 {max_depth}，跳过: {os.path.basename(archive_file)}")
+                continue
+
+            signature = self.archive_signature(archive_file)
+            if signature in ancestors:
+                self.log_message(f"检测到循环嵌套，跳过: {os.path.basename(archive_file)}")
+                continue
+
+            total_archives += 1
+            try:
+                self.log_message(f"解压内部文件 (第{depth}层): {os.path.basename(archive_file)}")
+
+                # 创建解压目录
+                extract_dir = os.path.splitext(archive_file)[0] + "_extracted"
+                os.makedirs(extract_dir, exist_ok=True)
+
+                # 根据文件类型解压
+                with self.trace("extract_archive_file", archive_file, depth=depth):
+                    success = self.extract_archive_file(archive_file, extract_dir, job, depth)
+
+                # 只扫描新写入的目录，并识别其中的压缩文件
+                new_entries = job.file_index.add_tree(extract_dir)
+                with self.trace("detect_formats", archive_file, depth=depth):
+                    new_archives = self.find_archives(job, new_entries)
+                for new_archive in new_archives:
+                    queue.append((new_archive, job.nested_depths.get(new_archive, depth + 1), ancestors + (signature,)))
+
+                if success:
+                    successful_extractions += 1
+                    # 将原压缩文件（分卷压缩包的所有分卷）添加到清理列表
+                    job.cleanup_files.extend(volume_parts(archive_file))
+
+            except Exception as e:
+                self.log_message(f"解压文件失败 {os.path.basename(archive_file)}: {str(e)}")
+                continue
+
+        self.log_message(f"内部压缩文件处理完成，成功解压 {successful_extractions}/{total_archives} 个文件")
+
+    @staticmethod
+    def archive_signature(file_path, sample_size=64 * 1024):
+        """压缩文件的内容签名（大小 + 文件头部摘要），用于检测循环嵌套"""
+        try:
+            with open(file_path, 'rb') as f:
+                head = f.read(sample_size)
+            return os.path.getsize(file_path), hashlib.sha1(head).hexdigest()
+        except OSError:
+            return file_path
+
+    def detect_archive_format(self, file_path):
+        """判断文件的压缩格式：开启智能格式检测时按文件头识别（结果缓存），否则按扩展名
+
+        文件头无法识别时（例如7z分卷的后续部分）退回按扩展名判断，不是压缩包时返回None。
+        """
+        if self.config.smart_format_detection:
+            fmt = self.sniffer.archive_format(file_path)
+            if fmt is not None:
+                return fmt
+        return archive_format(file_path)
+
+    def find_archives(self, job, entries):
+        """从索引记录中找出压缩文件（包括扩展名不对或没有扩展名的），返回路径列表
+
+        文件不会被重命名，识别出的格式缓存在 self.sniffer 中，解压时直接使用。
+        分卷压缩包只返回第一个分卷，后续分卷在解压第一个分卷时一起读取。
+        """
+        archive_files = []
+        later_volumes = 0
+        for entry in entries:
+            if entry.kind == 'mp4':
+                continue
+            if is_later_volume(entry.path):
+                later_volumes += 1
+                continue
+            fmt = self.detect_archive_format(entry.path)
+            if fmt is None:
+                continue
+            if entry.kind != 'archive':
+                job.file_index.set_kind(entry.path, 'archive')
+                self.log_message(f"按文件头识别为{fmt.upper()}压缩包: {entry.name}")
+            archive_files.append(entry.path)
+        if later_volumes:
+            self.log_message(f"跳过 {later_volumes} 个后续分卷（随第一个分卷一起解压）")
+        return archive_files
+
+    def extract_archive_file(self, archive_path, extract_dir, job, depth=1):
+        """解压单个内部压缩文件，使用为该格式选择的解压后端"""
+        filename = os.path.basename(archive_path)
+
+        try:
+            fmt = self.detect_archive_format(archive_path)
+            if fmt is None:
+                raise ValueError(f"不支持的压缩格式: {Path(archive_path).suffix.lower()}")
+            if fmt == '7z':
+                # .001文件通常是7z分卷压缩的第一部分
+                with self.trace("extract_7z_file", archive_path, depth=depth):
+                    return self.extract_7z_file(archive_path, extract_dir, job, depth)
+
+            backend = self.backends.select(fmt, engine=self, need_volumes=len(volume_parts(archive_path)) > 1)
+            backend.extract(self, archive_path, extract_dir, depth)
+            self.log_message(f"{fmt.upper()}文件解压成功（{backend.name}）: {filename}")
+            return True
+
+        except Exception as e:
+            self.log_message(f"解压文件失败 {filename}: {str(e)}")
+            # 添加到失败列表
+            job.mark_failed(archive_path, str(e))
+            return False
+
+    def extract_7z_file(self, archive_path, extract_dir, job, depth=0):
+        """解压7z文件（增强密码支持和交互式处理）
+
+        先解码第一个成员的开头快速验证候选密码，只用正确的密码做一次完整解压，
+        错误的密码不会解压大量数据或留下不完整的文件。单独验证和完整解压一样慢的
+        后端（外部7z）直接用排在第一的候选完整解压，密码错误时才验证其余的候选。
+        不需要密码的压缩包使用最快的7z后端，加密的压缩包使用支持密码的后端。
+        """
+        need_volumes = len(volume_parts(archive_path)) > 1
+        try:
+            password_backend = self.backends.select('7z', need_password=True, engine=self, need_volumes=need_volumes)
+        except BackendUnavailableError:
+            password_backend = None
+
+        # 准备密码列表（按历史命中率排序）并验证
+        stats_keys = PasswordStatsStore.make_keys(archive_path, job.source_file)
+        if password_backend is None:
+            password, last_error = "", None
+        else:
+            candidates = passwords_to_try = self.password_stats.rank(self.get_7z_password_candidates(), stats_keys)
+            if (passwords_to_try and password_backend.extract_to_verify
+                    and password_backend.needs_password(archive_path)):
+                # 单独测试密码要把第一个成员完整解码一遍：排在第一的候选直接完整解压，密码错误时解压很快失败
+                extracted, last_error = self.extract_with_first_candidate(password_backend, archive_path, extract_dir,
+                                                                          depth, passwords_to_try)
+                if extracted:
+                    self.record_password_success(stats_keys, passwords_to_try[0])
+                    return True
+                if password_backend.is_wrong_password(last_error):
+                    passwords_to_try = passwords_to_try[1:]
+                else:
+                    passwords_to_try = []  # 文件损坏等其他错误，换密码也无法解压
+            if passwords_to_try:
+                password, last_error = self.find_7z_password(password_backend, archive_path, passwords_to_try)
+            else:
+                password = None
+
+        # 使用验证通过的密码完整解压一次
+        if password is not None:
+            try:
+                backend = (self.backends.select('7z', engine=self, need_volumes=need_volumes)
+                           if password == "" else password_backend)
+                backend.extract(self, archive_path, extract_dir, depth, password or None)
+                if password == "":
+                    self.log_message(f"7z文件解压成功（无密码，{backend.name}）: {os.path.basename(archive_path)}")
+                else:
+                    # 日志中不出现明文密码，只记录它是第几个候选
+                    self.log_message(f"7z文件解压成功（第 {candidates.index(password) + 1}/{len(candidates)} 个候选密码，"
+                                     f"{backend.name}）: {os.path.basename(archive_path)}")
+                    self.record_password_success(stats_keys, password)
+                return True
+            except BackendUnavailableError:
+                raise
+            except Exception as e:
+                last_error = e
+
+        # 所有密码都失败了
+        filename = os.path.basename(archive_path)
+        self.log_message(f"7z文件解压失败，所有密码都无效: {filename}")
+
+        # 添加到失败列表（外部7z的错误已按退出码给出原因）
+        if isinstance(last_error, SevenZipToolError):
+            reason = str(last_error)
+        else:
+            reason = f"密码错误或文件损坏: {str(last_error)}"
+        job.mark_failed(archive_path, reason)
+
+        # 可以询问新密码时（并行任务之间依次询问）
+        if self.password_prompt is not None and password_backend is not None:
+            with self._dialog_lock:
+                return self.retry_7z_with_prompted_password(password_backend, archive_path, extract_dir, last_error, job)
+        else:
+            raise Exception(f"7z文件解压失败: {filename} - 所有密码尝试都失败（{reason}）")
+
+    def extract_with_first_candidate(self, backend, archive_path, extract_dir, depth, passwords_to_try):
+        """用排在第一的候选密码直接完整解压，返回 (是否成功, 错误)
+
+        失败时删除这次解压写出的文件，之后再验证其余的候选密码。
+        """
+        filename = os.path.basename(archive_path)
+        existing = set(os.listdir(extract_dir)) if os.path.isdir(extract_dir) else set()
+        try:
+            with self.trace("password_attempt", archive_path, attempt=1):
+                backend.extract(self, archive_path, extract_dir, depth, passwords_to_try[0])
+        except BackendUnavailableError:
+            raise
+        except Exception as e:
+            if os.path.isdir(extract_dir):
+                for name in set(os.listdir(extract_dir)) - existing:
+                    path = os.path.join(extract_dir, name)
+                    if os.path.isdir(path) and not os.path.islink(path):
+                        shutil.rmtree(path, ignore_errors=True)
+                    else:
+                        os.remove(path)
+            return False, e
+        if self.metrics is not None:
+            self.metrics.password_attempts.observe(1)
+        self.log_message(f"7z文件解压成功（第 1/{len(passwords_to_try)} 个候选密码，{backend.name}）: {filename}")
+        return True, None
+
+    def retry_7z_with_prompted_password(self, backend, archive_path, extract_dir, last_error, job):
+        """反复询问新密码直到解压成功或用户放弃"""
+        filename = os.path.basename(archive_path)
+        while True:
+            new_password = self.password_prompt(archive_path, last_error)
+            if not new_password:
+                self.log_message(f"跳过文件: {filename}")
+                return False
+            try:
+                backend.extract(self, archive_path, extract_dir, password=new_password)
+                self.log_message(f"7z文件解压成功（手动密码）: {filename}")
+                self.record_password_success(PasswordStatsStore.make_keys(archive_path, job.source_file), new_password)
+                # 从失败列表中移除
+                job.clear_failure(archive_path)
+                return True
+            except Exception as e:
+                self.log_message(f"手动密码也失败: {filename} - {str(e)}")
+                last_error = e
+
+    def get_7z_password_candidates(self):
+        """准备7z密码候选列表：默认密码、备用密码、常用密码（空字符串表示无密码）"""
+        passwords_to_try = []
+
+        # 添加默认密码
+        default_password = (self.config.password or "").strip()
+        if default_password:
+            passwords_to_try.append(default_password)
+
+        # 添加备用密码
+        for pwd in self.config.backup_passwords:
+            pwd = pwd.strip()
+            if pwd and pwd not in passwords_to_try:
+                passwords_to_try.append(pwd)
+
+        # 添加常用密码
+        common_passwords = ["", "123456", "password", "admin", "123", "000000"]
+        for pwd in common_passwords:
+            if pwd not in passwords_to_try:
+                passwords_to_try.append(pwd)
+
+        return passwords_to_try
+
+    def find_7z_password(self, backend, archive_path, passwords_to_try):
+        """在候选密码中查找正确的密码
+
+        返回 (密码, 最后的错误)。无需密码时返回空字符串，全部失败时密码为None。
+        候选密码在多个线程中并行验证，第一个验证通过的密码胜出。
+        """
+        filename = os.path.basename(archive_path)
+
+        # 未加密的压缩包不需要逐个尝试密码
+        if not backend.needs_password(archive_path):
+            return "", None
+
+        # 有内存上限时每次验证占用一个数据块的解码内存，并行验证的数量受预算限制
+        memory = None
+        if self.memory_budget.limited:
+            memory = backend.estimate_memory(archive_path) or PY7ZR_CHUNK_SIZE
+
+        last_error = None
+        attempts = 0
+        with ThreadPoolExecutor(max_workers=max(1, self.config.password_check_workers)) as executor:
+            futures = {executor.submit(self.verify_password_attempt, backend, archive_path, password, attempt,
+                                       memory): password
+                       for attempt, password in enumerate(passwords_to_try, 1)}
+            for future in as_completed(futures):
+                password = futures[future]
+                error = future.result()
+                attempts += 1
+                if error is None:
+                    # 取消尚未开始的验证
+                    for pending in futures:
+                        pending.cancel()
+                    self.log_message(f"密码验证通过（第 {passwords_to_try.index(password) + 1}/{len(passwords_to_try)} 个候选）: {filename}")
+                    if self.metrics is not None:
+                        self.metrics.password_attempts.observe(attempts)
+                    return password, None
+                last_error = error
+
+        if self.metrics is not None:
+            self.metrics.password_attempts.observe(attempts)
+        return None, last_error
+
+    def verify_password_attempt(self, backend, archive_path, password, attempt, memory=None):
+        """验证一个候选密码（在密码验证线程中运行），返回错误，密码正确时返回None"""
+        with self.memory_budget.reserve(memory), \
+                self.trace("password_attempt", archive_path, attempt=attempt) as span:
+            error = backend.verify_password(archive_path, password)
+            if span is not None:
+                span.args["ok"] = error is None
+            return error
+
+    def record_password_success(self, stats_keys, password):
+        """记录成功的密码，写入失败不影响解压流程"""
+        try:
+            self.password_stats.record_success(stats_keys, password)
+        except Exception as e:
+            self.log_message(f"保存密码统计失败: {str(e)}")
+
+    def deliver_mp4_files(self, job, output_dir):
+        """将任务临时目录中的MP4文件输出到指定目录
+
+        同一磁盘上优先使用移动或硬链接代替复制，每个文件使用的方式记录在
+        job.delivery_log 中。
+        """
+        self.log_message("搜索当前临时目录中的MP4文件...")
+
+        mp4_files = [entry.path for entry in job.file_index.mp4_files()]
+
+        self.log_message(f"在当前文件中发现 {len(mp4_files)} 个MP4文件")
+
+        strategy_counts = {}
+        for i, mp4_file in enumerate(mp4_files):
+            try:
+                filename = os.path.basename(mp4_file)
+                if self.deduplicator is None:
+                    self.deliver_mp4_file(job, mp4_file, output_dir, strategy_counts)
+                    continue
+
+                # 相同大小的文件串行检查，内容相同的只输出一次
+                size = os.path.getsize(mp4_file)
+                with self.deduplicator.size_lock(size):
+                    original = self.deduplicator.find_duplicate(mp4_file, size)
+                    if original is None:
+                        output_path = self.deliver_mp4_file(job, mp4_file, output_dir, strategy_counts)
+                        self.deduplicator.register(output_path, size)
+
+                if original is not None:
+                    job.duplicates.append({
+                        "source_archive": job.source_file,
+                        "file": os.path.relpath(mp4_file, job.temp_dir),
+                        "size": size,
+                        "duplicate_of": original,
+                    })
+                    self.log_message(f"跳过重复MP4: {filename}（与 {os.path.basename(original)} 内容相同）")
+
+            except Exception as e:
+                self.log_message(f"输出MP4文件失败 {filename}: {str(e)}")
+
+        if strategy_counts:
+            summary = ", ".join(f"{self.delivery_strategy_names[name]} {count} 个" for name, count in strategy_counts.items())
+            self.log_message(f"MP4输出方式统计: {summary}")
+
+    def deliver_mp4_file(self, job, mp4_file, output_dir, strategy_counts):
+        """输出单个MP4文件并记录输出方式，返回输出路径"""
+        output_path = self.reserve_output_path(output_dir, os.path.basename(mp4_file))
+        # 先记录再输出：中断时写了一半的文件在继续处理时会被删除
+        self.journal_record("output", job, path=output_path)
+        strategy = self.deliver_file(mp4_file, output_path)
+        if strategy == "move":
+            job.file_index.remove(mp4_file)
+        job.mp4_files.append(output_path)
+        job.delivery_log.append((mp4_file, output_path, strategy))
+        strategy_counts[strategy] = strategy_counts.get(strategy, 0) + 1
+        self.log_message(f"输出MP4文件 ({self.delivery_strategy_names[strategy]}): {os.path.basename(mp4_file)}")
+        return output_path
+
+    def deliver_file(self, source_path, output_path, keep_source=False):
+        """输出单个文件到已占位的路径，返回使用的方式: move / hardlink / copy
+
+        源文件和目标在同一设备上时：临时目录随后会被清理则直接移动，
+        否则创建硬链接保留临时目录中的文件；跨设备或失败时才复制。
+        keep_source=True 时从不移动源文件（例如重新输出以前的MP4）。
+        """
+        if self.config.zero_copy_delivery:
+            try:
+                same_device = os.stat(source_path).st_dev == os.stat(os.path.dirname(output_path)).st_dev
+            except OSError:
+                same_device = False
+
+            if same_device:
+                try:
+                    if self.config.auto_cleanup and not keep_source:
+                        os.replace(source_path, output_path)
+                        return "move"
+                    # 先链接到临时名称再原子替换占位文件
+                    link_path = output_path + ".link"
+                    os.link(source_path, link_path)
+                    os.replace(link_path, output_path)
+                    return "hardlink"
+                except OSError:
+                    pass
+
+        self.copy_file(source_path, output_path)
+        return "copy"
+
+    def copy_file(self, source_path, output_path):
+        """分块复制文件并回报字节数（保留修改时间等元数据）"""
+        self.expect_bytes(os.path.getsize(source_path))
+        with open(source_path, 'rb') as source, open(output_path, 'wb') as target:
+            self.copy_stream(source, target)
+        shutil.copystat(source_path, output_path)
+
+    @staticmethod
+    def reserve_output_path(output_dir, filename):
+        """在输出目录中占用一个不重名的文件路径
+
+        通过独占创建空文件来占位，多个并行任务同时输出同名文件时不会互相覆盖。
+        如果文件已存在，添加序号。
+        """
+        original_name, ext = os.path.splitext(filename)
+        output_path = os.path.join(output_dir, filename)
+        counter = 1
+        while True:
+            try:
+                with open(output_path, 'xb'):
+                    pass
+                return output_path
+            except FileExistsError:
+                output_path = os.path.join(output_dir, f"{original_name}_{counter}{ext}")
+                counter += 1
+
+    def discard_tree(self, path):
+        """删除目录：优先移入回收区在后台删除，返回是否为后台删除"""
+        if self.trash is not None and self.trash.discard(path):
+            return True
+        shutil.rmtree(path)
+        return False
+
+    def delete_trash_tree(self, path):
+        """在后台线程中删除回收区中的目录"""
+        with self.trace("delete_trash", path=os.path.basename(path)):
+            shutil.rmtree(path)
+
+    def close_trash(self):
+        """等待后台删除全部完成并删除回收区，失败只记录日志"""
+        if self.trash is None:
+            return
+        trash, self.trash = self.trash, None
+        pending = trash.pending
+        if pending:
+            self.log_message(f"等待后台删除 {pending} 个临时目录...")
+        deleted, errors = trash.close()
+        for path, error in errors:
+            self.log_message(f"后台删除临时目录失败 {os.path.basename(path)}: {str(error)}")
+        if deleted:
+            self.log_message(f"后台删除了 {deleted} 个临时目录")
+        if os.path.isdir(trash.trash_dir):
+            shutil.rmtree(trash.trash_dir, ignore_errors=True)
+
+    def remove_scratch_directory(self):
+        """删除本批次创建的临时目录根目录（使用输出目录作为临时目录时不删除）"""
+        if self._owns_scratch_dir and self.scratch_dir and os.path.isdir(self.scratch_dir):
+            shutil.rmtree(self.scratch_dir, ignore_errors=True)
+            self.log_message(f"删除临时目录: {self.scratch_dir}")
+
+    def cleanup_current_temp_files(self, job):
+        """清理当前文件的临时文件"""
+        try:
+            # 删除当前任务的临时目录（移入回收区后在后台删除，不等待）
+            if job.temp_dir and os.path.exists(job.temp_dir):
+                in_background = self.discard_tree(job.temp_dir)
+                job.file_index.remove_tree(job.temp_dir)
+                self.sniffer.forget_tree(job.temp_dir)
+                if in_background:
+                    self.log_message(f"临时目录移入回收区: {os.path.basename(job.temp_dir)}")
+                else:
+                    self.log_message(f"删除临时目录: {os.path.basename(job.temp_dir)}")
+
+        except Exception as e:
+            self.log_message(f"清理当前临时文件时发生错误: {str(e)}")
+
+    def final_cleanup(self, cleanup_files):
+        """最终清理所有中间文件"""
+        self.log_message("开始最终清理...")
+
+        try:
+            # 删除所有中间文件
+            for file_path in cleanup_files:
+                try:
+                    if os.path.exists(file_path):
+                        os.remove(file_path)
+                        self.log_message(f"删除中间文件: {os.path.basename(file_path)}")
+                except Exception as e:
+                    self.log_message(f"删除文件失败 {os.path.basename(file_path)}: {str(e)}")
+
+            # 清理可能残留的临时目录
+            scratch_dir = self.scratch_dir or self.config.output_dir
+            for root, dirs, files in os.walk(scratch_dir):
+                for dir_name in dirs:
+                    if dir_name.startswith('temp_'):
+                        temp_path = os.path.join(root, dir_name)
+                        try:
+                            self.discard_tree(temp_path)
+                            self.log_message(f"清理残留临时目录: {dir_name}")
+                        except Exception as e:
+                            self.log_message(f"清理临时目录失败 {dir_name}: {str(e)}")
+                break  # 只检查顶层目录
+
+            # 等待后台删除完成（回收区在临时目录根目录中）
+            self.close_trash()
+            # 本批次的文件格式识别缓存不再需要（监视模式下引擎会长期运行）
+            self.sniffer.clear()
+
+            # 删除本批次创建的临时目录根目录
+            self.remove_scratch_directory()
+
+        except Exception as e:
+            self.log_message(f"最终清理过程中发生错误: {str(e)}")
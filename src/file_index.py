@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+临时目录文件索引 - 每个处理任务只扫描一次磁盘
+功能：用os.scandir记录临时目录中每个文件的路径、大小和类型，各处理步骤查询索引而不是重复遍历目录
+"""
+
+import os
+
+# 文件类型判断使用的扩展名
+MP4_SUFFIXES = ('.mp4',)
+ARCHIVE_SUFFIXES = ('.zip', '.rar', '.7z', '.001', '.tar.gz', '.tar.bz2', '.tar.xz')
+
+
+def detect_kind(file_name):
+    """根据文件名判断类型：mp4 / archive / other"""
+    lower_name = file_name.lower()
+    if lower_name.endswith(MP4_SUFFIXES):
+        return 'mp4'
+    if lower_name.endswith(ARCHIVE_SUFFIXES):
+        return 'archive'
+    return 'other'
+
+
+class FileEntry:
+    """索引中的单个文件记录"""
+
+    __slots__ = ('path', 'size', 'kind')
+
+    def __init__(self, path, size, kind):
+        self.path = path
+        self.size = size
+        self.kind = kind
+
+    @property
+    def name(self):
+        return os.path.basename(self.path)
+
+    def __repr__(self):
+        return f"FileEntry({self.path!r}, {self.size}, {self.kind!r})"
+
+
+class TempTreeIndex:
+    """单个任务临时目录的文件索引
+
+    解压步骤写入新目录后调用 add_tree 只扫描新写入的目录，
+    重命名、删除文件时同步更新索引，索引始终与磁盘保持一致。
+    """
+
+    def __init__(self, root=None):
+        self._entries = {}
+        if root:
+            self.add_tree(root)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, path):
+        return path in self._entries
+
+    def add_tree(self, directory):
+        """递归扫描目录并加入索引，返回新加入的文件记录"""
+        added = []
+        pending = [directory]
+        while pending:
+            current = pending.pop()
+            try:
+                with os.scandir(current) as it:
+                    for entry in it:
+                        if entry.is_dir(follow_symlinks=False):
+                            pending.append(entry.path)
+                        elif entry.is_file(follow_symlinks=False):
+                            if entry.path in self._entries:
+                                continue
+                            file_entry = FileEntry(entry.path, entry.stat(follow_symlinks=False).st_size,
+                                                   detect_kind(entry.name))
+                            self._entries[entry.path] = file_entry
+                            added.append(file_entry)
+            except OSError:
+                continue
+        return added
+
+    def add_file(self, path):
+        """将单个已写入的文件加入索引"""
+        file_entry = FileEntry(path, os.path.getsize(path), detect_kind(os.path.basename(path)))
+        self._entries[path] = file_entry
+        return file_entry
+
+    def remove(self, path):
+        """从索引中移除文件"""
+        self._entries.pop(path, None)
+
+    def rename(self, old_path, new_path):
+        """文件重命名后更新索引（类型按新文件名重新判断）"""
+        old_entry = self._entries.pop(old_path, None)
+        size = old_entry.size if old_entry else os.path.getsize(new_path)
+        self._entries[new_path] = FileEntry(new_path, size, detect_kind(os.path.basename(new_path)))
+
+    def set_kind(self, path, kind):
+        """按文件内容重新设置类型（例如扩展名不对的压缩包）"""
+        entry = self._entries.get(path)
+        if entry is not None:
+            entry.kind = kind
+
+    def remove_tree(self, directory):
+        """移除目录下的所有文件记录"""
+        for entry in self.files_under(directory):
+            del self._entries[entry.path]
+
+    def files(self):
+        """所有文件记录（列表副本，遍历时可以修改索引）"""
+        return list(self._entries.values())
+
+    def files_under(self, directory):
+        """目录下的所有文件记录"""
+        prefix = os.path.join(directory, '')
+        return [entry for path, entry in self._entries.items() if path.startswith(prefix)]
+
+    def files_of_kind(self, kind):
+        return [entry for entry in self._entries.values() if entry.kind == kind]
+
+    def files_with_suffix(self, suffix):
+        suffix = suffix.lower()
+        return [entry for entry in self._entries.values() if entry.path.lower().endswith(suffix)]
+
+    def archives(self):
+        return self.files_of_kind('archive')
+
+    def mp4_files(self):
+        return self.files_of_kind('mp4')
+
+    def total_size(self):
+        return sum(entry.size for entry in self._entries.values())
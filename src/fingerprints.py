@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+压缩包指纹 - 记录已成功处理的源压缩包和它们输出的MP4
+功能：按 (路径, 大小, 修改时间, 可选的快速摘要) 识别以前处理过的压缩包，增量处理时跳过没有变化的压缩包或直接重新输出记录的MP4；快速摘要还能识别换了路径或名称的同一个压缩包
+"""
+
+import os
+import json
+import time
+import hashlib
+import threading
+
+
+def fingerprint_key(path):
+    """指纹记录的键（绝对路径，Windows上不区分大小写）"""
+    return os.path.normcase(os.path.abspath(path))
+
+
+def archive_stat(parts):
+    """压缩包（分卷压缩包为所有分卷）的 (总大小, 最新修改时间)"""
+    size = 0
+    mtime_ns = 0
+    for part in parts:
+        stat = os.stat(part)
+        size += stat.st_size
+        mtime_ns = max(mtime_ns, stat.st_mtime_ns)
+    return size, mtime_ns
+
+
+def fast_hash(path, total_size=None, sample_size=1024 * 1024):
+    """快速摘要：文件头部、中间和尾部各采样 sample_size 字节，加上总大小
+
+    分卷压缩包只读取第一个分卷，总大小由调用方传入所有分卷的大小之和。
+    """
+    size = os.path.getsize(path)
+    digest = hashlib.blake2b(str(size if total_size is None else total_size).encode())
+    with open(path, 'rb') as f:
+        if size <= sample_size * 3:
+            digest.update(f.read())
+        else:
+            for offset in (0, size // 2 - sample_size // 2, size - sample_size):
+                f.seek(offset)
+                digest.update(f.read(sample_size))
+    return digest.hexdigest()
+
+
+class ArchiveIdentity:
+    """一个源压缩包当前的指纹，快速摘要按需计算"""
+
+    def __init__(self, path, parts=None, use_hash=True):
+        self.path = path
+        self.parts = list(parts or [path])
+        self.size, self.mtime_ns = archive_stat(self.parts)
+        self.use_hash = use_hash
+        self._hash = None
+
+    @property
+    def hash(self):
+        if not self.use_hash:
+            return None
+        if self._hash is None:
+            self._hash = fast_hash(self.parts[0], self.size)
+        return self._hash
+
+    def same_content(self, other):
+        """大小和快速摘要都相同（不比较路径和修改时间）"""
+        return self.size == other.size and self.hash is not None and self.hash == other.hash
+
+
+class ArchiveFingerprintStore:
+    """持久化的已处理压缩包记录
+
+    每个成功处理的压缩包记录大小、修改时间、快速摘要（可选）和输出的MP4路径。
+    路径、大小和修改时间都没变时不需要读取文件；路径不同或修改时间变了时，
+    大小相同的记录再比较快速摘要。
+    """
+
+    def __init__(self, store_path, use_hash=True):
+        self.store_path = store_path
+        self.use_hash = use_hash
+        self._lock = threading.Lock()
+        self._entries = self._load()  # 键 -> 记录
+
+    def _load(self):
+        """从磁盘加载记录，文件不存在或损坏时返回空数据"""
+        try:
+            with open(self.store_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
+        except (OSError, ValueError):
+            return {}
+
+    def save(self):
+        """原子写入记录（先写临时文件再替换）"""
+        os.makedirs(os.path.dirname(self.store_path) or '.', exist_ok=True)
+        temp_path = self.store_path + '.tmp'
+        with self._lock:
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._entries, f, ensure_ascii=False, indent=2)
+            os.replace(temp_path, self.store_path)
+
+    def identify(self, path, parts=None):
+        return ArchiveIdentity(path, parts, self.use_hash)
+
+    def find(self, identity):
+        """查找以前处理过的同一个压缩包，返回 (记录, 是否为相同路径)，没有时返回 (None, False)"""
+        with self._lock:
+            entry = self._entries.get(fingerprint_key(identity.path))
+            candidates = [record for record in self._entries.values()
+                          if record.get("size") == identity.size and record.get("hash")]
+        if entry is not None and entry.get("size") == identity.size and entry.get("mtime_ns") == identity.mtime_ns:
+            return entry, True
+        if identity.use_hash:
+            for record in candidates:
+                if record["hash"] == identity.hash:
+                    return record, fingerprint_key(record.get("path", "")) == fingerprint_key(identity.path)
+        return None, False
+
+    def record(self, identity, outputs):
+        """记录一个成功处理的压缩包及其输出的MP4"""
+        entry = {
+            "path": os.path.abspath(identity.path),
+            "size": identity.size,
+            "mtime_ns": identity.mtime_ns,
+            "hash": identity.hash,
+            "outputs": [os.path.abspath(path) for path in outputs],
+            "time": time.time(),
+        }
+        with self._lock:
+            self._entries[fingerprint_key(identity.path)] = entry
+        return entry
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+批次日志 - 追加写入的处理进度记录，进程中断后可以从断点继续
+功能：每个源压缩包的阶段变化（开始、解压完成、内部压缩包处理完成、输出完成、清理完成）和输出的文件逐行写入磁盘；继续处理时跳过已完成的压缩包，只清理并重做中断的压缩包
+"""
+
+import os
+import json
+import time
+import hashlib
+import threading
+
+# 单个压缩包的处理阶段（按顺序）
+STAGES = ("started", "extracted", "nested_done", "delivered", "cleaned")
+
+
+def default_journal_path(data_dir, output_dir):
+    """输出目录对应的默认批次日志路径
+
+    每个输出目录使用单独的日志：同时运行的界面批次、命令行批次和监视模式输出到不同目录时，
+    不会清空或覆盖彼此的日志。
+    """
+    digest = hashlib.sha1(os.path.normcase(os.path.abspath(output_dir)).encode('utf-8')).hexdigest()[:12]
+    return os.path.join(data_dir, f"batch_journal_{digest}.jsonl")
+
+
+def lock_file(f):
+    """对打开的文件加独占锁（不等待），已被锁定时抛出 OSError；文件关闭或进程结束时自动释放"""
+    if os.name == 'nt':
+        import msvcrt
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+    else:
+        import fcntl
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+
+class JournalLockedError(OSError):
+    """批次日志正被另一个批次使用"""
+
+
+def journal_key(source_file):
+    """源文件在日志中的键（绝对路径，Windows上不区分大小写）"""
+    return os.path.normcase(os.path.abspath(source_file))
+
+
+class JournalEntry:
+    """日志中单个源压缩包的最新状态"""
+
+    def __init__(self, source_file):
+        self.source_file = source_file
+        self.stage = None  # 最后记录的阶段
+        self.temp_dir = ""
+        self.output_dir = ""
+        self.outputs = []  # 已输出的文件（每输出一个记录一次）
+        self.finished = False
+        self.success = False
+        self.failed_reasons = {}
+
+    @property
+    def interrupted(self):
+        """已经开始但没有结束的压缩包"""
+        return self.stage is not None and not self.finished
+
+
+class JournalState:
+    """从日志文件重建的批次状态"""
+
+    def __init__(self):
+        self.unified_output_dir = None
+        self.scratch_dir = None
+        self.entries = {}  # journal_key -> JournalEntry
+        self.finished = False  # 整个批次是否已结束
+
+    def entry(self, source_file):
+        return self.entries.get(journal_key(source_file))
+
+    def apply(self, record):
+        """按顺序应用一条日志记录"""
+        stage = record.get("stage")
+        if stage in ("batch_started", "batch_resumed"):
+            self.unified_output_dir = record.get("unified_output_dir") or self.unified_output_dir
+            self.scratch_dir = record.get("scratch_dir") or self.scratch_dir
+            self.finished = False
+            return
+        if stage == "batch_finished":
+            self.finished = True
+            return
+
+        source_file = record.get("source")
+        if not source_file:
+            return
+        key = journal_key(source_file)
+        entry = self.entries.get(key)
+        if entry is None or stage == "started":
+            # 重新开始的压缩包从头记录
+            entry = self.entries[key] = JournalEntry(source_file)
+        if stage == "output":
+            entry.outputs.append(record.get("path"))
+            return
+        if stage == "finished":
+            entry.finished = True
+            entry.success = bool(record.get("success"))
+            entry.failed_reasons = dict(record.get("failed_reasons") or {})
+            return
+        entry.stage = stage
+        entry.temp_dir = record.get("temp_dir", entry.temp_dir)
+        entry.output_dir = record.get("output_dir", entry.output_dir)
+
+
+class BatchJournal:
+    """追加写入的批次日志（JSON Lines）
+
+    每条记录写入后立即 flush 并 fsync，进程在任意时刻被终止，已写入的记录都不会丢失；
+    最后一行可能只写了一半，读取时忽略。多个工作线程共用一个日志，写入时加锁。
+    打开期间持有 path + ".lock" 的独占文件锁，同一个日志同时只能被一个批次（包括其他进程）使用。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = None
+        self._lock_file = None
+
+    @staticmethod
+    def load(path):
+        """读取日志文件，返回 JournalState；文件不存在时返回None"""
+        try:
+            f = open(path, 'r', encoding='utf-8')
+        except OSError:
+            return None
+        state = JournalState()
+        with f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # 中断时写了一半的记录
+                if isinstance(record, dict):
+                    state.apply(record)
+        return state
+
+    def open(self, append=False):
+        """打开日志文件：append=False 时清空旧的记录（开始新的批次）
+
+        日志正被另一个批次使用时抛出 JournalLockedError，不会清空它的记录。
+        """
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        lock = open(self.path + ".lock", 'a+')
+        try:
+            lock_file(lock)
+        except OSError:
+            lock.close()
+            raise JournalLockedError(f"批次日志正被另一个批次使用: {self.path}")
+        self._lock_file = lock
+        try:
+            self._file = open(self.path, 'a' if append else 'w', encoding='utf-8')
+        except OSError:
+            self._release_lock()
+            raise
+        if append and self._file.tell() > 0:
+            with open(self.path, 'rb') as f:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    # 上次中断时写了一半的记录单独占一行，不影响之后的记录
+                    self._file.write("\n")
+        return self
+
+    def append(self, stage, source_file=None, **fields):
+        """写入一条记录"""
+        record = {"time": time.time(), "stage": stage}
+        if source_file is not None:
+            record["source"] = source_file
+        record.update(fields)
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.write(line)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            self._release_lock()
+
+    def _release_lock(self):
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
@@ -9,32 +9,18 @@
 
 import os
 import sys
-import shutil
-import tarfile
-import zipfile
 import tkinter as tk
 from tkinter import filedialog, messagebox, ttk
 import threading
 import logging
-from pathlib import Path
+import queue
 import subprocess
-import time
 from datetime import datetime
 
-# 尝试导入可选依赖库
-try:
-    import rarfile
-    RARFILE_AVAILABLE = True
-except ImportError:
-    RARFILE_AVAILABLE = False
-    print("警告: rarfile库未安装，RAR文件支持将不可用")
+from engine import DEFAULT_DATA_DIR, EngineConfig, ExtractionEngine
+from fingerprints import ArchiveIdentity
+from volumes import volume_parts
 
-try:
-    import py7zr
-    PY7ZR_AVAILABLE = True
-except ImportError:
-    PY7ZR_AVAILABLE = False
-    print("警告: py7zr库未安装，7z文件支持将不可用")
 
 class DesktopAutomationTool:
     def __init__(self):
@@ -49,33 +35,40 @@ class DesktopAutomationTool:
         # 获取桌面路径
         self.desktop_path = os.path.join(os.path.expanduser("~"), "Desktop")
         
+        # 跨运行保存的数据（密码命中统计、去重索引）
+        self.data_dir = DEFAULT_DATA_DIR
+        
         # 初始化变量
         self.source_files = []  # 源文件列表
+        self.source_identities = {}  # 源文件 -> 指纹（识别重复添加的同一个压缩包）
         self.file_output_dirs = {}  # 每个文件对应的输出目录
         self.output_mode = "unified"  # unified/individual
         self.output_dir = self.desktop_path
-        self.temp_dir = ""
-        self.extracted_files = []
+        self.unified_output_dir = None
         self.mp4_files = []
-        self.cleanup_files = []
         self.failed_files = []  # 失败的文件列表
         self.failed_reasons = {}  # 失败原因
         
+        # 日志队列：工作线程只负责入队，由GUI线程定时批量写入日志框
+        self.log_queue = queue.Queue()
+        self.log_flush_interval = 100  # 毫秒
+        self.log_batch_size = 2000  # 每次最多写入的日志条数
+        self.pending_progress = None  # 最新的进度 (进度值, 状态文本)，由GUI线程应用
+        # 界面操作队列：其他线程不能直接调用Tk，把要在GUI线程中执行的函数放入队列
+        self.ui_queue = queue.Queue()
+        self.ui_thread = threading.current_thread()
+        
         # 设置日志
         self.setup_logging()
         
         # 创建GUI界面
         self.create_gui()
+        self.root.after(self.log_flush_interval, self.pump_log_queue)
         
-        # 支持的压缩格式（增强检测）
-        self.supported_formats = ['.tar.gz', '.tgz', '.tar.bz2', '.tar.xz', '.zip', '.rar', '.7z', '.666z', '.001', '.part1.rar']
-        
-        # 智能格式映射
-        self.format_mapping = {
-            '.666z': '.7z',
-            '.001': '.7z',  # 分卷压缩的第一部分通常是7z格式
-            '.part1.rar': '.rar'
-        }
+        # 处理引擎（每次开始处理时按界面选项更新配置）
+        self.engine = ExtractionEngine(self.build_engine_config(), log=self.log_message,
+                                       progress=self.update_progress,
+                                       password_prompt=self.request_7z_password)
         
     def setup_logging(self):
         """设置日志记录"""
@@ -159,6 +152,12 @@ class DesktopAutomationTool:
         ttk.Entry(self.output_dir_frame, textvariable=self.output_var, width=50).grid(row=0, column=1, sticky=(tk.W, tk.E), padx=(10, 5), pady=5)
         ttk.Button(self.output_dir_frame, text="浏览", command=self.select_output_dir).grid(row=0, column=2, pady=5)
         
+        # 临时解压目录（留空时使用输出目录；多个候选用路径分隔符分隔）
+        ttk.Label(self.output_dir_frame, text="临时目录:").grid(row=1, column=0, sticky=tk.W, pady=5)
+        self.scratch_dir_var = tk.StringVar(value="")
+        ttk.Entry(self.output_dir_frame, textvariable=self.scratch_dir_var, width=50).grid(row=1, column=1, sticky=(tk.W, tk.E), padx=(10, 5), pady=5)
+        ttk.Button(self.output_dir_frame, text="浏览", command=self.select_scratch_dir).grid(row=1, column=2, pady=5)
+        
         # 高级选项区域
         options_frame = ttk.LabelFrame(main_frame, text="处理选项", padding="10")
         options_frame.grid(row=2, column=0, columnspan=3, sticky=(tk.W, tk.E), pady=(0, 10))
@@ -175,11 +174,56 @@ class DesktopAutomationTool:
         ttk.Checkbutton(basic_options_frame, text="递归解压内部压缩文件", variable=self.recursive_extract).grid(row=0, column=1, sticky=tk.W, padx=(20, 0))
         
         self.smart_format_detection = tk.BooleanVar(value=True)
-        ttk.Checkbutton(basic_options_frame, text="智能格式检测和转换", variable=self.smart_format_detection).grid(row=1, column=0, sticky=tk.W, pady=(5, 0))
+        ttk.Checkbutton(basic_options_frame, text="按文件头识别压缩格式", variable=self.smart_format_detection).grid(row=1, column=0, sticky=tk.W, pady=(5, 0))
         
         self.interactive_failure_handling = tk.BooleanVar(value=True)
         ttk.Checkbutton(basic_options_frame, text="交互式失败处理", variable=self.interactive_failure_handling).grid(row=1, column=1, sticky=tk.W, padx=(20, 0), pady=(5, 0))
         
+        self.selective_extract = tk.BooleanVar(value=True)
+        ttk.Checkbutton(basic_options_frame, text="仅解压MP4和内部压缩包", variable=self.selective_extract).grid(row=3, column=0, sticky=tk.W, pady=(5, 0))
+        
+        self.stream_nested_archives = tk.BooleanVar(value=True)
+        ttk.Checkbutton(basic_options_frame, text="流式解压嵌套压缩包", variable=self.stream_nested_archives).grid(row=3, column=1, sticky=tk.W, padx=(20, 0), pady=(5, 0))
+        
+        self.zero_copy_delivery = tk.BooleanVar(value=True)
+        ttk.Checkbutton(basic_options_frame, text="同盘输出时移动/硬链接（不复制）", variable=self.zero_copy_delivery).grid(row=4, column=0, sticky=tk.W, pady=(5, 0))
+        
+        self.dedup_mp4 = tk.BooleanVar(value=True)
+        ttk.Checkbutton(basic_options_frame, text="相同内容的MP4只输出一次", variable=self.dedup_mp4).grid(row=4, column=1, sticky=tk.W, padx=(20, 0), pady=(5, 0))
+        
+        self.resume_batch = tk.BooleanVar(value=False)
+        ttk.Checkbutton(basic_options_frame, text="断点续处理（跳过上次已完成的压缩包）", variable=self.resume_batch).grid(row=5, column=0, sticky=tk.W, pady=(5, 0))
+        
+        self.persistent_dedup = tk.BooleanVar(value=False)
+        ttk.Checkbutton(basic_options_frame, text="跨批次去重（记住已输出的MP4）", variable=self.persistent_dedup).grid(row=5, column=1, sticky=tk.W, padx=(20, 0), pady=(5, 0))
+        
+        self.incremental = tk.BooleanVar(value=False)
+        ttk.Checkbutton(basic_options_frame, text="跳过以前处理过的压缩包", variable=self.incremental).grid(row=6, column=0, sticky=tk.W, pady=(5, 0))
+        
+        self.redeliver_processed = tk.BooleanVar(value=False)
+        ttk.Checkbutton(basic_options_frame, text="重新输出跳过的压缩包的MP4", variable=self.redeliver_processed).grid(row=6, column=1, sticky=tk.W, padx=(20, 0), pady=(5, 0))
+        
+        # 并行任务数（每个源压缩包一个任务）
+        workers_frame = ttk.Frame(basic_options_frame)
+        workers_frame.grid(row=2, column=0, columnspan=2, sticky=tk.W, pady=(5, 0))
+        ttk.Label(workers_frame, text="并行任务数:").pack(side=tk.LEFT)
+        cpu_count = os.cpu_count() or 1
+        self.max_workers_var = tk.IntVar(value=min(4, cpu_count))
+        ttk.Spinbox(workers_frame, from_=1, to=max(1, cpu_count * 2), textvariable=self.max_workers_var,
+                    width=5).pack(side=tk.LEFT, padx=(10, 0))
+        
+        # 递归解压的最大嵌套深度
+        ttk.Label(workers_frame, text="最大嵌套深度:").pack(side=tk.LEFT, padx=(20, 0))
+        self.max_nesting_depth_var = tk.IntVar(value=10)
+        ttk.Spinbox(workers_frame, from_=1, to=50, textvariable=self.max_nesting_depth_var,
+                    width=5).pack(side=tk.LEFT, padx=(10, 0))
+        
+        # 日志框保留的最大行数（超过后删除最早的日志）
+        ttk.Label(workers_frame, text="日志最大行数:").pack(side=tk.LEFT, padx=(20, 0))
+        self.max_log_lines_var = tk.IntVar(value=5000)
+        ttk.Spinbox(workers_frame, from_=100, to=100000, increment=100, textvariable=self.max_log_lines_var,
+                    width=7).pack(side=tk.LEFT, padx=(10, 0))
+        
         # 密码设置区域
         password_frame = ttk.LabelFrame(options_frame, text="密码设置", padding="5")
         password_frame.grid(row=1, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=(10, 0))
@@ -241,16 +285,38 @@ class DesktopAutomationTool:
         )
         if filenames:
             for filename in filenames:
-                if filename not in self.source_files:
-                    self.source_files.append(filename)
-                    self.files_listbox.insert(tk.END, os.path.basename(filename))
-                    self.log_message(f"已添加文件: {os.path.basename(filename)}")
+                duplicate = self.find_added_archive(filename)
+                if duplicate is not None:
+                    if duplicate != filename:
+                        self.log_message(f"与已添加的 {os.path.basename(duplicate)} 是同一个压缩包，跳过: {os.path.basename(filename)}")
+                    continue
+                self.source_files.append(filename)
+                self.files_listbox.insert(tk.END, os.path.basename(filename))
+                self.log_message(f"已添加文件: {os.path.basename(filename)}")
             
             self.log_message(f"当前共选择了 {len(self.source_files)} 个文件")
     
+    def find_added_archive(self, filename):
+        """查找已添加的同一个压缩包（相同的真实路径，或大小和快速摘要相同），没有时返回None"""
+        real_path = os.path.normcase(os.path.realpath(filename))
+        for source_file in self.source_files:
+            if os.path.normcase(os.path.realpath(source_file)) == real_path:
+                return source_file
+        try:
+            identity = ArchiveIdentity(filename, volume_parts(filename))
+            for source_file in self.source_files:
+                other = self.source_identities.get(source_file)
+                if other is not None and identity.same_content(other):
+                    return source_file
+        except OSError:
+            return None
+        self.source_identities[filename] = identity
+        return None
+        
     def clear_source_files(self):
         """清空源文件列表"""
         self.source_files.clear()
+        self.source_identities.clear()
         self.file_output_dirs.clear()
         self.files_listbox.delete(0, tk.END)
         self.log_message("已清空文件列表")
@@ -363,28 +429,118 @@ class DesktopAutomationTool:
             self.output_dir = directory
             self.log_message(f"已选择基础输出目录: {directory}")
             
+    def select_scratch_dir(self):
+        """选择临时解压目录（例如本地SSD），输出目录在网络磁盘上时可减少网络读写"""
+        directory = filedialog.askdirectory(
+            title="选择临时解压目录",
+            initialdir=self.scratch_dir_var.get() or self.output_dir
+        )
+        if directory:
+            self.scratch_dir_var.set(directory)
+            self.log_message(f"已选择临时目录: {directory}")
+            
     def log_message(self, message):
-        """在GUI中显示日志消息"""
+        """记录日志消息（任何线程都可以调用，GUI显示由 pump_log_queue 批量完成）"""
         timestamp = datetime.now().strftime("%H:%M:%S")
-        formatted_message = f"[{timestamp}] {message}\n"
-        
-        self.log_text.insert(tk.END, formatted_message)
-        self.log_text.see(tk.END)
-        self.root.update_idletasks()
+        self.log_queue.put(f"[{timestamp}] {message}\n")
         
         # 同时写入日志文件
         self.logger.info(message)
         
+    @staticmethod
+    def drain_log_queue(log_queue, max_items):
+        """从队列中取出最多 max_items 条日志（不等待）"""
+        messages = []
+        while len(messages) < max_items:
+            try:
+                messages.append(log_queue.get_nowait())
+            except queue.Empty:
+                break
+        return messages
+        
+    def run_on_ui_thread(self, callback, *args):
+        """在GUI线程中执行 callback(*args)（任何线程都可以调用，不等待执行结果）"""
+        self.ui_queue.put((callback, args, None))
+        
+    def call_on_ui_thread(self, callback, *args):
+        """在GUI线程中执行 callback(*args) 并等待返回值（例如工作线程需要弹出对话框询问用户）
+
+        在GUI线程中调用时直接执行；callback 抛出的异常在调用线程中重新抛出。
+        """
+        if threading.current_thread() is self.ui_thread:
+            return callback(*args)
+        reply = queue.Queue(maxsize=1)
+        self.ui_queue.put((callback, args, reply))
+        ok, value = reply.get()
+        if not ok:
+            raise value
+        return value
+        
+    def run_ui_callbacks(self):
+        """在GUI线程中执行排队的界面操作
+
+        每个操作通过 root.after 单独调度：打开对话框等待用户输入时，日志和进度仍会定时刷新。
+        """
+        while True:
+            try:
+                callback, args, reply = self.ui_queue.get_nowait()
+            except queue.Empty:
+                break
+            self.root.after(0, self.run_ui_callback, callback, args, reply)
+            
+    @staticmethod
+    def run_ui_callback(callback, args, reply):
+        """执行一个界面操作，需要时把结果或异常交回等待的线程"""
+        try:
+            value = callback(*args)
+        except Exception as e:
+            if reply is None:
+                raise
+            reply.put((False, e))
+        else:
+            if reply is not None:
+                reply.put((True, value))
+            
+    def pump_log_queue(self):
+        """在GUI线程中定时把排队的日志一次性写入日志框，应用最新进度，并执行排队的界面操作"""
+        try:
+            self.run_ui_callbacks()
+            messages = self.drain_log_queue(self.log_queue, self.log_batch_size)
+            if messages:
+                self.log_text.insert(tk.END, "".join(messages))
+                self.trim_log_text()
+                self.log_text.see(tk.END)
+                
+            pending_progress, self.pending_progress = self.pending_progress, None
+            if pending_progress is not None:
+                value, status = pending_progress
+                self.progress_var.set(value)
+                if status:
+                    self.status_var.set(status)
+        finally:
+            # 队列中还有积压时尽快继续写入
+            delay = 1 if not (self.log_queue.empty() and self.ui_queue.empty()) else self.log_flush_interval
+            self.root.after(delay, self.pump_log_queue)
+            
+    def trim_log_text(self):
+        """日志框超过最大行数时删除最早的行"""
+        try:
+            max_lines = max(100, int(self.max_log_lines_var.get()))
+        except (tk.TclError, ValueError):
+            max_lines = 5000
+        line_count = int(self.log_text.index('end-1c').split('.')[0])
+        if line_count > max_lines:
+            self.log_text.delete('1.0', f'{line_count - max_lines + 1}.0')
+        
     def clear_log(self):
         """清空日志显示"""
         self.log_text.delete(1.0, tk.END)
         
     def update_progress(self, value, status=""):
-        """更新进度条和状态"""
-        self.progress_var.set(value)
-        if status:
-            self.status_var.set(status)
-        self.root.update_idletasks()
+        """更新进度条和状态（任何线程都可以调用，由GUI线程定时刷新）"""
+        if not status and self.pending_progress is not None:
+            status = self.pending_progress[1]
+        self.pending_progress = (value, status)
         
     def start_processing(self):
         """开始处理流程"""
@@ -409,422 +565,105 @@ class DesktopAutomationTool:
         # 禁用开始按钮
         self.start_button.config(state='disabled')
         
+        # 在GUI线程中读取界面选项，工作线程不访问Tk变量
+        config = self.build_engine_config()
+        interactive = self.interactive_failure_handling.get()
+        source_files = list(self.source_files)
+        
         # 在新线程中运行处理流程
-        processing_thread = threading.Thread(target=self.processing_workflow)
+        processing_thread = threading.Thread(target=self.processing_workflow, args=(config, interactive, source_files))
         processing_thread.daemon = True
         processing_thread.start()
         
-    def processing_workflow(self):
-        """主要处理工作流程（增强版）"""
+    def build_engine_config(self):
+        """根据界面选项生成引擎配置"""
         try:
-            self.log_message(f"开始高级批量处理工作流程，共 {len(self.source_files)} 个文件...")
-            self.update_progress(0, "初始化...")
-            
-            # 清空失败文件列表
-            self.failed_files.clear()
-            self.failed_reasons.clear()
+            max_workers = int(self.max_workers_var.get())
+        except (tk.TclError, ValueError):
+            max_workers = 1
+        try:
+            max_nesting_depth = int(self.max_nesting_depth_var.get())
+        except (tk.TclError, ValueError):
+            max_nesting_depth = 10
+        backup_passwords = [pwd.strip() for pwd in self.backup_passwords_var.get().split(',') if pwd.strip()]
+        
+        return EngineConfig(
+            output_dir=self.output_dir,
+            output_mode=self.output_mode,
+            file_output_dirs=self.file_output_dirs,
+            auto_cleanup=self.auto_cleanup.get(),
+            recursive_extract=self.recursive_extract.get(),
+            max_nesting_depth=max_nesting_depth,
+            smart_format_detection=self.smart_format_detection.get(),
+            selective_extract=self.selective_extract.get(),
+            stream_nested_archives=self.stream_nested_archives.get(),
+            zero_copy_delivery=self.zero_copy_delivery.get(),
+            dedup_mp4=self.dedup_mp4.get(),
+            persistent_dedup=self.persistent_dedup.get(),
+            max_workers=max_workers,
+            password=self.password_var.get(),
+            backup_passwords=backup_passwords,
+            data_dir=self.data_dir,
+            scratch_dirs=[path.strip() for path in self.scratch_dir_var.get().split(os.pathsep) if path.strip()],
+            resume=self.resume_batch.get(),
+            incremental=self.incremental.get() or self.redeliver_processed.get(),
+            redeliver_processed=self.redeliver_processed.get(),
+        )
+        
+    def processing_workflow(self, config, interactive, source_files):
+        """主要处理工作流程（在工作线程中由处理引擎完成，结果交给GUI线程显示）"""
+        try:
+            self.engine.config = config
+            self.engine.password_prompt = self.request_7z_password if interactive else None
             
-            # 步骤1: 根据输出模式创建输出目录
-            if self.output_mode == "unified":
-                self.create_unified_output_directory()
-                self.log_message("使用统一输出模式")
-            else:
-                self.log_message("使用独立输出模式")
-            self.update_progress(5, "创建输出目录完成")
+            result = self.engine.run(source_files)
+            self.run_on_ui_thread(self.finish_processing, result, interactive)
             
-            # 步骤2: 批量处理每个文件
-            total_files = len(self.source_files)
-            successful_files = 0
+        except Exception as e:
+            self.log_message(f"批量处理过程中发生错误: {str(e)}")
+            self.logger.error(f"批量处理错误: {str(e)}", exc_info=True)
+            self.run_on_ui_thread(self.show_processing_error, e)
             
-            for i, source_file in enumerate(self.source_files):
-                try:
-                    self.log_message(f"处理文件 ({i+1}/{total_files}): {os.path.basename(source_file)}")
-                    
-                    # 为每个文件创建临时目录
-                    self.create_temp_directory_for_file(source_file, i)
-                    
-                    # 设置当前文件的输出目录
-                    if self.output_mode == "individual":
-                        self.setup_individual_output_directory(source_file)
-                    
-                    # 解压当前文件
-                    self.extract_single_archive(source_file)
-                    
-                    # 处理内部压缩文件
-                    if self.recursive_extract.get():
-                        self.process_internal_archives()
-                    
-                    # 提取MP4文件
-                    if self.output_mode == "unified":
-                        self.extract_mp4_files_to_unified_dir()
-                    else:
-                        self.extract_mp4_files_to_individual_dir(source_file)
-                    
-                    # 清理当前文件的临时目录
-                    if self.auto_cleanup.get():
-                        self.cleanup_current_temp_files()
-                    
-                    successful_files += 1
-                    
-                    # 更新进度
-                    progress = 10 + (i + 1) * 80 / total_files
-                    self.update_progress(progress, f"已处理 {i+1}/{total_files} 个文件")
-                    
-                except Exception as e:
-                    self.log_message(f"处理文件失败 {os.path.basename(source_file)}: {str(e)}")
-                    self.failed_files.append(source_file)
-                    self.failed_reasons[source_file] = str(e)
-                    continue
+    def finish_processing(self, result, interactive):
+        """在GUI线程中显示处理结果并重新启用开始按钮"""
+        try:
+            self.mp4_files = result.mp4_files
+            self.failed_files = result.failed_files
+            self.failed_reasons = result.failed_reasons
+            self.unified_output_dir = result.unified_output_dir
             
-            # 步骤3: 处理失败的文件
-            if self.failed_files and self.interactive_failure_handling.get():
+            # 处理失败的文件
+            if self.failed_files and interactive:
                 self.handle_failed_files()
             
-            # 步骤4: 最终清理
-            if self.auto_cleanup.get():
-                self.final_cleanup()
-                self.update_progress(95, "清理完成")
-            
-            self.update_progress(100, "批量处理完成！")
-            self.log_message(f"批量处理完成！成功处理 {successful_files}/{total_files} 个文件，提取了 {len(self.mp4_files)} 个MP4文件")
-            
-            if self.failed_files:
-                self.log_message(f"失败文件数量: {len(self.failed_files)}")
-            
             # 显示结果
             self.show_results()
-            
-        except Exception as e:
-            self.log_message(f"批量处理过程中发生错误: {str(e)}")
-            self.logger.error(f"批量处理错误: {str(e)}", exc_info=True)
-            messagebox.showerror("错误", f"批量处理过程中发生错误:\n{str(e)}")
         finally:
             # 重新启用开始按钮
             self.start_button.config(state='normal')
             
-    def create_unified_output_directory(self):
-        """创建统一输出目录"""
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        self.unified_output_dir = os.path.join(self.output_dir, f"批量提取结果_{timestamp}")
-        os.makedirs(self.unified_output_dir, exist_ok=True)
-        self.log_message(f"创建统一输出目录: {self.unified_output_dir}")
-        
-    def create_temp_directory_for_file(self, source_file, index):
-        """为单个文件创建临时工作目录"""
-        filename = os.path.splitext(os.path.basename(source_file))[0]
-        self.temp_dir = os.path.join(self.output_dir, f"temp_{index}_{filename}")
-        os.makedirs(self.temp_dir, exist_ok=True)
-        self.log_message(f"创建临时目录: {self.temp_dir}")
-        
-    def create_temp_directory(self):
-        """创建临时工作目录（保持向后兼容）"""
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        self.temp_dir = os.path.join(self.output_dir, f"temp_extract_{timestamp}")
-        os.makedirs(self.temp_dir, exist_ok=True)
-        self.log_message(f"创建临时目录: {self.temp_dir}")
-        
-    def extract_single_archive(self, source_file):
-        """解压单个压缩包"""
-        self.log_message(f"开始解压: {os.path.basename(source_file)}")
-        
-        file_ext = Path(source_file).suffix.lower()
-        
+    def show_processing_error(self, error):
+        """在GUI线程中显示批量处理的错误并重新启用开始按钮"""
         try:
-            if file_ext == '.gz' and source_file.endswith('.tar.gz'):
-                # 处理.tar.gz文件
-                with tarfile.open(source_file, 'r:gz') as tar:
-                    tar.extractall(self.temp_dir)
-                    self.log_message(f"tar.gz文件解压成功: {os.path.basename(source_file)}")
-            elif file_ext == '.zip':
-                # 处理.zip文件
-                with zipfile.ZipFile(source_file, 'r') as zip_ref:
-                    zip_ref.extractall(self.temp_dir)
-                    self.log_message(f"zip文件解压成功: {os.path.basename(source_file)}")
-            elif file_ext == '.rar':
-                # 处理.rar文件
-                if not RARFILE_AVAILABLE:
-                    raise ValueError("RAR文件支持不可用，请安装rarfile库")
-                with rarfile.RarFile(source_file) as rar_ref:
-                    rar_ref.extractall(self.temp_dir)
-                    self.log_message(f"rar文件解压成功: {os.path.basename(source_file)}")
-            elif file_ext == '.7z':
-                # 处理.7z文件
-                self.extract_7z_file(source_file, self.temp_dir)
-            else:
-                raise ValueError(f"不支持的文件格式: {file_ext}")
-                
-        except Exception as e:
-            raise Exception(f"解压文件失败 {os.path.basename(source_file)}: {str(e)}")
-            
-    def extract_main_archive(self):
-        """解压主压缩包（保持向后兼容）"""
-        if hasattr(self, 'source_file') and self.source_file:
-            self.extract_single_archive(self.source_file)
-        else:
-            raise ValueError("未设置源文件")
-            
-    def process_internal_archives(self):
-        """处理内部压缩文件（增强版）"""
-        self.log_message("开始处理内部压缩文件...")
-        
-        # 步骤1: 智能格式检测和转换
-        self.smart_format_detection_and_conversion()
-        
-        # 步骤2: 传统的.666z重命名（向后兼容）
-        self.rename_666z_files()
-        
-        # 步骤3: 递归搜索所有压缩文件
-        archive_files = []
-        for root, dirs, files in os.walk(self.temp_dir):
-            for file in files:
-                file_path = os.path.join(root, file)
-                file_ext = Path(file).suffix.lower()
-                
-                # 扩展支持的格式
-                supported_extensions = ['.zip', '.rar', '.7z', '.tar.bz2', '.tar.xz', '.001']
-                if file_ext in supported_extensions or file.endswith('.tar.gz'):
-                    archive_files.append(file_path)
-                    
-        self.log_message(f"发现 {len(archive_files)} 个内部压缩文件")
-        
-        # 步骤4: 解压每个压缩文件
-        successful_extractions = 0
-        for i, archive_file in enumerate(archive_files):
-            try:
-                self.log_message(f"解压内部文件 ({i+1}/{len(archive_files)}): {os.path.basename(archive_file)}")
-                
-                # 创建解压目录
-                extract_dir = os.path.splitext(archive_file)[0] + "_extracted"
-                os.makedirs(extract_dir, exist_ok=True)
-                
-                # 根据文件类型解压
-                success = self.extract_archive_file(archive_file, extract_dir)
-                if success:
-                    successful_extractions += 1
-                    # 将原压缩文件添加到清理列表
-                    self.cleanup_files.append(archive_file)
-                
-            except Exception as e:
-                self.log_message(f"解压文件失败 {os.path.basename(archive_file)}: {str(e)}")
-                continue
-        
-        self.log_message(f"内部压缩文件处理完成，成功解压 {successful_extractions}/{len(archive_files)} 个文件")
-                
-    def smart_format_detection_and_conversion(self):
-        """智能文件格式检测和转换"""
-        if not self.smart_format_detection.get():
-            return
+            messagebox.showerror("错误", f"批量处理过程中发生错误:\n{str(error)}")
+        finally:
+            self.start_button.config(state='normal')
             
-        self.log_message("开始智能文件格式检测和转换...")
+    def detect_archive_format(self, file_path):
+        """按文件头识别压缩格式（不重命名文件），不是压缩包时返回None"""
+        return self.engine.detect_archive_format(file_path)
         
-        converted_count = 0
-        for root, dirs, files in os.walk(self.temp_dir):
-            for file in files:
-                file_path = os.path.join(root, file)
-                converted = False
-                
-                # 检查是否需要格式转换
-                for wrong_ext, correct_ext in self.format_mapping.items():
-                    if file.endswith(wrong_ext):
-                        new_name = file[:-len(wrong_ext)] + correct_ext
-                        new_path = os.path.join(root, new_name)
-                        
-                        try:
-                            os.rename(file_path, new_path)
-                            self.log_message(f"格式转换: {file} -> {new_name}")
-                            converted_count += 1
-                            converted = True
-                            break
-                        except Exception as e:
-                            self.log_message(f"格式转换失败 {file}: {str(e)}")
-                
-                # 如果没有进行格式转换，尝试通过文件头检测真实格式
-                if not converted:
-                    self.detect_and_fix_format(file_path)
-                    
-        self.log_message(f"智能格式检测完成，共转换了 {converted_count} 个文件")
-        
-    def detect_and_fix_format(self, file_path):
-        """通过文件头检测并修正文件格式"""
-        try:
-            with open(file_path, 'rb') as f:
-                header = f.read(16)
-                
-            file_dir = os.path.dirname(file_path)
-            file_name = os.path.basename(file_path)
-            name_without_ext = os.path.splitext(file_name)[0]
-            
-            # 检测常见压缩格式的文件头
-            if header.startswith(b'PK'):
-                # ZIP格式
-                if not file_name.lower().endswith('.zip'):
-                    new_path = os.path.join(file_dir, name_without_ext + '.zip')
-                    os.rename(file_path, new_path)
-                    self.log_message(f"检测到ZIP格式，重命名: {file_name} -> {os.path.basename(new_path)}")
-                    
-            elif header.startswith(b'Rar!'):
-                # RAR格式
-                if not file_name.lower().endswith('.rar'):
-                    new_path = os.path.join(file_dir, name_without_ext + '.rar')
-                    os.rename(file_path, new_path)
-                    self.log_message(f"检测到RAR格式，重命名: {file_name} -> {os.path.basename(new_path)}")
-                    
-            elif header.startswith(b'7z\xbc\xaf\x27\x1c'):
-                # 7Z格式
-                if not file_name.lower().endswith('.7z'):
-                    new_path = os.path.join(file_dir, name_without_ext + '.7z')
-                    os.rename(file_path, new_path)
-                    self.log_message(f"检测到7Z格式，重命名: {file_name} -> {os.path.basename(new_path)}")
-                    
-            elif header.startswith(b'\x1f\x8b'):
-                # GZIP格式
-                if not file_name.lower().endswith(('.gz', '.tar.gz')):
-                    new_path = os.path.join(file_dir, name_without_ext + '.gz')
-                    os.rename(file_path, new_path)
-                    self.log_message(f"检测到GZIP格式，重命名: {file_name} -> {os.path.basename(new_path)}")
-                    
-        except Exception as e:
-            # 文件头检测失败，不影响主流程
-            pass
-
-    def rename_666z_files(self):
-        """重命名.666z文件为.7z（保持向后兼容）"""
-        self.log_message("搜索并重命名.666z文件...")
-        
-        renamed_count = 0
-        for root, dirs, files in os.walk(self.temp_dir):
-            for file in files:
-                if file.endswith('.666z'):
-                    old_path = os.path.join(root, file)
-                    new_path = os.path.join(root, file[:-5] + '.7z')  # 替换.666z为.7z
-                    
-                    try:
-                        os.rename(old_path, new_path)
-                        self.log_message(f"重命名: {file} -> {os.path.basename(new_path)}")
-                        renamed_count += 1
-                    except Exception as e:
-                        self.log_message(f"重命名失败 {file}: {str(e)}")
-                        
-        self.log_message(f"共重命名了 {renamed_count} 个.666z文件")
-        
-    def extract_archive_file(self, archive_path, extract_dir):
-        """解压单个压缩文件（增强版）"""
-        file_ext = Path(archive_path).suffix.lower()
-        filename = os.path.basename(archive_path)
-        
-        try:
-            if file_ext == '.zip':
-                with zipfile.ZipFile(archive_path, 'r') as zip_ref:
-                    zip_ref.extractall(extract_dir)
-                self.log_message(f"ZIP文件解压成功: {filename}")
-                return True
-                
-            elif file_ext == '.rar':
-                if not RARFILE_AVAILABLE:
-                    raise ValueError("RAR文件支持不可用，请安装rarfile库")
-                with rarfile.RarFile(archive_path) as rar_ref:
-                    rar_ref.extractall(extract_dir)
-                self.log_message(f"RAR文件解压成功: {filename}")
-                return True
-                
-            elif file_ext == '.7z' or file_ext == '.001':
-                # .001文件通常是7z分卷压缩的第一部分
-                return self.extract_7z_file(archive_path, extract_dir)
-                
-            elif archive_path.endswith('.tar.gz'):
-                with tarfile.open(archive_path, 'r:gz') as tar:
-                    tar.extractall(extract_dir)
-                self.log_message(f"TAR.GZ文件解压成功: {filename}")
-                return True
-                
-            elif archive_path.endswith('.tar.bz2'):
-                with tarfile.open(archive_path, 'r:bz2') as tar:
-                    tar.extractall(extract_dir)
-                self.log_message(f"TAR.BZ2文件解压成功: {filename}")
-                return True
-                
-            elif archive_path.endswith('.tar.xz'):
-                with tarfile.open(archive_path, 'r:xz') as tar:
-                    tar.extractall(extract_dir)
-                self.log_message(f"TAR.XZ文件解压成功: {filename}")
-                return True
-                
-            else:
-                raise ValueError(f"不支持的压缩格式: {file_ext}")
-                
-        except Exception as e:
-            self.log_message(f"解压文件失败 {filename}: {str(e)}")
-            # 添加到失败列表
-            self.failed_files.append(archive_path)
-            self.failed_reasons[archive_path] = str(e)
-            return False
-            
-    def extract_7z_file(self, archive_path, extract_dir):
-        """解压7z文件（增强密码支持和交互式处理）"""
-        if not PY7ZR_AVAILABLE:
-            raise ValueError("7z文件支持不可用，请安装py7zr库")
-        
-        # 准备密码列表
-        passwords_to_try = []
-        
-        # 添加默认密码
-        default_password = self.password_var.get().strip()
-        if default_password:
-            passwords_to_try.append(default_password)
-        
-        # 添加备用密码
-        backup_passwords = self.backup_passwords_var.get().strip()
-        if backup_passwords:
-            for pwd in backup_passwords.split(','):
-                pwd = pwd.strip()
-                if pwd and pwd not in passwords_to_try:
-                    passwords_to_try.append(pwd)
-        
-        # 添加常用密码
-        common_passwords = ["", "123456", "password", "admin", "123", "000000"]
-        for pwd in common_passwords:
-            if pwd not in passwords_to_try:
-                passwords_to_try.append(pwd)
-        
-        # 尝试解压
-        last_error = None
-        for i, password in enumerate(passwords_to_try):
-            try:
-                if password == "":
-                    # 无密码尝试
-                    with py7zr.SevenZipFile(archive_path, mode="r") as archive:
-                        archive.extractall(path=extract_dir)
-                        self.log_message(f"7z文件解压成功（无密码）: {os.path.basename(archive_path)}")
-                        return True
-                else:
-                    # 有密码尝试
-                    with py7zr.SevenZipFile(archive_path, mode="r", password=password) as archive:
-                        archive.extractall(path=extract_dir)
-                        self.log_message(f"7z文件解压成功（密码: {password}）: {os.path.basename(archive_path)}")
-                        return True
-                        
-            except Exception as e:
-                last_error = e
-                if i == 0:
-                    self.log_message(f"尝试密码 '{password}' 失败: {str(e)}")
-                continue
-        
-        # 所有密码都失败了
-        filename = os.path.basename(archive_path)
-        self.log_message(f"7z文件解压失败，所有密码都无效: {filename}")
+    def setup_individual_output_directory(self, source_file, job=None):
+        """为单个文件设置独立输出目录"""
+        self.engine.config = self.build_engine_config()
+        return self.engine.setup_individual_output_directory(source_file, job)
         
-        # 添加到失败列表
-        self.failed_files.append(archive_path)
-        self.failed_reasons[archive_path] = f"密码错误或文件损坏: {str(last_error)}"
+    def request_7z_password(self, archive_path, last_error):
+        """处理引擎询问新密码的入口（在解压线程中调用）：在GUI线程中打开对话框并等待用户输入"""
+        return self.call_on_ui_thread(self.prompt_7z_password, archive_path, last_error)
         
-        # 如果启用了交互式失败处理
-        if self.interactive_failure_handling.get():
-            return self.handle_7z_extraction_failure(archive_path, extract_dir, last_error)
-        else:
-            raise Exception(f"7z文件解压失败: {filename} - 所有密码尝试都失败")
-    
-    def handle_7z_extraction_failure(self, archive_path, extract_dir, last_error):
-        """处理7z解压失败的交互式对话"""
+    def prompt_7z_password(self, archive_path, last_error):
+        """7z解压失败时询问新密码，返回输入的密码，跳过时返回None（只能在GUI线程中调用）"""
         filename = os.path.basename(archive_path)
         
         # 创建失败处理对话框
@@ -879,160 +718,13 @@ class DesktopAutomationTool:
         failure_dialog.wait_window()
         
         # 处理用户选择
-        if dialog_result["action"] == "manual_password":
-            new_password = dialog_result["password"]
-            if new_password:
-                try:
-                    with py7zr.SevenZipFile(archive_path, mode="r", password=new_password) as archive:
-                        archive.extractall(path=extract_dir)
-                        self.log_message(f"7z文件解压成功（手动密码）: {filename}")
-                        # 从失败列表中移除
-                        if archive_path in self.failed_files:
-                            self.failed_files.remove(archive_path)
-                        if archive_path in self.failed_reasons:
-                            del self.failed_reasons[archive_path]
-                        return True
-                except Exception as e:
-                    self.log_message(f"手动密码也失败: {filename} - {str(e)}")
-                    messagebox.showerror("解压失败", f"手动输入的密码也无效:\n{str(e)}")
-        
-        elif dialog_result["action"] == "later":
-            self.log_message(f"文件标记为稍后处理: {filename}")
-            return False
-        
-        # 默认跳过
-        self.log_message(f"跳过文件: {filename}")
-        return False
-                
-    def extract_mp4_files_to_unified_dir(self):
-        """递归搜索并提取MP4文件到统一目录"""
-        self.log_message("搜索当前临时目录中的MP4文件...")
-        
-        mp4_files = []
-        for root, dirs, files in os.walk(self.temp_dir):
-            for file in files:
-                if file.lower().endswith('.mp4'):
-                    mp4_files.append(os.path.join(root, file))
-                    
-        self.log_message(f"在当前文件中发现 {len(mp4_files)} 个MP4文件")
-        
-        # 复制MP4文件到统一输出目录
-        for i, mp4_file in enumerate(mp4_files):
-            try:
-                filename = os.path.basename(mp4_file)
-                output_path = os.path.join(self.unified_output_dir, filename)
-                
-                # 如果文件已存在，添加序号
-                counter = 1
-                original_name, ext = os.path.splitext(filename)
-                while os.path.exists(output_path):
-                    output_path = os.path.join(self.unified_output_dir, f"{original_name}_{counter}{ext}")
-                    counter += 1
-                    
-                shutil.copy2(mp4_file, output_path)
-                self.mp4_files.append(output_path)
-                self.log_message(f"复制MP4文件: {filename}")
-                
-            except Exception as e:
-                self.log_message(f"复制MP4文件失败 {filename}: {str(e)}")
-                
-    def extract_mp4_files(self):
-        """递归搜索并提取所有MP4文件（保持向后兼容）"""
-        self.log_message("开始搜索MP4文件...")
-        
-        mp4_files = []
-        for root, dirs, files in os.walk(self.temp_dir):
-            for file in files:
-                if file.lower().endswith('.mp4'):
-                    mp4_files.append(os.path.join(root, file))
-                    
-        self.log_message(f"发现 {len(mp4_files)} 个MP4文件")
+        if dialog_result["action"] == "manual_password" and dialog_result["password"]:
+            return dialog_result["password"]
         
-        # 复制MP4文件到输出目录
-        mp4_output_dir = os.path.join(self.output_dir, "extracted_mp4_files")
-        os.makedirs(mp4_output_dir, exist_ok=True)
-        
-        for i, mp4_file in enumerate(mp4_files):
-            try:
-                filename = os.path.basename(mp4_file)
-                output_path = os.path.join(mp4_output_dir, filename)
-                
-                # 如果文件已存在，添加序号
-                counter = 1
-                while os.path.exists(output_path):
-                    name, ext = os.path.splitext(filename)
-                    output_path = os.path.join(mp4_output_dir, f"{name}_{counter}{ext}")
-                    counter += 1
-                    
-                shutil.copy2(mp4_file, output_path)
-                self.mp4_files.append(output_path)
-                self.log_message(f"复制MP4文件 ({i+1}/{len(mp4_files)}): {filename}")
-                
-            except Exception as e:
-                self.log_message(f"复制MP4文件失败 {filename}: {str(e)}")
-                
-    def cleanup_current_temp_files(self):
-        """清理当前文件的临时文件"""
-        try:
-            # 删除当前临时目录
-            if hasattr(self, 'temp_dir') and os.path.exists(self.temp_dir):
-                shutil.rmtree(self.temp_dir)
-                self.log_message(f"删除临时目录: {os.path.basename(self.temp_dir)}")
-                
-        except Exception as e:
-            self.log_message(f"清理当前临时文件时发生错误: {str(e)}")
-            
-    def final_cleanup(self):
-        """最终清理所有中间文件"""
-        self.log_message("开始最终清理...")
-        
-        try:
-            # 删除所有中间文件
-            for file_path in self.cleanup_files:
-                try:
-                    if os.path.exists(file_path):
-                        os.remove(file_path)
-                        self.log_message(f"删除中间文件: {os.path.basename(file_path)}")
-                except Exception as e:
-                    self.log_message(f"删除文件失败 {os.path.basename(file_path)}: {str(e)}")
-                    
-            # 清理可能残留的临时目录
-            for root, dirs, files in os.walk(self.output_dir):
-                for dir_name in dirs:
-                    if dir_name.startswith('temp_'):
-                        temp_path = os.path.join(root, dir_name)
-                        try:
-                            shutil.rmtree(temp_path)
-                            self.log_message(f"清理残留临时目录: {dir_name}")
-                        except Exception as e:
-                            self.log_message(f"清理临时目录失败 {dir_name}: {str(e)}")
-                break  # 只检查顶层目录
-                    
-        except Exception as e:
-            self.log_message(f"最终清理过程中发生错误: {str(e)}")
-            
-    def cleanup_temp_files(self):
-        """清理临时文件和中间压缩文件（保持向后兼容）"""
-        self.log_message("开始清理临时文件...")
+        if dialog_result["action"] == "later":
+            self.log_message(f"文件标记为稍后处理: {filename}")
+        return None
         
-        try:
-            # 删除临时目录
-            if hasattr(self, 'temp_dir') and os.path.exists(self.temp_dir):
-                shutil.rmtree(self.temp_dir)
-                self.log_message(f"删除临时目录: {self.temp_dir}")
-                
-            # 删除其他中间文件
-            for file_path in self.cleanup_files:
-                try:
-                    if os.path.exists(file_path):
-                        os.remove(file_path)
-                        self.log_message(f"删除中间文件: {os.path.basename(file_path)}")
-                except Exception as e:
-                    self.log_message(f"删除文件失败 {os.path.basename(file_path)}: {str(e)}")
-                    
-        except Exception as e:
-            self.log_message(f"清理过程中发生错误: {str(e)}")
-            
     def show_results(self):
         """显示处理结果"""
         if len(self.source_files) > 1:
@@ -1040,7 +732,7 @@ class DesktopAutomationTool:
             result_msg = f"批量处理完成！\n\n"
             result_msg += f"处理的文件数量: {len(self.source_files)}\n"
             result_msg += f"提取的MP4文件数量: {len(self.mp4_files)}\n"
-            result_msg += f"统一输出目录: {getattr(self, 'unified_output_dir', self.output_dir)}\n\n"
+            result_msg += f"统一输出目录: {self.unified_output_dir or self.output_dir}\n\n"
             
             if self.mp4_files:
                 result_msg += "提取的MP4文件:\n"
@@ -1073,51 +765,6 @@ class DesktopAutomationTool:
                 
         messagebox.showinfo("处理完成", result_msg)
         
-    def setup_individual_output_directory(self, source_file):
-        """为单个文件设置独立输出目录"""
-        # 获取用户配置的输出目录，如果没有则使用默认目录
-        individual_output_dir = self.file_output_dirs.get(source_file, self.output_dir)
-        
-        # 创建以文件名命名的子目录
-        filename_without_ext = os.path.splitext(os.path.basename(source_file))[0]
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        self.current_individual_output_dir = os.path.join(individual_output_dir, f"{filename_without_ext}_{timestamp}")
-        os.makedirs(self.current_individual_output_dir, exist_ok=True)
-        
-        self.log_message(f"创建独立输出目录: {self.current_individual_output_dir}")
-    
-    def extract_mp4_files_to_individual_dir(self, source_file):
-        """提取MP4文件到独立目录"""
-        self.log_message("搜索当前临时目录中的MP4文件...")
-        
-        mp4_files = []
-        for root, dirs, files in os.walk(self.temp_dir):
-            for file in files:
-                if file.lower().endswith('.mp4'):
-                    mp4_files.append(os.path.join(root, file))
-                    
-        self.log_message(f"在当前文件中发现 {len(mp4_files)} 个MP4文件")
-        
-        # 复制MP4文件到独立输出目录
-        for i, mp4_file in enumerate(mp4_files):
-            try:
-                filename = os.path.basename(mp4_file)
-                output_path = os.path.join(self.current_individual_output_dir, filename)
-                
-                # 如果文件已存在，添加序号
-                counter = 1
-                original_name, ext = os.path.splitext(filename)
-                while os.path.exists(output_path):
-                    output_path = os.path.join(self.current_individual_output_dir, f"{original_name}_{counter}{ext}")
-                    counter += 1
-                    
-                shutil.copy2(mp4_file, output_path)
-                self.mp4_files.append(output_path)
-                self.log_message(f"复制MP4文件: {filename}")
-                
-            except Exception as e:
-                self.log_message(f"复制MP4文件失败 {filename}: {str(e)}")
-    
     def handle_failed_files(self):
         """处理失败的文件"""
         if not self.failed_files:
@@ -1254,4 +901,4 @@ def main():
         input("按回车键退出...")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+内存控制 - 解压时的内存上限和进程内存统计
+功能：在并行的解压之间分配内存预算（预算不足时等待，或改用磁盘缓冲），读取进程当前和峰值的常驻内存（RSS）
+"""
+
+import os
+import sys
+import threading
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+MB = 1024 * 1024
+
+
+def current_rss():
+    """进程当前的常驻内存（字节），无法读取时返回None"""
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+def peak_rss():
+    """进程启动以来的峰值常驻内存（字节），无法读取时返回None"""
+    try:
+        with open('/proc/self/status', 'r') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux上单位是KB，macOS上是字节
+    return usage if sys.platform == 'darwin' else usage * 1024
+
+
+def sample_rss():
+    """用于采样的内存值：优先使用当前RSS，不支持时退回峰值RSS"""
+    rss = current_rss()
+    return rss if rss is not None else peak_rss()
+
+
+def format_size(size):
+    return f"{size / MB:.1f} MB"
+
+
+class MemoryBudget:
+    """多个解压线程共享的内存预算
+
+    limit 为空时不限制。reserve() 在预算不足时等待其他解压释放内存；
+    单个请求超过全部预算时等到没有其他占用后单独运行，不会永远等待。
+    borrow() 不等待：预算不足时得到0，调用方改用磁盘等不占内存的方式。
+    """
+
+    def __init__(self, limit=None):
+        self.limit = limit if limit and limit > 0 else None
+        self.used = 0
+        self.peak = 0
+        self._condition = threading.Condition()
+
+    @property
+    def limited(self):
+        return self.limit is not None
+
+    def _acquire(self, amount):
+        self.used += amount
+        self.peak = max(self.peak, self.used)
+
+    def release(self, amount):
+        if not self.limited or amount <= 0:
+            return
+        with self._condition:
+            self.used = max(0, self.used - amount)
+            self._condition.notify_all()
+
+    @contextmanager
+    def reserve(self, amount):
+        """占用 amount 字节直到退出（预算不足时等待）"""
+        if not self.limited or not amount or amount <= 0:
+            yield 0
+            return
+        with self._condition:
+            while self.used and self.used + amount > self.limit:
+                self._condition.wait()
+            self._acquire(amount)
+        try:
+            yield amount
+        finally:
+            self.release(amount)
+
+    @contextmanager
+    def borrow(self, amount):
+        """预算足够时占用 amount 字节，否则得到0（不等待）"""
+        if not self.limited:
+            yield amount
+            return
+        with self._condition:
+            granted = amount if amount > 0 and self.used + amount <= self.limit else 0
+            self._acquire(granted)
+        try:
+            yield granted
+        finally:
+            self.release(granted)
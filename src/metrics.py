@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+运行指标 - 以Prometheus文本格式输出处理统计，供node_exporter的textfile collector采集
+功能：统计处理/失败的压缩包、解压字节数、输出的MP4、每个压缩包的密码尝试次数、各阶段耗时和临时空间最高占用，处理过程中定期、批次结束时原子写入 .prom 文件
+"""
+
+import os
+import time
+import threading
+
+from memory import MB, peak_rss
+
+PREFIX = "desktop_automation_"
+
+# 各阶段耗时的直方图分桶（秒）
+STAGE_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300, 900, 3600)
+# 密码尝试次数的直方图分桶
+PASSWORD_BUCKETS = (1, 2, 3, 5, 10, 20, 50)
+# 每个压缩包处理期间进程峰值内存的直方图分桶（字节）
+RSS_BUCKETS = tuple(size * MB for size in (64, 128, 256, 512, 1024, 2048, 4096, 8192))
+
+
+def format_value(value):
+    if value == float('inf'):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+class Metric:
+    """指标基类：按标签值分别保存数据"""
+
+    kind = "untyped"
+
+    def __init__(self, name, help_text, label_names=()):
+        self.name = PREFIX + name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+            for labels, value in items:
+                lines.extend(self.render_sample(labels, value))
+        return lines
+
+    def render_sample(self, labels, value):
+        return [f"{self.name}{format_labels(self.label_names, labels)} {format_value(value)}"]
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, *labels):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def set(self, value, *labels):
+        with self._lock:
+            self._values[labels] = value
+
+    def inc(self, amount=1, *labels):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def set_max(self, value, *labels):
+        with self._lock:
+            self._values[labels] = max(self._values.get(labels, 0), value)
+
+    def value(self, *labels):
+        with self._lock:
+            return self._values.get(labels, 0)
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, buckets, label_names=()):
+        super().__init__(name, help_text, label_names)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+
+    def observe(self, value, *labels):
+        with self._lock:
+            counts, total = self._values.get(labels, ([0] * len(self.buckets), 0.0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self._values[labels] = (counts, total + value)
+
+    def render_sample(self, labels, value):
+        counts, total = value
+        lines = [f"{self.name}_bucket{format_labels(self.label_names, labels, [('le', format_value(bound))])} {count}"
+                 for bound, count in zip(self.buckets, counts)]
+        lines.append(f"{self.name}_sum{format_labels(self.label_names, labels)} {format_value(total)}")
+        lines.append(f"{self.name}_count{format_labels(self.label_names, labels)} {counts[-1]}")
+        return lines
+
+
+class ProcessingMetrics:
+    """处理流程的全部指标
+
+    计数器和直方图在进程内一直累加（监视模式下跨批次），批次相关的量表每个批次重新开始。
+    监视模式下多个工作线程（slot）同时处理各自的批次，批次相关的量表带 slot 标签，互不覆盖。
+    write() 原子写入 .prom 文件：先写同目录的临时文件再替换，采集时不会读到写了一半的文件。
+    """
+
+    def __init__(self, path, interval=15.0, log=None, clock=time.time):
+        self.path = path
+        self.interval = interval  # 处理过程中最多每 interval 秒写一次
+        self._log = log
+        self.clock = clock
+        self._write_lock = threading.Lock()
+        self._scratch_lock = threading.Lock()
+        self._last_write = 0.0
+        self.scratch_bytes = 0
+
+        self.archives_processed = Counter("archives_processed_total", "处理完成的源压缩包数量")
+        self.archives_failed = Counter("archives_failed_total", "处理失败的源压缩包数量")
+        self.archives_skipped = Counter("archives_skipped_total", "直接采用以前结果的源压缩包数量（断点续处理或增量处理）")
+        self.input_bytes = Counter("input_bytes_total", "处理的源压缩包字节数")
+        self.bytes_decompressed = Counter("bytes_decompressed_total", "解压写出的字节数（包括内部压缩包）")
+        self.mp4_delivered = Counter("mp4_delivered_total", "输出的MP4文件数量")
+        self.mp4_delivered_bytes = Counter("mp4_delivered_bytes_total", "输出的MP4文件字节数")
+        self.mp4_duplicates = Counter("mp4_duplicates_total", "内容重复而未输出的MP4文件数量")
+        self.batches = Counter("batches_total", "完成的批次数量")
+        self.password_attempts = Histogram("password_attempts", "加密压缩包找到密码前验证的候选密码数量",
+                                           PASSWORD_BUCKETS)
+        self.archive_peak_rss = Histogram("archive_peak_rss_bytes", "处理每个压缩包期间采样到的进程峰值常驻内存",
+                                          RSS_BUCKETS)
+        self.process_peak_rss = Gauge("process_peak_rss_bytes", "进程启动以来的峰值常驻内存")
+        self.stage_duration = Histogram("stage_duration_seconds", "各处理阶段的耗时（秒）", STAGE_BUCKETS, ("stage",))
+        self.scratch_high_water = Gauge("scratch_high_water_bytes",
+                                        "临时目录中同时存在的解压数据的最大字节数（从没有批次运行时开始计算）")
+        self.scratch_in_use = Gauge("scratch_bytes", "临时目录中当前的解压数据字节数")
+        self.batches_running = Gauge("batches_running", "正在处理的批次数量")
+        self.batch_archives = Gauge("batch_archives", "当前批次的压缩包数量", ("slot", "state"))
+        self.batch_started = Gauge("batch_start_timestamp_seconds", "当前（或最近）批次的开始时间", ("slot",))
+        self.last_batch_duration = Gauge("last_batch_duration_seconds", "最近完成的批次的耗时（秒）", ("slot",))
+        self.last_progress = Gauge("last_progress_timestamp_seconds", "最近一次有解压或输出进展的时间")
+        self.last_success = Gauge("last_success_timestamp_seconds", "最近一个压缩包处理成功的时间")
+
+        self.metrics = [
+            self.archives_processed, self.archives_failed, self.archives_skipped, self.input_bytes, self.bytes_decompressed,
+            self.mp4_delivered, self.mp4_delivered_bytes, self.mp4_duplicates, self.batches,
+            self.password_attempts, self.archive_peak_rss, self.process_peak_rss, self.stage_duration, self.scratch_high_water, self.scratch_in_use,
+            self.batches_running, self.batch_archives, self.batch_started, self.last_batch_duration,
+            self.last_progress, self.last_success,
+        ]
+
+    def start_batch(self, total, slot="0"):
+        """开始一个批次，slot 区分同时运行的批次（监视模式的工作线程编号）"""
+        now = self.clock()
+        with self._scratch_lock:
+            if not self.batches_running.value():
+                # 其他批次还在运行时不重新计算，避免清掉它们的最高值
+                self.scratch_high_water.set(self.scratch_bytes)
+            self.batches_running.inc()
+        self.batch_archives.set(total, slot, "total")
+        self.batch_archives.set(0, slot, "completed")
+        self.batch_started.set(now, slot)
+        self.last_progress.set(now)
+        self.write()
+
+    def finish_job(self, job, completed, slot="0"):
+        """记录一个完成（或失败）的源压缩包"""
+        self.batch_archives.set(completed, slot, "completed")
+        if job.reused:
+            self.archives_skipped.inc()
+            return
+        if job.success:
+            self.archives_processed.inc()
+            self.last_success.set(self.clock())
+        else:
+            self.archives_failed.inc()
+        self.input_bytes.inc(job.input_bytes)
+        self.bytes_decompressed.inc(job.extracted_bytes)
+        self.mp4_delivered.inc(len(job.mp4_files))
+        self.mp4_delivered_bytes.inc(sum(os.path.getsize(path) for path in job.mp4_files if os.path.exists(path)))
+        self.mp4_duplicates.inc(len(job.duplicates))
+        if job.peak_rss is not None:
+            self.archive_peak_rss.observe(job.peak_rss)
+        self.write(force=True)
+
+    def finish_batch(self, elapsed, slot="0"):
+        self.batches.inc()
+        with self._scratch_lock:
+            self.batches_running.inc(-1)
+        self.last_batch_duration.set(elapsed, slot)
+        rss = peak_rss()
+        if rss is not None:
+            self.process_peak_rss.set(rss)
+        self.write(force=True)
+
+    def progress(self):
+        """有解压或输出进展时调用（按 interval 限制写文件的频率）"""
+        self.last_progress.set(self.clock())
+        self.write()
+
+    def observe_stage(self, stage, seconds):
+        self.stage_duration.observe(seconds, stage)
+
+    def scratch_add(self, count):
+        with self._scratch_lock:
+            self.scratch_bytes += count
+            self.scratch_in_use.set(self.scratch_bytes)
+            self.scratch_high_water.set_max(self.scratch_bytes)
+
+    def scratch_release(self, count):
+        with self._scratch_lock:
+            self.scratch_bytes = max(0, self.scratch_bytes - count)
+            self.scratch_in_use.set(self.scratch_bytes)
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def write(self, force=False):
+        """原子写入 .prom 文件，force=False 时距上次写入不到 interval 秒则跳过
+
+        写入失败只记录日志，不影响处理流程。
+        """
+        now = self.clock()
+        if not force and now - self._last_write < self.interval:
+            return False
+        with self._write_lock:
+            self._last_write = now
+            directory = os.path.dirname(self.path) or '.'
+            # 临时文件不能以 .prom 结尾，否则textfile collector可能读到写了一半的文件
+            temp_path = os.path.join(directory, f".{os.path.basename(self.path)}.{os.getpid()}.tmp")
+            try:
+                os.makedirs(directory, exist_ok=True)
+                with open(temp_path, 'w', encoding='utf-8') as f:
+                    f.write(self.render())
+                os.replace(temp_path, self.path)
+            except OSError as e:
+                if self._log is not None:
+                    self._log(f"写入运行指标失败: {str(e)}")
+                return False
+        return True
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+密码统计存储 - 记录每类压缩包成功使用过的密码
+功能：按压缩包名称模式和来源目录统计密码命中率，下次处理时优先尝试命中率高的密码
+"""
+
+import os
+import re
+import json
+import threading
+
+
+class PasswordStatsStore:
+    """持久化的密码命中统计
+
+    数据按键分组保存，键为压缩包名称模式（数字替换为#）或来源目录，
+    每个键下记录处理过的压缩包数量和每个密码的命中次数。
+    """
+
+    def __init__(self, store_path):
+        self.store_path = store_path
+        self._lock = threading.Lock()
+        self._stats = self._load()
+
+    def _load(self):
+        """从磁盘加载统计数据，文件不存在或损坏时返回空数据"""
+        try:
+            with open(self.store_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self):
+        """原子写入统计数据（先写临时文件再替换）
+
+        文件中保存的是明文密码：临时文件创建时权限就是 0600（只有当前用户可读写），
+        替换后的统计文件权限相同，写入过程中也不会被其他用户读到。
+        """
+        os.makedirs(os.path.dirname(self.store_path) or '.', exist_ok=True)
+        temp_path = self.store_path + '.tmp'
+        try:
+            # 上次中断时残留的临时文件可能是别的权限，删除后重新创建
+            os.remove(temp_path)
+        except FileNotFoundError:
+            pass
+        fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(self._stats, f, ensure_ascii=False, indent=2)
+        os.replace(temp_path, self.store_path)
+
+    @staticmethod
+    def make_keys(archive_path, source_file=None):
+        """生成统计键：压缩包名称模式，以及源文件所在目录"""
+        name = os.path.basename(archive_path).lower()
+        stem = name.split('.', 1)[0]
+        keys = ["name:" + re.sub(r'\d+', '#', stem)]
+        if source_file:
+            keys.append("dir:" + os.path.normcase(os.path.abspath(os.path.dirname(source_file))))
+        return keys
+
+    def hit_rate(self, keys, password):
+        """计算密码在这些键下的最高命中率"""
+        best = 0.0
+        with self._lock:
+            for key in keys:
+                entry = self._stats.get(key)
+                if not entry or not entry.get("archives"):
+                    continue
+                hits = entry.get("hits", {}).get(password, 0)
+                best = max(best, hits / entry["archives"])
+        return best
+
+    def rank(self, candidates, keys):
+        """按历史命中率重新排序候选密码
+
+        曾经成功过但不在候选列表中的密码（例如手动输入的密码）也会加入。
+        命中率相同的密码保持原有顺序。
+        """
+        ranked = list(candidates)
+        with self._lock:
+            for key in keys:
+                for password in self._stats.get(key, {}).get("hits", {}):
+                    if password not in ranked:
+                        ranked.append(password)
+        order = {password: i for i, password in enumerate(ranked)}
+        return sorted(ranked, key=lambda password: (-self.hit_rate(keys, password), order[password]))
+
+    def record_success(self, keys, password):
+        """记录一次成功解压使用的密码并写入磁盘"""
+        with self._lock:
+            for key in keys:
+                entry = self._stats.setdefault(key, {"archives": 0, "hits": {}})
+                entry["archives"] += 1
+                entry["hits"][password] = entry["hits"].get(password, 0) + 1
+            self._save()
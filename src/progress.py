@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+字节进度 - 按字节统计解压进度、吞吐量和剩余时间
+功能：记录每个压缩包和整个批次已处理的字节数，计算当前速度、滑动平均速度和预计剩余时间
+"""
+
+import time
+import threading
+from collections import deque
+
+MB = 1024 * 1024
+
+
+class ThroughputMeter:
+    """按时间窗口计算吞吐量（字节/秒）
+
+    记录 (时间, 累计字节数) 采样点，间隔小于 sample_interval 的采样合并，
+    只保留最近 window 秒的数据。
+    """
+
+    def __init__(self, window=30.0, sample_interval=0.1, clock=time.monotonic):
+        self.window = window
+        self.sample_interval = sample_interval
+        self.clock = clock
+        self.total = 0
+        self.samples = deque([(clock(), 0)])
+        self._lock = threading.Lock()
+
+    def add(self, count):
+        with self._lock:
+            now = self.clock()
+            self.total += count
+            if now - self.samples[-1][0] >= self.sample_interval:
+                self.samples.append((now, self.total))
+            else:
+                self.samples[-1] = (self.samples[-1][0], self.total)
+            # 保留一个窗口之前的采样点作为计算起点
+            while len(self.samples) > 2 and self.samples[1][0] <= now - self.window:
+                self.samples.popleft()
+
+    def rate(self, seconds=None):
+        """最近 seconds 秒（默认整个窗口）的平均速度，字节/秒"""
+        with self._lock:
+            now = self.clock()
+            cutoff = now - (self.window if seconds is None else seconds)
+            base_time, base_total = self.samples[0]
+            for sample_time, sample_total in self.samples:
+                if sample_time > cutoff:
+                    break
+                base_time, base_total = sample_time, sample_total
+            elapsed = now - base_time
+            if elapsed <= 0:
+                return 0.0
+            return (self.total - base_total) / elapsed
+
+
+class ByteProgress:
+    """单个压缩包的字节进度
+
+    预计总字节数开始时是压缩包文件大小，第一次拿到文件列表时替换为列表中的
+    解压后大小；之后内部压缩包的文件列表在此基础上累加。
+    """
+
+    current_window = 2.0  # 当前速度的统计时间（秒）
+
+    def __init__(self, estimate=0, clock=time.monotonic):
+        self.total = estimate
+        self.estimated = True
+        self.done = 0
+        self.finished = False
+        self.meter = ThroughputMeter(clock=clock)
+        self._lock = threading.Lock()
+
+    def expect(self, count):
+        """加入文件列表中的字节数"""
+        with self._lock:
+            if self.estimated:
+                self.total = 0
+                self.estimated = False
+            self.total += count
+
+    def settle(self):
+        """主压缩包解压完成：之后的文件列表只累加（没有文件列表时按已解压的字节数计算）"""
+        with self._lock:
+            if self.estimated:
+                self.total = self.done
+                self.estimated = False
+
+    def advance(self, count):
+        with self._lock:
+            self.done += count
+            if not self.estimated and self.done > self.total:
+                self.total = self.done
+        self.meter.add(count)
+
+    def finish(self):
+        self.finished = True
+
+    @property
+    def fraction(self):
+        if self.finished:
+            return 1.0
+        if self.total <= 0:
+            return 0.0
+        return min(1.0, self.done / self.total)
+
+    @property
+    def remaining(self):
+        return 0 if self.finished else max(0, self.total - self.done)
+
+    def current_rate(self):
+        return self.meter.rate(self.current_window)
+
+    def average_rate(self):
+        return self.meter.rate()
+
+    def eta(self):
+        """预计剩余时间（秒），速度未知时返回None"""
+        rate = self.average_rate()
+        if rate <= 0:
+            return None
+        return self.remaining / rate
+
+
+class BatchProgress:
+    """整个批次的进度
+
+    批次总量是各源压缩包的文件大小，每个任务的进度按其源文件大小加权；
+    尚未开始的任务按已开始任务的"解压后/压缩前"比例估计剩余字节数。
+    """
+
+    def __init__(self, jobs, clock=time.monotonic):
+        self.jobs = list(jobs)
+        self.total_input = sum(job.input_bytes for job in self.jobs)
+        self.meter = ThroughputMeter(clock=clock)
+
+    def advance(self, count):
+        self.meter.add(count)
+
+    @property
+    def fraction(self):
+        if not self.jobs:
+            return 1.0
+        if self.total_input <= 0:
+            return sum(job.progress.fraction for job in self.jobs) / len(self.jobs)
+        return sum(job.input_bytes * job.progress.fraction for job in self.jobs) / self.total_input
+
+    def remaining(self):
+        started = [job for job in self.jobs if job.start_time is not None]
+        started_input = sum(job.input_bytes for job in started)
+        started_total = sum(max(job.progress.total, job.progress.done) for job in started)
+        ratio = started_total / started_input if started_input > 0 else 1.0
+        remaining = sum(job.progress.remaining for job in started)
+        remaining += sum(job.input_bytes * ratio for job in self.jobs if job.start_time is None)
+        return remaining
+
+    def current_rate(self):
+        return self.meter.rate(ByteProgress.current_window)
+
+    def average_rate(self):
+        return self.meter.rate()
+
+    def eta(self):
+        rate = self.average_rate()
+        if rate <= 0:
+            return None
+        return self.remaining() / rate
+
+
+def format_rate(bytes_per_second):
+    return f"{bytes_per_second / MB:.1f} MB/s"
+
+
+def format_eta(seconds):
+    """剩余时间显示为 分:秒 或 时:分:秒，未知时显示 --:--"""
+    if seconds is None:
+        return "--:--"
+    seconds = int(seconds + 0.5)
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    if hours:
+        return f"{hours}:{minutes:02d}:{seconds:02d}"
+    return f"{minutes:02d}:{seconds:02d}"
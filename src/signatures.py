@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+文件头格式识别 - 按魔数判断压缩格式，不依赖扩展名
+功能：读取文件开头的字节识别 zip/rar/7z/gzip/bzip2/xz/zstd/tar，结果缓存在内存中，处理流程据此直接选择解压后端，不再重命名文件
+"""
+
+import os
+import bz2
+import gzip
+import lzma
+import threading
+
+# (偏移量, 魔数, 签名名称)
+SIGNATURES = (
+    (0, b'PK\x03\x04', 'zip'),
+    (0, b'PK\x05\x06', 'zip'),  # 空ZIP
+    (0, b'PK\x07\x08', 'zip'),  # 分卷ZIP
+    (0, b'Rar!\x1a\x07', 'rar'),
+    (0, b'7z\xbc\xaf\x27\x1c', '7z'),
+    (0, b'\x1f\x8b', 'gzip'),
+    (0, b'BZh', 'bzip2'),
+    (0, b'\xfd7zXZ\x00', 'xz'),
+    (0, b'\x28\xb5\x2f\xfd', 'zstd'),
+    (257, b'ustar', 'tar'),
+)
+
+# 识别需要读取的字节数（TAR的ustar标记在257字节处）
+HEADER_SIZE = 512
+
+# 压缩流签名 -> 解压内容的打开方式（用于检查里面是否为TAR）
+STREAM_OPENERS = {'gzip': gzip.open, 'bzip2': bz2.open, 'xz': lzma.open}
+
+# 签名 -> 解压后端使用的压缩格式
+SIGNATURE_FORMATS = {
+    'zip': 'zip', 'rar': 'rar', '7z': '7z', 'tar': 'tar',
+    'gzip': 'tar', 'bzip2': 'tar', 'xz': 'tar', 'zstd': 'zstd',
+}
+
+
+def sniff_header(header):
+    """根据文件开头的字节返回签名名称，无法识别时返回None"""
+    for offset, magic, name in SIGNATURES:
+        if header[offset:offset + len(magic)] == magic:
+            return name
+    return None
+
+
+def is_tar_stream(path, signature):
+    """压缩流解压后的开头是否为TAR（无法检查时按TAR处理）"""
+    opener = STREAM_OPENERS.get(signature)
+    if opener is None:
+        return True
+    try:
+        with opener(path, 'rb') as stream:
+            header = stream.read(HEADER_SIZE)
+    except (OSError, EOFError, lzma.LZMAError):
+        return False
+    return sniff_header(header) == 'tar'
+
+
+class FormatSniffer:
+    """带内存缓存的文件头格式识别
+
+    缓存按路径保存，文件大小或修改时间变化后重新识别；
+    同一个文件在各处理步骤中只读取一次文件头。
+    """
+
+    def __init__(self):
+        self._cache = {}  # 路径 -> (大小, 修改时间, 签名, 压缩格式)
+        self._lock = threading.Lock()
+
+    def identify(self, path):
+        """返回 (签名名称, 压缩格式)，不是压缩包时都为None"""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None, None
+        key = (stat.st_size, stat.st_mtime_ns)
+        with self._lock:
+            cached = self._cache.get(path)
+        if cached is not None and cached[:2] == key:
+            return cached[2:]
+
+        try:
+            with open(path, 'rb') as f:
+                signature = sniff_header(f.read(HEADER_SIZE))
+        except OSError:
+            signature = None
+        fmt = SIGNATURE_FORMATS.get(signature)
+        if signature in STREAM_OPENERS and not is_tar_stream(path, signature):
+            # 单个文件的压缩流（不是TAR），没有可用的解压后端
+            fmt = None
+
+        with self._lock:
+            self._cache[path] = key + (signature, fmt)
+        return signature, fmt
+
+    def archive_format(self, path):
+        """按文件头返回压缩格式：zip / rar / 7z / tar / zstd，无法识别时返回None"""
+        return self.identify(path)[1]
+
+    def forget(self, path):
+        with self._lock:
+            self._cache.pop(path, None)
+
+    def forget_tree(self, directory):
+        """删除目录下所有文件的缓存（临时目录删除后调用）"""
+        prefix = os.path.join(directory, '')
+        with self._lock:
+            for path in [path for path in self._cache if path.startswith(prefix)]:
+                del self._cache[path]
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+后台删除 - 把临时目录移入回收区后在后台线程中删除
+功能：临时目录在同一文件系统中原子改名移入回收区，处理流程立即继续；回收区中的目录由固定数量的后台线程删除，批次结束时等待全部删除完成
+"""
+
+import os
+import shutil
+import itertools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class TrashBin:
+    """回收区：trash_dir 必须与要删除的目录在同一文件系统上（改名才是原子的）
+
+    discard() 改名失败（例如跨文件系统）时返回False，由调用方同步删除。
+    delete(path) 在后台线程中删除一个目录，默认为 shutil.rmtree。
+    """
+
+    def __init__(self, trash_dir, workers=2, delete=None):
+        self.trash_dir = trash_dir
+        self.workers = max(1, workers)
+        self.delete = delete or shutil.rmtree
+        self._executor = None
+        self._futures = []
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+
+    def discard(self, path):
+        """把目录改名移入回收区并安排后台删除，成功返回True"""
+        name = f"{os.path.basename(os.path.normpath(path))}_{os.getpid()}_{next(self._counter)}"
+        target = os.path.join(self.trash_dir, name)
+        try:
+            os.makedirs(self.trash_dir, exist_ok=True)
+            os.rename(path, target)
+        except OSError:
+            return False
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="trash")
+            self._futures.append((target, self._executor.submit(self.delete, target)))
+        return True
+
+    @property
+    def pending(self):
+        with self._lock:
+            return sum(1 for _, future in self._futures if not future.done())
+
+    def wait(self):
+        """等待已安排的删除全部完成，返回 (删除的目录数, [(目录, 错误)])"""
+        with self._lock:
+            futures, self._futures = self._futures, []
+        errors = []
+        for target, future in futures:
+            try:
+                future.result()
+            except Exception as e:
+                errors.append((target, e))
+        return len(futures) - len(errors), errors
+
+    def close(self):
+        """等待全部删除完成并结束后台线程，返回值同 wait()"""
+        result = self.wait()
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+        return result
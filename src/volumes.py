@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+分卷压缩包 - 识别并分组 .001/.002、.7z.001、.partN.rar 等分卷
+功能：按文件名把同一组分卷归为一个任务，只解压一次；按字节切分的分卷（.001/.002）通过虚拟的拼接文件对象顺序读取，不在磁盘上合并
+"""
+
+import io
+import os
+import re
+import bisect
+
+# name.001 / name.7z.001 / name.zip.001：按字节切分的分卷
+NUMERIC_VOLUME_PATTERN = re.compile(r'^(?P<base>.+)\.(?P<number>\d{3})$')
+# name.part1.rar / name.part01.rar：RAR多卷压缩包
+RAR_VOLUME_PATTERN = re.compile(r'^(?P<base>.+)\.part(?P<number>\d+)\.rar$', re.IGNORECASE)
+
+
+def parse_volume(file_name):
+    """解析分卷文件名，返回 (分组名称, 分卷序号, 类型 numeric/rar)，不是分卷时返回None"""
+    for style, pattern in (('rar', RAR_VOLUME_PATTERN), ('numeric', NUMERIC_VOLUME_PATTERN)):
+        match = pattern.match(os.path.basename(file_name))
+        if match:
+            return match.group('base').lower(), int(match.group('number')), style
+    return None
+
+
+def is_later_volume(file_path):
+    """是否为分卷组中第一个分卷之后的分卷（这些分卷随第一个分卷一起解压）"""
+    info = parse_volume(file_path)
+    return info is not None and info[1] > 1
+
+
+def volume_parts(file_path):
+    """第一个分卷所在分卷组的全部分卷路径（按序号排列，遇到缺失的序号为止）
+
+    不是分卷或没有其他分卷时返回 [file_path]。
+    """
+    info = parse_volume(file_path)
+    if info is None or info[1] != 1:
+        return [file_path]
+    base, _, style = info
+    directory = os.path.dirname(file_path)
+    siblings = {}
+    try:
+        names = os.listdir(directory or '.')
+    except OSError:
+        return [file_path]
+    for name in names:
+        sibling = parse_volume(name)
+        if sibling is not None and sibling[0] == base and sibling[2] == style:
+            siblings[sibling[1]] = os.path.join(directory, name)
+
+    parts = [file_path]
+    number = 2
+    while number in siblings:
+        parts.append(siblings[number])
+        number += 1
+    return parts
+
+
+def split_volume_parts(file_path):
+    """按字节切分的分卷组（.001/.002...）的全部分卷，不是这种分卷时返回None"""
+    info = parse_volume(file_path)
+    if info is None or info[2] != 'numeric':
+        return None
+    parts = volume_parts(file_path)
+    return parts if len(parts) > 1 else None
+
+
+def group_volumes(file_paths):
+    """把文件列表中的分卷合并为分卷组
+
+    返回 (要处理的文件, 缺少第一个分卷的文件)：每组只保留第一个分卷，
+    列表中已经包含第一个分卷或第一个分卷就在同一目录中的后续分卷被去掉。
+    """
+    selected = []
+    orphans = []
+    seen_sets = set()
+    for file_path in file_paths:
+        info = parse_volume(file_path)
+        if info is None:
+            selected.append(file_path)
+            continue
+        base, number, style = info
+        set_key = (os.path.dirname(os.path.abspath(file_path)), base, style)
+        if set_key in seen_sets:
+            continue
+        if number == 1:
+            first_path = file_path
+        else:
+            first_path = find_first_volume(file_path)
+            if first_path is None:
+                orphans.append(file_path)
+                continue
+        seen_sets.add(set_key)
+        selected.append(first_path)
+    return selected, orphans
+
+
+def find_first_volume(file_path):
+    """在同一目录中查找分卷组的第一个分卷，找不到时返回None"""
+    info = parse_volume(file_path)
+    if info is None:
+        return None
+    directory = os.path.dirname(file_path)
+    try:
+        names = os.listdir(directory or '.')
+    except OSError:
+        return None
+    for name in names:
+        sibling = parse_volume(name)
+        if sibling == (info[0], 1, info[2]):
+            return os.path.join(directory, name)
+    return None
+
+
+class ConcatenatedFile(io.RawIOBase):
+    """把多个文件按顺序拼接成一个只读、可随机访问的文件对象
+
+    同一时间只打开一个分卷；每次读取尽量填满缓冲区（跨越分卷边界时继续读下一个分卷），
+    zipfile/tarfile/py7zr 可以像普通文件一样使用。
+    """
+
+    def __init__(self, paths):
+        super().__init__()
+        self.paths = list(paths)
+        self.sizes = [os.path.getsize(path) for path in self.paths]
+        self.offsets = []
+        total = 0
+        for size in self.sizes:
+            self.offsets.append(total)
+            total += size
+        self.size = total
+        self._position = 0
+        self._index = None
+        self._file = None
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            position = offset
+        elif whence == io.SEEK_CUR:
+            position = self._position + offset
+        elif whence == io.SEEK_END:
+            position = self.size + offset
+        else:
+            raise ValueError(f"无效的whence: {whence}")
+        if position < 0:
+            raise ValueError("位置不能为负数")
+        self._position = position
+        return position
+
+    def _open_part(self, index):
+        if self._index != index:
+            if self._file is not None:
+                self._file.close()
+            self._file = open(self.paths[index], 'rb')
+            self._index = index
+        return self._file
+
+    def readinto(self, buffer):
+        view = memoryview(buffer).cast('B')
+        filled = 0
+        while filled < len(view) and self._position < self.size:
+            index = bisect.bisect_right(self.offsets, self._position) - 1
+            part_offset = self._position - self.offsets[index]
+            available = self.sizes[index] - part_offset
+            if available <= 0:
+                break
+            part = self._open_part(index)
+            part.seek(part_offset)
+            count = part.readinto(view[filled:filled + min(available, len(view) - filled)])
+            if not count:
+                break
+            filled += count
+            self._position += count
+        return filled
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            self._index = None
+        super().close()
@@ -0,0 +1,387 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+监视文件夹 - 长时间运行，自动处理放入收件目录的压缩包
+功能：用inotify（Linux）或定时扫描监视一个或多个目录，文件停止增长后交给处理引擎；固定数量的工作线程并行处理，每个压缩包落地后几秒内即可得到MP4
+"""
+
+import os
+import copy
+import time
+import queue
+import select
+import struct
+import ctypes
+import ctypes.util
+import threading
+
+from dedup import Mp4Deduplicator
+from engine import ExtractionEngine
+from journal import BatchJournal
+from volumes import is_later_volume, parse_volume
+
+# 正在下载或写入的文件（写完后通常会被重命名），不作为候选
+IGNORED_SUFFIXES = ('.tmp', '.part', '.partial', '.crdownload', '.download', '.!qb', '.filepart')
+IGNORED_PREFIXES = ('.', '~')
+
+# inotify 事件（linux/inotify.h）
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000
+INOTIFY_EVENT = struct.Struct('iIII')  # wd, mask, cookie, len
+
+
+def is_candidate_name(file_name):
+    """是否可能是已写完的文件（忽略隐藏文件和下载中的临时文件）"""
+    name = os.path.basename(file_name)
+    return not name.startswith(IGNORED_PREFIXES) and not name.lower().endswith(IGNORED_SUFFIXES)
+
+
+class InotifyEvents:
+    """Linux inotify：目录中有文件创建、写完或移入时立即返回这些文件
+
+    通过ctypes调用libc，不需要额外的依赖库；不可用时抛出OSError，由调用方改用定时扫描。
+    """
+
+    mask = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+
+    def __init__(self, directories):
+        library = ctypes.util.find_library('c')
+        if not library:
+            raise OSError("找不到libc")
+        libc = ctypes.CDLL(library, use_errno=True)
+        if not hasattr(libc, 'inotify_init1'):
+            raise OSError("当前系统不支持inotify")
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | getattr(os, 'O_CLOEXEC', 0))
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 失败")
+        self.directories = {}  # watch描述符 -> 目录
+        for directory in directories:
+            wd = libc.inotify_add_watch(self.fd, os.fsencode(directory), self.mask)
+            if wd < 0:
+                error = ctypes.get_errno()
+                os.close(self.fd)
+                raise OSError(error, f"无法监视目录: {directory}")
+            self.directories[wd] = directory
+        self.overflowed = False
+
+    def wait(self, timeout):
+        """等待最多 timeout 秒，返回有事件的文件路径"""
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        paths = []
+        offset = 0
+        while offset + INOTIFY_EVENT.size <= len(data):
+            wd, mask, _, length = INOTIFY_EVENT.unpack_from(data, offset)
+            offset += INOTIFY_EVENT.size
+            name = data[offset:offset + length].rstrip(b'\0')
+            offset += length
+            if mask & IN_Q_OVERFLOW:
+                self.overflowed = True  # 事件队列溢出，需要重新扫描目录
+            elif name and wd in self.directories:
+                paths.append(os.path.join(self.directories[wd], os.fsdecode(name)))
+        return paths
+
+    def close(self):
+        os.close(self.fd)
+
+
+class StabilityTracker:
+    """文件大小和修改时间在 settle_seconds 秒内没有变化才认为写入完成
+
+    已交出的文件记录其大小和修改时间，之后只有文件发生变化才会再次交出。
+    """
+
+    def __init__(self, settle_seconds=5.0, clock=time.monotonic):
+        self.settle_seconds = settle_seconds
+        self.clock = clock
+        self.pending = {}  # 路径 -> (大小, 修改时间, 开始稳定的时间)
+        self.handled = {}  # 路径 -> (大小, 修改时间)
+
+    def observe(self, path):
+        """记录文件的当前状态，文件变化时重新开始计时"""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            self.pending.pop(path, None)
+            self.handled.pop(path, None)
+            return
+        if not os.path.isfile(path):
+            return
+        key = (stat.st_size, stat.st_mtime_ns)
+        if self.handled.get(path) == key:
+            return
+        current = self.pending.get(path)
+        if current is None or current[:2] != key:
+            self.pending[path] = key + (self.clock(),)
+
+    def ready(self):
+        """返回已稳定的文件（空文件继续等待）"""
+        now = self.clock()
+        ready = []
+        for path in list(self.pending):
+            self.observe(path)
+            entry = self.pending.get(path)
+            if entry is None or entry[0] == 0 or now - entry[2] < self.settle_seconds:
+                continue
+            del self.pending[path]
+            self.handled[path] = entry[:2]
+            ready.append(path)
+        return ready
+
+    def defer(self, path):
+        """稍后再交出（例如同一组分卷还有文件在写入）"""
+        self.handled.pop(path, None)
+        self.observe(path)
+
+    def prune(self):
+        """忘记已被删除或移走的文件，长期运行时记录不会一直增长"""
+        for path in list(self.handled):
+            if not os.path.exists(path):
+                del self.handled[path]
+
+
+class FolderWatcher:
+    """监视一个或多个收件目录（只监视顶层文件）
+
+    优先使用inotify，文件一出现就开始检查是否写完；inotify不可用时每 poll_interval 秒扫描一次目录。
+    启动时目录中已有的文件同样会被处理。
+    """
+
+    def __init__(self, directories, settle_seconds=5.0, poll_interval=1.0, use_inotify=True, log=None):
+        self.directories = [os.path.abspath(directory) for directory in directories]
+        self.poll_interval = poll_interval
+        self.tracker = StabilityTracker(settle_seconds)
+        # 每 prune_interval 秒清理一次已不存在的文件的记录
+        self.prune_interval = 60.0
+        self._last_prune = time.monotonic()
+        self._log = log
+        self.events = None
+        if use_inotify:
+            try:
+                self.events = InotifyEvents(self.directories)
+            except (OSError, AttributeError) as e:
+                self.log_message(f"inotify不可用，改为每 {poll_interval} 秒扫描一次: {str(e)}")
+        self.scan()
+
+    def log_message(self, message):
+        if self._log is not None:
+            self._log(message)
+
+    @property
+    def mode(self):
+        return "inotify" if self.events is not None else "polling"
+
+    def scan(self):
+        """扫描所有目录中的文件"""
+        for directory in self.directories:
+            try:
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        if entry.is_file() and is_candidate_name(entry.name):
+                            self.tracker.observe(entry.path)
+            except OSError as e:
+                self.log_message(f"无法扫描目录 {directory}: {str(e)}")
+
+    def poll(self, timeout=None):
+        """等待文件事件或扫描目录，返回已写完的文件"""
+        timeout = self.poll_interval if timeout is None else timeout
+        if self.events is not None:
+            # 还有未写完的文件时缩短等待，按时检查它们是否稳定
+            if self.tracker.pending:
+                timeout = min(timeout, self.tracker.settle_seconds / 4)
+            for path in self.events.wait(timeout):
+                if is_candidate_name(path):
+                    self.tracker.observe(path)
+            if self.events.overflowed:
+                self.events.overflowed = False
+                self.scan()
+        else:
+            time.sleep(timeout)
+            self.scan()
+
+        now = time.monotonic()
+        if now - self._last_prune >= self.prune_interval:
+            self._last_prune = now
+            self.tracker.prune()
+
+        ready = []
+        for path in self.tracker.ready():
+            if self.has_pending_volume(path):
+                self.tracker.defer(path)
+            else:
+                ready.append(path)
+        return ready
+
+    def has_pending_volume(self, path):
+        """同一组分卷中是否还有没写完的文件"""
+        info = parse_volume(path)
+        if info is None:
+            return False
+        directory = os.path.dirname(path)
+        for pending_path in self.tracker.pending:
+            other = parse_volume(pending_path)
+            if other is not None and os.path.dirname(pending_path) == directory and other[0] == info[0] and other[2] == info[2]:
+                return True
+        return False
+
+    def close(self):
+        if self.events is not None:
+            self.events.close()
+            self.events = None
+
+
+class WatchDaemon:
+    """监视收件目录并用固定数量的工作线程处理新压缩包
+
+    每个工作线程拥有独立的处理引擎（独立的临时目录和批次日志），每个压缩包作为一个批次处理；
+    统一输出模式下所有MP4直接输出到基础输出目录。压缩包指纹、密码统计和解压后端在各引擎之间共享，
+    重启后已处理过的压缩包会被跳过，上次中断的压缩包会先清理再重新处理。
+    """
+
+    def __init__(self, config, directories, settle_seconds=5.0, poll_interval=1.0, workers=None,
+                 use_inotify=True, log=None, on_result=None):
+        self.config = config
+        self.directories = list(directories)
+        self.workers = max(1, int(workers or config.max_workers or 1))
+        self._log = log
+        self.on_result = on_result  # 每处理完一个批次调用 on_result(BatchResult)
+        self.queue = queue.Queue()
+        self._stop = threading.Event()
+        self._threads = []
+        self.processed_count = 0
+        self.failed_count = 0
+        self._count_lock = threading.Lock()
+
+        # 所有工作线程共用一个MP4去重索引：不同工作线程处理的压缩包之间也去重，持久化索引只由一个对象写入
+        self.deduplicator = None
+        if config.dedup_mp4 and config.output_mode == "unified":
+            index_path = os.path.join(config.data_dir, "mp4_dedup_index.json") if config.persistent_dedup else None
+            self.deduplicator = Mp4Deduplicator(index_path)
+
+        self.engines = []
+        for slot in range(self.workers):
+            engine = ExtractionEngine(self.slot_config(slot), log=self.log_message)
+            engine.shared_deduplicator = self.deduplicator
+            if self.engines:
+                # 共享持久化数据，避免多个引擎同时写同一个文件时互相覆盖
+                engine.fingerprints = self.engines[0].fingerprints
+                engine.password_stats = self.engines[0].password_stats
+                engine.backends = self.engines[0].backends
+                engine.metrics = self.engines[0].metrics
+                engine.memory_budget = self.engines[0].memory_budget
+            engine.metrics_slot = str(slot)
+            self.engines.append(engine)
+
+        self.watcher = FolderWatcher(self.directories, settle_seconds, poll_interval, use_inotify, log=self.log_message)
+
+    def log_message(self, message):
+        if self._log is not None:
+            self._log(message)
+
+    def slot_config(self, slot):
+        """工作线程使用的配置：一次处理一个压缩包，增量处理，独立的临时目录和批次日志"""
+        config = copy.copy(self.config)
+        config.max_workers = 1
+        config.incremental = True
+        config.resume = False
+        if config.output_mode == "unified" and not config.unified_output_dir:
+            config.unified_output_dir = config.output_dir
+        scratch_bases = self.config.scratch_dirs or [self.config.output_dir]
+        config.scratch_dirs = [os.path.join(base, f".watch_slot_{slot}") for base in scratch_bases]
+        config.journal_path = os.path.join(config.data_dir, f"watch_journal_{slot}.jsonl")
+        return config
+
+    def start(self):
+        self.log_message(f"开始监视 {len(self.directories)} 个目录（{self.watcher.mode}，"
+                         f"文件 {self.watcher.tracker.settle_seconds:g} 秒不变后处理，并行任务数 {self.workers}）")
+        for slot, engine in enumerate(self.engines):
+            thread = threading.Thread(target=self.worker, args=(engine,), name=f"watch-worker-{slot}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        # 空闲时也输出一次运行指标，采集端可以区分"没有新文件"和"没有运行"
+        if self.engines[0].metrics is not None:
+            self.engines[0].metrics.write(force=True)
+
+    def run(self):
+        """一直运行直到 stop() 被调用（或 KeyboardInterrupt）"""
+        self.start()
+        try:
+            while not self._stop.is_set():
+                for path in self.watcher.poll():
+                    self.submit(path)
+        finally:
+            self.shutdown()
+
+    def stop(self):
+        self._stop.set()
+
+    def shutdown(self):
+        """等待正在处理的压缩包完成后退出（队列中尚未开始的压缩包留到下次启动）"""
+        self._stop.set()
+        while True:
+            try:
+                self.queue.get_nowait()
+            except queue.Empty:
+                break
+        for _ in self._threads:
+            self.queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+        self.watcher.close()
+        self.log_message(f"停止监视：处理了 {self.processed_count} 个压缩包，失败 {self.failed_count} 个")
+
+    def submit(self, path):
+        """把写完的文件加入处理队列（不是压缩包的文件和后续分卷被忽略）"""
+        name = os.path.basename(path)
+        if is_later_volume(path):
+            return  # 随第一个分卷一起处理
+        if parse_volume(path) is None and self.engines[0].detect_archive_format(path) is None:
+            self.log_message(f"不是压缩包，忽略: {name}")
+            return
+        self.log_message(f"发现新压缩包: {name}")
+        self.queue.put(path)
+
+    def worker(self, engine):
+        self.resume_interrupted(engine)
+        while True:
+            path = self.queue.get()
+            if path is None:
+                break
+            self.process(engine, [path])
+
+    def resume_interrupted(self, engine):
+        """上次运行时该工作线程正在处理的压缩包：清理后重新处理"""
+        state = BatchJournal.load(engine.config.journal_path)
+        if state is None:
+            return
+        interrupted = [entry.source_file for entry in state.entries.values()
+                       if entry.interrupted and os.path.exists(entry.source_file)]
+        if not interrupted:
+            return
+        engine.config.resume = True
+        try:
+            self.process(engine, interrupted)
+        finally:
+            engine.config.resume = False
+
+    def process(self, engine, source_files):
+        try:
+            result = engine.run(source_files)
+        except Exception as e:
+            with self._count_lock:
+                self.failed_count += len(source_files)
+            self.log_message(f"处理失败 {', '.join(os.path.basename(path) for path in source_files)}: {str(e)}")
+            return
+        with self._count_lock:
+            self.processed_count += len(result.jobs)
+            self.failed_count += sum(1 for job in result.jobs if not job.success)
+        if self.on_result is not None:
+            self.on_result(result)
@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试解压后端注册表
+"""
+
+import sys
+import os
+import time
+import zipfile
+import threading
+import pytest
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+import backends
+from backends import (BackendRegistry, BackendUnavailableError, BsdtarBackend, ExtractorBackend,
+                      Py7zrBackend, SevenZipToolBackend, SevenZipToolError, ZipfileBackend, archive_format)
+from engine import ArchiveJob, EngineConfig, ExtractionEngine
+
+class FastZipBackend(ExtractorBackend):
+    """测试用后端：只记录调用，写出一个固定文件"""
+    name = "fastzip"
+    formats = ('zip',)
+    priority = 10
+    calls = []
+
+    def extract(self, engine, archive_path, extract_dir, depth=0, password=None):
+        FastZipBackend.calls.append(archive_path)
+        os.makedirs(extract_dir, exist_ok=True)
+        with open(os.path.join(extract_dir, "fast.mp4"), 'wb') as f:
+            f.write(b"F" * 10)
+
+class MissingBackend(ExtractorBackend):
+    name = "missing"
+    formats = ('zip',)
+    priority = 100
+
+    def is_available(self):
+        return False
+
+def test_archive_format():
+    """测试按文件名判断压缩格式"""
+    assert archive_format("/a/b.tar.gz") == "tar"
+    assert archive_format("B.TGZ") == "tar"
+    assert archive_format("c.zip") == "zip"
+    assert archive_format("d.part1.rar") == "rar"
+    assert archive_format("e.7z.001") == "7z"
+    assert archive_format("f.mp4") is None
+
+def test_select_by_priority_and_availability():
+    """测试默认优先级选择，不可用的后端被忽略"""
+    registry = BackendRegistry(benchmark=False, backend_classes=[FastZipBackend, ZipfileBackend, MissingBackend])
+    assert registry.select('zip').name == "zipfile"
+    assert [backend.name for backend in registry.available_backends('zip')] == ["fastzip", "zipfile"]
+
+def test_select_by_preference():
+    """测试配置的偏好后端优先"""
+    registry = BackendRegistry({'zip': ["missing", "fastzip"]},
+                               backend_classes=[FastZipBackend, ZipfileBackend, MissingBackend])
+    assert registry.select('zip').name == "fastzip"
+
+def test_select_unavailable_format():
+    """测试没有可用后端时抛出带提示的错误"""
+    registry = BackendRegistry(backend_classes=[ZipfileBackend])
+    with pytest.raises(BackendUnavailableError, match="7z"):
+        registry.select('7z')
+    with pytest.raises(BackendUnavailableError):
+        registry.select('zip', need_password=True)
+
+def test_benchmark_results_are_cached(tmp_path):
+    """测试基准测试选择最快的后端，并把结果保存下来"""
+    cache_path = str(tmp_path / "bench.json")
+    engine = ExtractionEngine(EngineConfig(str(tmp_path), data_dir=str(tmp_path / "data")), log=lambda message: None)
+    registry = BackendRegistry(cache_path=cache_path, backend_classes=[ZipfileBackend, FastZipBackend])
+
+    assert registry.select('zip', engine=engine).name == "fastzip"
+    assert os.path.exists(cache_path)
+
+    FastZipBackend.calls.clear()
+    cached = BackendRegistry(cache_path=cache_path, backend_classes=[ZipfileBackend, FastZipBackend])
+    assert cached.select('zip', engine=engine).name == "fastzip"
+    assert FastZipBackend.calls == []
+
+def test_benchmark_does_not_block_other_formats(tmp_path):
+    """测试基准测试期间其他格式的选择和按名称获取后端不等待"""
+    started, release = threading.Event(), threading.Event()
+
+    class SlowZipBackend(FastZipBackend):
+        name = "slowzip"
+
+        def extract(self, engine, archive_path, extract_dir, depth=0, password=None):
+            started.set()
+            release.wait(10)
+            super().extract(engine, archive_path, extract_dir, depth, password)
+
+    engine = ExtractionEngine(EngineConfig(str(tmp_path), data_dir=str(tmp_path / "data")), log=lambda message: None)
+    registry = BackendRegistry(backend_classes=[ZipfileBackend, SlowZipBackend, backends.TarfileBackend])
+    selected = []
+    benchmark = threading.Thread(target=lambda: selected.append(registry.select('zip', engine=engine).name))
+    benchmark.start()
+    try:
+        assert started.wait(10)
+        other = []
+        lookup = threading.Thread(target=lambda: other.extend([registry.select('tar', engine=engine).name,
+                                                               registry.get("zipfile").name]))
+        lookup.start()
+        lookup.join(5)
+        assert other == ["tarfile", "zipfile"]
+    finally:
+        release.set()
+        benchmark.join(10)
+    assert len(selected) == 1
+
+def test_benchmark_subtracts_startup_overhead(tmp_path):
+    """测试外部工具的基准测试耗时扣除进程启动耗时"""
+    class SpawningBackend(FastZipBackend):
+        name = "spawning"
+
+        def startup_overhead(self):
+            return 0.2
+
+        def extract(self, engine, archive_path, extract_dir, depth=0, password=None):
+            time.sleep(0.22)
+            super().extract(engine, archive_path, extract_dir, depth, password)
+
+    class InProcessBackend(FastZipBackend):
+        name = "inprocess"
+
+        def extract(self, engine, archive_path, extract_dir, depth=0, password=None):
+            time.sleep(0.1)
+            super().extract(engine, archive_path, extract_dir, depth, password)
+
+    engine = ExtractionEngine(EngineConfig(str(tmp_path), data_dir=str(tmp_path / "data")), log=lambda message: None)
+    registry = BackendRegistry(cache_path=str(tmp_path / "bench.json"), backend_classes=[InProcessBackend, SpawningBackend])
+
+    assert registry.select('zip', engine=engine).name == "spawning"
+
+@pytest.mark.skipif(os.name != 'posix', reason="模拟的7z命令使用shebang脚本")
+def test_7z_tool_startup_overhead(fake_7z):
+    """测试外部7z的启动耗时只运行不带参数的7z"""
+    assert SevenZipToolBackend().startup_overhead() > 0
+    assert fake_7z.read_text().splitlines() == ["[]"] * 3
+
+def test_engine_uses_registered_backend(tmp_path):
+    """测试新增后端不需要修改处理流程"""
+    source = tmp_path / "a.zip"
+    with zipfile.ZipFile(source, 'w') as archive:
+        archive.writestr("real.mp4", b"R" * 10)
+    (tmp_path / "out").mkdir()
+
+    engine = ExtractionEngine(EngineConfig(str(tmp_path / "out"), data_dir=str(tmp_path / "data"),
+                                           backend_preferences={'zip': ["fastzip"]}))
+    engine.backends = BackendRegistry(engine.config.backend_preferences,
+                                      backend_classes=[ZipfileBackend, FastZipBackend])
+    result = engine.run([str(source)])
+
+    assert [os.path.basename(path) for path in result.mp4_files] == ["fast.mp4"]
+
+@pytest.mark.skipif(not BsdtarBackend().is_available(), reason="bsdtar未安装")
+def test_bsdtar_selective_extract(tmp_path):
+    """测试bsdtar后端的选择性解压"""
+    source = tmp_path / "a.zip"
+    with zipfile.ZipFile(source, 'w') as archive:
+        archive.writestr("dir/v.mp4", b"V" * 10)
+        archive.writestr("cover.jpg", b"J" * 10)
+    engine = ExtractionEngine(EngineConfig(str(tmp_path), data_dir=str(tmp_path / "data")), log=lambda message: None)
+
+    BsdtarBackend().extract(engine, str(source), str(tmp_path / "x"))
+
+    assert os.path.exists(tmp_path / "x" / "dir" / "v.mp4")
+    assert not os.path.exists(tmp_path / "x" / "cover.jpg")
+
+FAKE_7Z = '''#!{python}
+import os, sys
+with open(os.environ["FAKE7Z_LOG"], "a") as log:
+    log.write(repr(sys.argv[1:]) + "\\n")
+command = sys.argv[1]
+if command == "l":
+    print("7-Zip fake\\n\\n----------")
+    for name, size in (("a.mp4", 10), ("dir/b.mp4", 5), ("cover.jpg", 3)):
+        print("Path = %s\\nSize = %d\\nFolder = -\\nEncrypted = +\\n" % (name, size))
+    sys.exit(0)
+password = sys.stdin.readline().strip()
+if password != os.environ["FAKE7Z_PASSWORD"]:
+    print("ERROR: Wrong password : a.mp4")
+    sys.exit(2)
+if command == "x":
+    sys.stdout.write("  0%\\b\\b\\b\\b 50%\\b\\b\\b\\b100%\\n")
+    out_dir = [arg[2:] for arg in sys.argv if arg.startswith("-o")][0]
+    names = [line.strip() for line in open([arg[3:] for arg in sys.argv if arg.startswith("-i@")][0])]
+    for name in names:
+        path = os.path.join(out_dir, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        open(path, "wb").write(b"x")
+sys.exit(0)
+'''
+
+@pytest.fixture
+def fake_7z(tmp_path, monkeypatch):
+    """在PATH中放一个模拟的7z命令"""
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    script = bin_dir / "7z"
+    script.write_text(FAKE_7Z.replace("{python}", sys.executable))
+    script.chmod(0o755)
+    monkeypatch.setenv("PATH", str(bin_dir) + os.pathsep + os.environ.get("PATH", ""))
+    monkeypatch.setenv("FAKE7Z_PASSWORD", "secret")
+    monkeypatch.setenv("FAKE7Z_LOG", str(tmp_path / "argv.log"))
+    return tmp_path / "argv.log"
+
+@pytest.mark.skipif(os.name != 'posix', reason="模拟的7z命令使用shebang脚本")
+def test_7z_tool_backend_password_and_progress(tmp_path, fake_7z):
+    """测试外部7z后端：密码通过标准输入传递、选择性解压和进度回报"""
+    backend = SevenZipToolBackend()
+    assert backend.is_available()
+    archive = str(tmp_path / "big.666z.7z")
+    open(archive, 'wb').close()
+
+    assert backend.needs_password(archive)
+    assert backend.verify_password(archive, "secret") is None
+    assert isinstance(backend.verify_password(archive, "wrong"), SevenZipToolError)
+
+    engine = ExtractionEngine(EngineConfig(str(tmp_path), data_dir=str(tmp_path / "data")), log=lambda message: None)
+    progress = []
+    engine._progress = lambda value, status: progress.append(status)
+    job = ArchiveJob(archive, 0)
+    with engine.tracking(job):
+        backend.extract(engine, archive, str(tmp_path / "x"), password="secret")
+
+    assert os.path.exists(tmp_path / "x" / "dir" / "b.mp4")
+    assert not os.path.exists(tmp_path / "x" / "cover.jpg")
+    # 百分比按文件列表中需要解压的成员大小（10 + 5 字节）换算为字节数
+    assert (job.progress.total, job.progress.done) == (15, 15)
+    assert progress[-1].startswith("big.666z.7z 100%")
+    assert "secret" not in fake_7z.read_text()
+    # 验证密码只测试第一个成员（不是最小的 cover.jpg）
+    tests = [line for line in fake_7z.read_text().splitlines() if line.startswith("['t'")]
+    assert tests and all(line.endswith("'a.mp4']") for line in tests)
+
+@pytest.mark.skipif(os.name != 'posix', reason="模拟的7z命令使用shebang脚本")
+def test_7z_tool_exit_code_becomes_failed_reason(tmp_path, fake_7z):
+    """测试7z的退出码转换为失败原因"""
+    backend = SevenZipToolBackend()
+    with pytest.raises(SevenZipToolError) as error:
+        backend.run_7z(['t', '--', str(tmp_path / "a.7z")], "wrong")
+    assert error.value.exit_code == 2
+    assert error.value.reason == "密码错误"
+
+    source = tmp_path / "a.7z"
+    source.write_bytes(b"7z")
+    (tmp_path / "out").mkdir()
+    config = EngineConfig(str(tmp_path / "out"), data_dir=str(tmp_path / "data"), password="nope",
+                          backend_preferences={'7z': ["7z"]})
+    result = ExtractionEngine(config, log=lambda message: None).run([str(source)])
+
+    assert result.failed_files == [str(source)]
+    assert "密码错误（7z退出码 2）" in result.failed_reasons[str(source)]
+
+def test_py7zr_verify_password_decodes_bounded_prefix(tmp_path, monkeypatch):
+    """测试py7zr后端验证密码时只解码第一个成员的开头，不写文件；加密文件头的压缩包不解码成员"""
+    py7zr = pytest.importorskip("py7zr")
+    monkeypatch.setattr(backends, "VERIFY_PREFIX_SIZE", 64 * 1024)
+    archive_path = tmp_path / "solid.7z"
+    with py7zr.SevenZipFile(archive_path, 'w', password="right") as archive:
+        archive.writestr(b"", "empty.txt")
+        archive.writestr(os.urandom(3 * 1024 * 1024), "a.mp4")
+        archive.writestr(b"c", "c.txt")
+    calls = []
+    original_extract = py7zr.SevenZipFile.extract
+
+    def recording_extract(self, path=None, targets=None, **kwargs):
+        calls.append((path, targets, kwargs.get("factory")))
+        return original_extract(self, path, targets, **kwargs)
+
+    monkeypatch.setattr(py7zr.SevenZipFile, "extract", recording_extract)
+    backend = Py7zrBackend()
+
+    assert backend.verify_password(str(archive_path), "right") is None
+    assert backend.verify_password(str(archive_path), "wrong") is not None
+    assert [(path, targets) for path, targets, _ in calls] == [(None, ["a.mp4"]), (None, ["a.mp4"])]
+    decoded = calls[0][2].written
+    assert 64 * 1024 <= decoded < 3 * 1024 * 1024  # 解码到前缀长度就停止
+
+    calls.clear()
+    hidden = tmp_path / "hidden.7z"
+    with py7zr.SevenZipFile(hidden, 'w', password="right", header_encryption=True) as archive:
+        archive.writestr(os.urandom(100000), "a.mp4")
+    assert backend.verify_password(str(hidden), "right") is None
+    assert backend.verify_password(str(hidden), "wrong") is not None
+    assert calls == []
+
+@pytest.mark.skipif(os.name != 'posix', reason="模拟的7z命令使用shebang脚本")
+@pytest.mark.parametrize("password, backup, extracts", [
+    ("secret", [], 1),  # 排在第一的候选正确：不单独测试，直接解压一次
+    ("nope", ["secret"], 2),  # 第一个候选解压时报密码错误，再验证其余的候选
+])
+def test_7z_tool_extracts_with_first_candidate(tmp_path, fake_7z, password, backup, extracts):
+    """测试外部7z直接用排在第一的候选密码解压，以密码错误的退出作为失败信号"""
+    source = tmp_path / "a.7z"
+    source.write_bytes(b"7z")
+    (tmp_path / "out").mkdir()
+    config = EngineConfig(str(tmp_path / "out"), data_dir=str(tmp_path / "data"), password=password,
+                          backup_passwords=backup, backend_preferences={'7z': ["7z"]}, dedup_mp4=False)
+    result = ExtractionEngine(config, log=lambda message: None).run([str(source)])
+
+    assert sorted(os.path.basename(path) for path in result.mp4_files) == ["a.mp4", "b.mp4"]
+    assert result.failed_files == []
+    used = [line[2] for line in fake_7z.read_text().splitlines() if line[2] in "xt"]
+    assert used[0] == used[-1] == "x"
+    assert used.count("x") == extracts
+    assert ("t" in used) == (extracts > 1)
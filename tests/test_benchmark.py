@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试基准测试语料生成和阶段计时
+"""
+
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+from corpus import CorpusGenerator, ensure_corpus
+from benchmark import StageTimer, compare, run_benchmark
+
+def small_generator():
+    return CorpusGenerator(seed=7, small_files=10, small_size=512, large_count=1, large_mb=1, video_size=4096)
+
+def test_corpus_is_reproducible(tmp_path):
+    """测试相同参数生成的语料内容相同（7z容器带随机盐，不比较）"""
+    first, expected = small_generator().build()
+    second, _ = small_generator().build()
+    for name in first:
+        if not name.endswith(('.7z', '.666z')) and name != "wrapped_7z.zip":
+            assert first[name] == second[name], name
+    assert expected["nested.zip"] == 4
+
+    manifest = ensure_corpus(str(tmp_path), small_generator())
+    assert ensure_corpus(str(tmp_path), small_generator()) == manifest
+    assert set(manifest["archives"]) <= set(os.listdir(tmp_path))
+
+def test_stage_timer_excludes_nested_stages():
+    """测试嵌套阶段的耗时不计入外层阶段"""
+    now = [0.0]
+    timer = StageTimer(clock=lambda: now[0])
+    with timer.stage("nested"):
+        now[0] += 1.0
+        with timer.stage("detect"):
+            now[0] += 0.5
+        now[0] += 1.0
+    assert timer.totals == {"nested": 2.0, "detect": 0.5}
+
+def test_run_benchmark_and_compare(tmp_path):
+    """测试在语料上运行一轮并与基准比较"""
+    results = run_benchmark(str(tmp_path / "corpus"), small_generator(), rounds=1)
+    assert set(results["stages"]) == {"extract", "detect", "nested", "deliver", "cleanup"}
+    assert results["stages"]["extract"] > 0
+
+    slower = dict(results, stages={name: seconds * 2 + 0.01 for name, seconds in results["stages"].items()})
+    rows = compare(slower, results)
+    assert all(row[4] for row in rows if row[0] != "total")
+    assert not any(row[4] for row in compare(results, results))
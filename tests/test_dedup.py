@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试MP4内容去重
+"""
+
+import sys
+import os
+import json
+import time
+import threading
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+from dedup import Mp4Deduplicator
+
+def test_find_duplicate_by_content(tmp_path):
+    """测试大小、采样摘要和完整摘要的逐级比较"""
+    dedup = Mp4Deduplicator(sample_size=16)
+    
+    original = tmp_path / "a.mp4"
+    original.write_bytes(b"A" * 100)
+    dedup.register(str(original))
+    
+    same = tmp_path / "b.mp4"
+    same.write_bytes(b"A" * 100)
+    assert dedup.find_duplicate(str(same)) == str(original)
+    
+    # 大小相同、头尾相同但中间不同
+    middle_differs = tmp_path / "c.mp4"
+    middle_differs.write_bytes(b"A" * 50 + b"B" + b"A" * 49)
+    assert dedup.find_duplicate(str(middle_differs)) is None
+    
+    other_size = tmp_path / "d.mp4"
+    other_size.write_bytes(b"A" * 101)
+    assert dedup.find_duplicate(str(other_size)) is None
+
+def test_persistent_index(tmp_path):
+    """测试跨批次去重索引"""
+    index_path = str(tmp_path / "index.json")
+    video = tmp_path / "video.mp4"
+    video.write_bytes(b"V" * 64)
+    
+    first_run = Mp4Deduplicator(index_path)
+    first_run.register(str(video))
+    first_run.save_index()
+    
+    copy = tmp_path / "copy.mp4"
+    copy.write_bytes(b"V" * 64)
+    second_run = Mp4Deduplicator(index_path)
+    assert second_run.find_duplicate(str(copy)) == str(video)
+    
+    # 已删除的文件不再参与去重
+    video.unlink()
+    third_run = Mp4Deduplicator(index_path)
+    assert third_run.find_duplicate(str(copy)) is None
+
+def test_concurrent_save_index(tmp_path, monkeypatch):
+    """测试多个线程同时保存同一个索引时依次写入临时文件，不会互相覆盖"""
+    index_path = str(tmp_path / "index.json")
+    dedup = Mp4Deduplicator(index_path)
+    for i in range(3):
+        video = tmp_path / f"v{i}.mp4"
+        video.write_bytes(bytes([i]) * 64)
+        dedup.register(str(video))
+
+    writers = []
+    overlaps = []
+    original_dump = json.dump
+
+    def slow_dump(entries, f, **kwargs):
+        writers.append(threading.current_thread().name)
+        if len(writers) > 1:
+            overlaps.append(list(writers))
+        time.sleep(0.05)
+        original_dump(entries, f, **kwargs)
+        writers.remove(threading.current_thread().name)
+
+    monkeypatch.setattr(json, "dump", slow_dump)
+    threads = [threading.Thread(target=dedup.save_index) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert overlaps == []  # 同一时间只有一个线程在写临时文件
+    with open(index_path, encoding='utf-8') as f:
+        assert len(json.load(f)) == 3
+    assert not os.path.exists(index_path + '.tmp')
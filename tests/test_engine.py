@@ -0,0 +1,470 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试无界面处理引擎和命令行入口
+"""
+
+import sys
+import os
+import io
+import errno
+import zipfile
+import subprocess
+from collections import namedtuple
+import pytest
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+import engine as engine_module
+from backends import Py7zrBackend
+from engine import ArchiveJob, EngineConfig, ExtractionEngine, ScratchSpaceError
+from progress import ByteProgress, format_eta
+import cli
+
+def make_archive(path, inner_videos, outer_video):
+    """创建包含内部ZIP的测试压缩包"""
+    inner = io.BytesIO()
+    with zipfile.ZipFile(inner, 'w') as inner_zip:
+        for name, data in inner_videos.items():
+            inner_zip.writestr(name, data)
+        inner_zip.writestr("cover.jpg", b"J" * 100)
+    with zipfile.ZipFile(path, 'w') as outer_zip:
+        outer_zip.writestr("inner.zip", inner.getvalue())
+        outer_zip.writestr(outer_video[0], outer_video[1])
+        outer_zip.writestr("readme.txt", "hi")
+    return str(path)
+
+def make_config(tmp_path, **options):
+    options.setdefault("data_dir", str(tmp_path / "data"))
+    return EngineConfig(str(tmp_path / "out"), **options)
+
+def test_archive_job_isolation(tmp_path):
+    """测试并行任务的独立结果记录"""
+    source_file = tmp_path / "a.zip"
+    source_file.write_bytes(b"x" * 1024)
+
+    job_a = ArchiveJob(str(source_file), 0)
+    job_b = ArchiveJob(str(tmp_path / "missing.zip"), 1)
+
+    job_a.mark_failed("inner.7z", "密码错误")
+    assert job_a.failed_reasons == {"inner.7z": "密码错误"}
+    assert job_b.failed_files == []
+    assert job_a.input_bytes == 1024
+    assert job_b.input_bytes == 0
+
+    job_a.clear_failure("inner.7z")
+    assert job_a.failed_files == []
+    assert job_a.failed_reasons == {}
+
+def test_reserve_output_path(tmp_path):
+    """测试输出文件名占位（同名文件自动添加序号）"""
+    first = ExtractionEngine.reserve_output_path(str(tmp_path), "video.mp4")
+    second = ExtractionEngine.reserve_output_path(str(tmp_path), "video.mp4")
+
+    assert os.path.basename(first) == "video.mp4"
+    assert os.path.basename(second) == "video_1.mp4"
+
+def test_calculate_throughput():
+    """测试吞吐量计算"""
+    archives_per_min, mb_per_sec = ExtractionEngine.calculate_throughput(10, 200 * 1024 * 1024, 100)
+    assert archives_per_min == 6.0
+    assert mb_per_sec == 2.0
+    assert ExtractionEngine.calculate_throughput(1, 100, 0) == (0.0, 0.0)
+
+def test_engine_run_without_gui(tmp_path):
+    """测试引擎直接处理一批压缩包（嵌套MP4、去重、清理）"""
+    sources = [make_archive(tmp_path / f"outer{i}.zip", {"deep/same.mp4": b"S" * 5000},
+                            (f"top{i}.mp4", b"T" * 3000 + bytes([i])))
+               for i in range(2)]
+    (tmp_path / "out").mkdir()
+    messages = []
+    progress = []
+
+    engine = ExtractionEngine(make_config(tmp_path), log=messages.append,
+                              progress=lambda value, status: progress.append(value))
+    result = engine.run(sources)
+
+    names = sorted(os.path.basename(path) for path in result.mp4_files)
+    assert names == ["same.mp4", "top0.mp4", "top1.mp4"]
+    assert all(os.path.dirname(path) == result.unified_output_dir for path in result.mp4_files)
+    assert len(result.duplicates) == 1
+    assert result.successful_count == 2
+    assert result.failed_files == []
+    assert progress[-1] == 100
+    assert messages
+    # 临时目录已清理，只剩输出目录
+    assert [name for name in os.listdir(tmp_path / "out") if name.startswith("temp_")] == []
+
+@pytest.mark.parametrize("options, strategy", [
+    ({}, "move"),
+    ({"auto_cleanup": False}, "hardlink"),
+    ({"zero_copy_delivery": False, "auto_cleanup": False}, "copy"),
+])
+def test_delivery_strategies(tmp_path, options, strategy):
+    """测试MP4的三种输出方式（移动/硬链接/复制）以及 delivery_log 的内容"""
+    source = make_archive(tmp_path / "a.zip", {"deep/inner.mp4": b"I" * 3000}, ("top.mp4", b"T" * 2000))
+    (tmp_path / "out").mkdir()
+    result = ExtractionEngine(make_config(tmp_path, **options), log=lambda message: None).run([source])
+
+    job = result.jobs[0]
+    assert sorted(result.mp4_files) == sorted(output for _, output, _ in job.delivery_log)
+    for mp4_file, output_path, used in job.delivery_log:
+        assert used == strategy
+        assert os.path.basename(mp4_file) == os.path.basename(output_path)
+        assert os.path.commonpath([mp4_file, job.temp_dir]) == job.temp_dir
+        assert os.path.dirname(output_path) == result.unified_output_dir
+        assert os.path.getsize(output_path) in (2000, 3000)
+        if strategy == "move":
+            assert not os.path.exists(mp4_file)
+        elif strategy == "hardlink":
+            assert os.path.samefile(mp4_file, output_path)
+        else:
+            assert not os.path.samefile(mp4_file, output_path)
+
+def test_cross_device_hardlink_falls_back_to_copy(tmp_path, monkeypatch):
+    """测试硬链接因跨设备失败（EXDEV）时改为复制，临时目录中的文件保留"""
+    source = make_archive(tmp_path / "a.zip", {"deep/inner.mp4": b"I" * 3000}, ("top.mp4", b"T" * 2000))
+    (tmp_path / "out").mkdir()
+
+    def cross_device_link(src, dst, *args, **kwargs):
+        raise OSError(errno.EXDEV, "Invalid cross-device link", src)
+
+    monkeypatch.setattr(engine_module.os, "link", cross_device_link)
+    result = ExtractionEngine(make_config(tmp_path, auto_cleanup=False), log=lambda message: None).run([source])
+
+    job = result.jobs[0]
+    assert [used for _, _, used in job.delivery_log] == ["copy", "copy"]
+    for mp4_file, output_path, _ in job.delivery_log:
+        assert os.path.exists(mp4_file)
+        assert not os.path.exists(output_path + ".link")
+        with open(mp4_file, 'rb') as original, open(output_path, 'rb') as copy:
+            assert original.read() == copy.read()
+
+@pytest.mark.parametrize("stream", [True, False])
+def test_selective_extract_skips_other_members(tmp_path, stream):
+    """测试选择性解压时 cover.jpg 和 readme.txt 不会写入临时目录，也不会出现在输出目录中"""
+    source = make_archive(tmp_path / "a.zip", {"deep/inner.mp4": b"I" * 3000}, ("top.mp4", b"T" * 2000))
+    (tmp_path / "out").mkdir()
+    config = make_config(tmp_path, auto_cleanup=False, stream_nested_archives=stream)
+    result = ExtractionEngine(config, log=lambda message: None).run([source])
+
+    assert sorted(os.path.basename(path) for path in result.mp4_files) == ["inner.mp4", "top.mp4"]
+    written = [name for directory in (result.jobs[0].temp_dir, str(tmp_path / "out"))
+               for _, _, files in os.walk(directory) for name in files]
+    assert "inner.mp4" in written
+    assert "cover.jpg" not in written
+    assert "readme.txt" not in written
+
+def test_engine_records_failed_archive(tmp_path):
+    """测试损坏的压缩包记录为失败，不影响其他压缩包"""
+    good = make_archive(tmp_path / "good.zip", {"v.mp4": b"V" * 100}, ("top.mp4", b"T" * 100))
+    bad = tmp_path / "bad.zip"
+    bad.write_bytes(b"not a zip")
+    (tmp_path / "out").mkdir()
+
+    result = ExtractionEngine(make_config(tmp_path, output_mode="individual", max_workers=2)).run([good, str(bad)])
+
+    assert result.failed_files == [str(bad)]
+    assert result.successful_count == 1
+    assert len(result.mp4_files) == 2
+
+def test_individual_mode_does_not_dedup(tmp_path):
+    """测试独立输出模式下不去重：每个压缩包的输出目录都包含它的全部MP4"""
+    sources = [make_archive(tmp_path / f"outer{i}.zip", {"same.mp4": b"S" * 5000},
+                            (f"top{i}.mp4", b"T" * 100 + bytes([i])))
+               for i in range(2)]
+    (tmp_path / "out").mkdir()
+
+    result = ExtractionEngine(make_config(tmp_path, output_mode="individual"),
+                              log=lambda message: None).run(sources)
+
+    assert result.duplicates == []
+    for i, job in enumerate(result.jobs):
+        assert sorted(os.listdir(job.output_dir)) == ["same.mp4", f"top{i}.mp4"]
+
+def test_byte_progress_rate_and_eta():
+    """测试字节进度：文件列表替换估计值，按速度计算剩余时间"""
+    now = [0.0]
+    progress = ByteProgress(1000, clock=lambda: now[0])
+    assert progress.total == 1000
+
+    progress.expect(4000)
+    progress.expect(1000)
+    assert progress.total == 5000
+
+    now[0] = 1.0
+    progress.advance(1000)
+    assert progress.fraction == 0.2
+    assert progress.average_rate() == 1000
+    assert progress.eta() == 4.0
+
+    progress.finish()
+    assert progress.fraction == 1.0
+    assert format_eta(None) == "--:--"
+    assert format_eta(75) == "01:15"
+    assert format_eta(3725) == "1:02:05"
+
+def test_engine_reports_byte_progress(tmp_path):
+    """测试解压和复制MP4时按字节回报进度，状态栏显示速度和剩余时间"""
+    source = make_archive(tmp_path / "outer.zip", {"v.mp4": b"V" * 100000}, ("top.mp4", b"T" * 50000))
+    (tmp_path / "out").mkdir()
+    updates = []
+
+    engine = ExtractionEngine(make_config(tmp_path, zero_copy_delivery=False), log=lambda message: None,
+                              progress=lambda value, status: updates.append((value, status)))
+    engine.progress_interval = 0
+    result = engine.run([source])
+
+    job = result.jobs[0]
+    # 解压写出的MP4和复制输出的MP4都计入已处理字节数
+    assert job.progress.done >= 2 * 150000
+    byte_updates = [(value, status) for value, status in updates if "批次" in status]
+    assert byte_updates
+    assert all(10 <= value <= 90 for value, _ in byte_updates)
+    assert "outer.zip" in byte_updates[-1][1] and "MB/s" in byte_updates[-1][1]
+
+def test_scratch_directory_separate_from_output(tmp_path):
+    """测试临时文件写到单独的临时目录，自动清理时整个批次目录被删除"""
+    source = make_archive(tmp_path / "outer.zip", {"v.mp4": b"V" * 100}, ("top.mp4", b"T" * 100))
+    (tmp_path / "out").mkdir()
+    scratch = tmp_path / "scratch"
+
+    result = ExtractionEngine(make_config(tmp_path, scratch_dirs=[str(scratch)], auto_cleanup=False),
+                              log=lambda message: None).run([source])
+    assert len(result.mp4_files) == 2
+    [batch_dir] = os.listdir(scratch)
+    assert os.listdir(scratch / batch_dir) == ["temp_0_outer"]
+    assert [name for name in os.listdir(tmp_path / "out") if name.startswith("temp_")] == []
+
+    ExtractionEngine(make_config(tmp_path, scratch_dirs=[str(scratch / "clean")]), log=lambda message: None).run([source])
+    assert os.listdir(scratch / "clean") == []
+
+@pytest.mark.parametrize("auto_cleanup", [True, False])
+def test_scratch_directory_removed_when_setup_fails(tmp_path, monkeypatch, auto_cleanup):
+    """测试解压开始前的步骤出错时，本批次创建的临时目录也会被删除"""
+    source = make_archive(tmp_path / "a.zip", {"v.mp4": b"V" * 100}, ("top.mp4", b"T" * 100))
+    scratch = tmp_path / "scratch"
+    scratch.mkdir()
+    engine = ExtractionEngine(make_config(tmp_path, scratch_dirs=[str(scratch)], auto_cleanup=auto_cleanup),
+                              log=lambda message: None)
+
+    def failing_output_directory():
+        raise OSError("无法创建输出目录")
+
+    monkeypatch.setattr(engine, "create_unified_output_directory", failing_output_directory)
+    with pytest.raises(OSError):
+        engine.run([source])
+    assert engine.scratch_dir is not None
+    assert os.listdir(scratch) == []
+
+def test_scratch_space_preflight(tmp_path, monkeypatch):
+    """测试按文件列表估算临时空间：选择空间足够的候选目录，都不够时在解压前报错"""
+    source = make_archive(tmp_path / "outer.zip", {"v.mp4": b"V" * 100000}, ("top.mp4", b"T" * 50000))
+    (tmp_path / "out").mkdir()
+    small, large = tmp_path / "small", tmp_path / "large"
+    Usage = namedtuple("Usage", "total used free")
+    free_space = {str(small): 1000, str(large): 10 ** 9, str(tmp_path / "out"): 1000}
+    monkeypatch.setattr(engine_module.shutil, "disk_usage", lambda path: Usage(0, 0, free_space[str(path)]))
+
+    engine = ExtractionEngine(make_config(tmp_path, scratch_dirs=[str(small), str(large)]), log=lambda message: None)
+    # 内部ZIP按两倍计算（压缩包和解压出的文件同时存在），无关文件不计入
+    assert engine.estimate_scratch_bytes(source) >= 150000
+    assert os.path.dirname(engine.prepare_scratch_directory([source])) == str(large)
+
+    engine = ExtractionEngine(make_config(tmp_path), log=lambda message: None)
+    with pytest.raises(ScratchSpaceError):
+        engine.run([source])
+    assert os.listdir(tmp_path / "out") == []
+
+def test_signature_dispatch_without_renaming(tmp_path):
+    """测试内部压缩包按文件头识别并解压，文件不会被重命名"""
+    inner_archives = {}
+    for name, video in (("payload.666z", "hidden.mp4"), ("blob", "second.mp4")):
+        inner = io.BytesIO()
+        with zipfile.ZipFile(inner, 'w') as inner_zip:
+            inner_zip.writestr(video, video.encode() * 10)
+        inner_archives[name] = inner.getvalue()
+    source = tmp_path / "outer.zip"
+    with zipfile.ZipFile(source, 'w') as outer_zip:
+        for name, data in inner_archives.items():
+            outer_zip.writestr(name, data)
+    (tmp_path / "out").mkdir()
+    messages = []
+
+    result = ExtractionEngine(make_config(tmp_path, auto_cleanup=False, stream_nested_archives=False),
+                              log=messages.append).run([str(source)])
+
+    assert sorted(os.path.basename(path) for path in result.mp4_files) == ["hidden.mp4", "second.mp4"]
+    temp_dir = result.jobs[0].temp_dir
+    assert os.path.exists(os.path.join(temp_dir, "payload.666z"))
+    assert os.path.exists(os.path.join(temp_dir, "blob"))
+    assert not any(message.startswith(("格式转换", "重命名")) for message in messages)
+
+def test_temp_cleanup_forgets_sniffed_formats(tmp_path):
+    """测试删除临时目录时同时删除其中文件的格式识别缓存，批次结束时缓存清空"""
+    sources = [make_archive(tmp_path / f"a{i}.zip", {f"v{i}.mp4": b"V" * (50 + i)}, (f"o{i}.mp4", b"O" * (60 + i)))
+               for i in range(2)]
+    engine = ExtractionEngine(make_config(tmp_path, stream_nested_archives=False, max_workers=1),
+                              log=lambda message: None)
+    original_cleanup = engine.cleanup_current_temp_files
+    leftovers = []
+
+    def recording_cleanup(job):
+        prefix = os.path.join(job.temp_dir, '')
+        assert any(path.startswith(prefix) for path in engine.sniffer._cache)  # inner.zip 已识别
+        original_cleanup(job)
+        leftovers.extend(path for path in engine.sniffer._cache if path.startswith(prefix))
+
+    engine.cleanup_current_temp_files = recording_cleanup
+    result = engine.run(sources)
+
+    assert len(result.mp4_files) == 4
+    assert leftovers == []
+    assert engine.sniffer._cache == {}
+
+def test_stream_nested_archive_path_traversal(tmp_path):
+    """测试流式解压时内部压缩包名称中的 .. 被去掉，解压结果留在临时目录中并正常输出"""
+    inner = io.BytesIO()
+    with zipfile.ZipFile(inner, 'w') as inner_zip:
+        inner_zip.writestr("payload.mp4", b"P" * 100)
+    source = tmp_path / "work" / "outer.zip"
+    source.parent.mkdir()
+    with zipfile.ZipFile(source, 'w') as outer_zip:
+        outer_zip.writestr("../../escaped.zip", inner.getvalue())
+    (tmp_path / "out").mkdir()
+
+    result = ExtractionEngine(make_config(tmp_path, auto_cleanup=False), log=lambda message: None).run([str(source)])
+
+    assert [os.path.basename(path) for path in result.mp4_files] == ["payload.mp4"]
+    temp_dir = result.jobs[0].temp_dir
+    assert os.path.isdir(os.path.join(temp_dir, "escaped_extracted"))
+    assert not os.path.exists(tmp_path / "escaped_extracted")
+    assert not os.path.exists(tmp_path / "out" / "escaped_extracted")
+
+def make_three_level_archive(path):
+    """a.mp4 在第0层，inner.zip 中的 b.mp4 在第1层，inner.zip 中 deep.zip 里的 c.mp4 在第2层"""
+    deep = io.BytesIO()
+    with zipfile.ZipFile(deep, 'w') as deep_zip:
+        deep_zip.writestr("c.mp4", b"C" * 300)
+    inner = io.BytesIO()
+    with zipfile.ZipFile(inner, 'w') as inner_zip:
+        inner_zip.writestr("b.mp4", b"B" * 200)
+        inner_zip.writestr("deep.zip", deep.getvalue())
+    with zipfile.ZipFile(path, 'w') as outer_zip:
+        outer_zip.writestr("a.mp4", b"A" * 100)
+        outer_zip.writestr("inner.zip", inner.getvalue())
+    return str(path)
+
+@pytest.mark.parametrize("stream", [True, False])
+def test_max_nesting_depth(tmp_path, stream):
+    """测试最大嵌套深度：流式解压和普通解压输出相同的MP4"""
+    source = make_three_level_archive(tmp_path / "outer.zip")
+
+    for max_depth, expected in ((1, ["a.mp4", "b.mp4"]), (2, ["a.mp4", "b.mp4", "c.mp4"])):
+        output_dir = tmp_path / f"out{max_depth}"
+        output_dir.mkdir()
+        config = EngineConfig(str(output_dir), data_dir=str(tmp_path / "data"), max_nesting_depth=max_depth,
+                              stream_nested_archives=stream)
+        result = ExtractionEngine(config, log=lambda message: None).run([source])
+        assert sorted(os.path.basename(path) for path in result.mp4_files) == expected
+
+def test_nested_archive_loop_detection(tmp_path, monkeypatch):
+    """测试与上层压缩包内容相同的内部压缩包被跳过（循环嵌套）"""
+    source = make_three_level_archive(tmp_path / "outer.zip")
+    (tmp_path / "out").mkdir()
+    messages = []
+
+    engine = ExtractionEngine(make_config(tmp_path, stream_nested_archives=False), log=messages.append)
+    # 所有内部压缩包的内容签名相同：deep.zip 被当作 inner.zip 的循环嵌套
+    monkeypatch.setattr(engine, "archive_signature", lambda file_path: "same")
+    result = engine.run([source])
+
+    assert sorted(os.path.basename(path) for path in result.mp4_files) == ["a.mp4", "b.mp4"]
+    assert any(message.startswith("检测到循环嵌套") and "deep.zip" in message for message in messages)
+
+def make_encrypted_7z(path, password):
+    """创建加密的7z压缩包：一个MP4和一个无关文件"""
+    py7zr = pytest.importorskip("py7zr")
+    with py7zr.SevenZipFile(path, 'w', password=password) as archive:
+        archive.writestr(b"V" * 4000, "video/clip.mp4")
+        archive.writestr(b"notes", "readme.txt")
+    return str(path)
+
+def test_find_7z_password(tmp_path):
+    """测试在真实的加密7z压缩包上验证候选密码：错误的被拒绝，找到正确的密码"""
+    source = make_encrypted_7z(tmp_path / "locked.7z", "right")
+    engine = ExtractionEngine(make_config(tmp_path, benchmark_backends=False), log=lambda message: None)
+    backend = Py7zrBackend()
+
+    assert backend.verify_password(source, "wrong1") is not None
+    assert engine.find_7z_password(backend, source, ["wrong1", "right", "wrong2"]) == ("right", None)
+    password, last_error = engine.find_7z_password(backend, source, ["wrong1", "wrong2", ""])
+    assert password is None and last_error is not None
+
+def test_encrypted_7z_extracted_once(tmp_path, monkeypatch):
+    """测试错误的候选密码只做快速验证，用正确的密码完整解压一次"""
+    source = make_encrypted_7z(tmp_path / "locked.7z", "right")
+    config = make_config(tmp_path, benchmark_backends=False, backend_preferences={"7z": ["py7zr"]},
+                         password="wrong1", backup_passwords=["wrong2", "right"])
+    extract_calls = []
+    verified = []
+    original_extract = Py7zrBackend.extract
+    original_verify = Py7zrBackend.verify_password
+
+    def recording_extract(self, engine, archive_path, extract_dir, depth=0, password=None):
+        extract_calls.append(password)
+        return original_extract(self, engine, archive_path, extract_dir, depth, password)
+
+    def recording_verify(self, archive_path, password):
+        error = original_verify(self, archive_path, password)
+        verified.append((password, error is None))
+        return error
+
+    monkeypatch.setattr(Py7zrBackend, "extract", recording_extract)
+    monkeypatch.setattr(Py7zrBackend, "verify_password", recording_verify)
+    messages = []
+    result = ExtractionEngine(config, log=messages.append).run([source])
+
+    assert [os.path.basename(path) for path in result.mp4_files] == ["clip.mp4"]
+    assert result.failed_files == []
+    assert extract_calls == ["right"]
+    assert ("right", True) in verified
+    assert all(ok == (password == "right") for password, ok in verified)
+    # 日志中只记录密码是第几个候选，不出现明文密码
+    assert any("个候选密码" in message for message in messages)
+    assert not any("right" in message for message in messages)
+
+def test_cli_expands_globs_and_list_file(tmp_path):
+    """测试命令行的通配符和列表文件展开"""
+    for name in ("a.zip", "b.zip", "c.7z"):
+        (tmp_path / name).write_bytes(b"x")
+    list_file = tmp_path / "list.txt"
+    list_file.write_text(f"# 注释\n{tmp_path / 'c.7z'}\n{tmp_path / 'a.zip'}\n", encoding="utf-8")
+
+    sources = cli.expand_sources([str(tmp_path / "*.zip"), str(tmp_path / "missing.zip")], str(list_file))
+
+    assert [os.path.basename(path) for path in sources] == ["a.zip", "b.zip", "c.7z"]
+
+def test_cli_main(tmp_path, capsys):
+    """测试命令行处理并返回退出码"""
+    source = make_archive(tmp_path / "outer.zip", {"v.mp4": b"V" * 100}, ("top.mp4", b"T" * 100))
+
+    exit_code = cli.main(["-o", str(tmp_path / "out"), "--data-dir", str(tmp_path / "data"), "-q", source])
+
+    assert exit_code == 0
+    printed = capsys.readouterr().out.split()
+    assert sorted(os.path.basename(path) for path in printed) == ["top.mp4", "v.mp4"]
+
+def test_cli_runs_from_repo_root(tmp_path):
+    """测试在仓库根目录用 python src/cli.py 运行命令行入口"""
+    source = make_archive(tmp_path / "outer.zip", {"v.mp4": b"V" * 100}, ("top.mp4", b"T" * 100))
+    root = os.path.join(os.path.dirname(__file__), '..')
+
+    usage = subprocess.run([sys.executable, os.path.join("src", "cli.py"), "--help"], cwd=root,
+                           capture_output=True, text=True, encoding='utf-8')
+    assert usage.returncode == 0
+    assert usage.stdout.startswith("usage: python src/cli.py")
+
+    result = subprocess.run([sys.executable, os.path.join("src", "cli.py"), "-o", str(tmp_path / "out"),
+                             "--data-dir", str(tmp_path / "data"), "-q", source],
+                            cwd=root, capture_output=True, text=True, encoding='utf-8')
+    assert result.returncode == 0
+    assert sorted(os.path.basename(path) for path in result.stdout.split()) == ["top.mp4", "v.mp4"]
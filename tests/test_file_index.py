@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试临时目录文件索引
+"""
+
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+from file_index import TempTreeIndex, detect_kind
+
+def test_detect_kind():
+    """测试按文件名判断类型"""
+    assert detect_kind("a/Video.MP4") == 'mp4'
+    assert detect_kind("x.tar.gz") == 'archive'
+    assert detect_kind("x.7z") == 'archive'
+    assert detect_kind("cover.jpg") == 'other'
+
+def test_incremental_index(tmp_path):
+    """测试增量扫描、重命名和删除"""
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "sub" / "a.mp4").write_bytes(b"x" * 10)
+    (tmp_path / "b.666z").write_bytes(b"y" * 5)
+    
+    index = TempTreeIndex(str(tmp_path))
+    assert len(index) == 2
+    assert [entry.size for entry in index.mp4_files()] == [10]
+    assert index.archives() == []
+    
+    old_path = str(tmp_path / "b.666z")
+    new_path = str(tmp_path / "b.7z")
+    os.rename(old_path, new_path)
+    index.rename(old_path, new_path)
+    assert [entry.path for entry in index.archives()] == [new_path]
+    
+    # 只扫描新写入的目录
+    extracted = tmp_path / "b_extracted"
+    extracted.mkdir()
+    (extracted / "c.mp4").write_bytes(b"z")
+    added = index.add_tree(str(extracted))
+    assert [entry.name for entry in added] == ["c.mp4"]
+    assert index.add_tree(str(tmp_path)) == []
+    assert [entry.name for entry in index.files_under(str(extracted))] == ["c.mp4"]
+    assert index.total_size() == 16
+    
+    index.remove_tree(str(extracted))
+    assert len(index) == 2
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试压缩包指纹和增量处理
+"""
+
+import sys
+import os
+import shutil
+import zipfile
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+from fingerprints import ArchiveFingerprintStore
+from engine import EngineConfig, ExtractionEngine
+
+def make_zip(path, videos):
+    with zipfile.ZipFile(path, 'w') as zf:
+        for name, data in videos.items():
+            zf.writestr(name, data)
+    return str(path)
+
+def test_fingerprint_store_matches_path_and_content(tmp_path):
+    """测试按路径/大小/修改时间匹配，以及换了路径的同一个压缩包按快速摘要匹配"""
+    archive = make_zip(tmp_path / "a.zip", {"a.mp4": b"A" * 100})
+    store_path = str(tmp_path / "fingerprints.json")
+    store = ArchiveFingerprintStore(store_path)
+    store.record(store.identify(archive), [str(tmp_path / "out" / "a.mp4")])
+    store.save()
+
+    store = ArchiveFingerprintStore(store_path)
+    entry, same_path = store.find(store.identify(archive))
+    assert same_path and entry["outputs"] == [str(tmp_path / "out" / "a.mp4")]
+
+    copy = str(tmp_path / "renamed.bin")
+    shutil.copyfile(archive, copy)
+    entry, same_path = store.find(store.identify(copy))
+    assert entry is not None and not same_path
+
+    # 关闭快速摘要时只能按路径识别
+    store.use_hash = False
+    assert store.find(store.identify(copy)) == (None, False)
+
+    make_zip(tmp_path / "a.zip", {"a.mp4": b"B" * 300})
+    store.use_hash = True
+    assert store.find(store.identify(archive)) == (None, False)
+
+def test_incremental_skip_and_redeliver(tmp_path):
+    """测试增量处理：跳过已处理的压缩包、重新输出以前的MP4、同一批次中重复的压缩包只处理一次"""
+    first = make_zip(tmp_path / "a.zip", {"a.mp4": b"A" * 100})
+    second = str(tmp_path / "copy_of_a.zip")
+    shutil.copyfile(first, second)
+    options = dict(data_dir=str(tmp_path / "data"), check_scratch_space=False)
+
+    result = ExtractionEngine(EngineConfig(str(tmp_path / "out1"), **options),
+                              log=lambda message: None).run([first, second])
+    assert len(result.jobs) == 1
+    assert [os.path.basename(path) for path in result.mp4_files] == ["a.mp4"]
+    previous_outputs = result.mp4_files
+
+    result = ExtractionEngine(EngineConfig(str(tmp_path / "out2"), incremental=True, **options),
+                              log=lambda message: None).run([second])
+    assert [job.reused for job in result.jobs] == [True]
+    assert result.mp4_files == previous_outputs
+    assert not os.listdir(result.unified_output_dir)
+
+    result = ExtractionEngine(EngineConfig(str(tmp_path / "out3"), incremental=True, redeliver_processed=True,
+                                           **options), log=lambda message: None).run([first])
+    assert [job.reused for job in result.jobs] == [True]
+    assert os.listdir(result.unified_output_dir) == ["a.mp4"]
+    with open(result.mp4_files[0], 'rb') as f:
+        assert f.read() == b"A" * 100
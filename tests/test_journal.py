@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试批次日志和断点续处理
+"""
+
+import sys
+import os
+import zipfile
+import pytest
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+from journal import BatchJournal, JournalLockedError
+from engine import EngineConfig, ExtractionEngine
+
+def make_zip(path, videos):
+    with zipfile.ZipFile(path, 'w') as zf:
+        for name, data in videos.items():
+            zf.writestr(name, data)
+    return str(path)
+
+def test_journal_state_and_partial_line(tmp_path):
+    """测试日志重建状态，中断时写了一半的最后一行被忽略"""
+    path = str(tmp_path / "journal.jsonl")
+    journal = BatchJournal(path).open()
+    journal.append("batch_started", unified_output_dir="/out/batch")
+    journal.append("started", "/src/a.zip", temp_dir="/tmp/temp_0_a", output_dir="/out/batch")
+    journal.append("output", "/src/a.zip", path="/out/batch/a.mp4")
+    journal.append("delivered", "/src/a.zip", outputs=["/out/batch/a.mp4"])
+    journal.append("finished", "/src/a.zip", success=True, failed_reasons={})
+    journal.append("started", "/src/b.zip", temp_dir="/tmp/temp_1_b", output_dir="/out/batch")
+    journal.close()
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write('{"stage": "output", "sou')
+
+    state = BatchJournal.load(path)
+    assert state.unified_output_dir == "/out/batch"
+    a, b = state.entry("/src/a.zip"), state.entry("/src/b.zip")
+    assert a.finished and a.success and a.outputs == ["/out/batch/a.mp4"]
+    assert b.interrupted and b.stage == "started" and b.temp_dir == "/tmp/temp_1_b"
+    assert BatchJournal.load(str(tmp_path / "missing.jsonl")) is None
+
+    # 追加时写了一半的记录单独占一行
+    journal = BatchJournal(path).open(append=True)
+    journal.append("finished", "/src/b.zip", success=False, failed_reasons={"/src/b.zip": "x"})
+    journal.close()
+    assert BatchJournal.load(path).entry("/src/b.zip").finished
+
+def test_resume_skips_completed_and_redoes_interrupted(tmp_path, monkeypatch):
+    """测试进程中断后继续处理：已完成的压缩包跳过，中断的压缩包清理后重做"""
+    sources = [make_zip(tmp_path / "a.zip", {"a1.mp4": b"A" * 100}),
+               make_zip(tmp_path / "b.zip", {"b1.mp4": b"B" * 200, "b2.mp4": b"C" * 300})]
+    config = EngineConfig(str(tmp_path / "out"), data_dir=str(tmp_path / "data"),
+                          max_workers=1, check_scratch_space=False)
+
+    engine = ExtractionEngine(config, log=lambda message: None)
+    deliver_file = engine.deliver_file
+    calls = []
+
+    def crash_on_third(source_path, output_path):
+        calls.append(source_path)
+        if len(calls) == 3:
+            raise KeyboardInterrupt  # 模拟处理 b.zip 的第二个MP4时进程被终止
+        return deliver_file(source_path, output_path)
+
+    monkeypatch.setattr(engine, "deliver_file", crash_on_third)
+    with pytest.raises(KeyboardInterrupt):
+        engine.run(sources)
+    batch_dir = engine.unified_output_dir
+    assert len(os.listdir(batch_dir)) == 3  # a1、b1 和 b2 的占位文件
+
+    config.resume = True
+    result = ExtractionEngine(config, log=lambda message: None).run(sources)
+
+    assert result.unified_output_dir == batch_dir
+    assert sorted(os.path.basename(path) for path in result.mp4_files) == ["a1.mp4", "b1.mp4", "b2.mp4"]
+    assert sorted(os.listdir(batch_dir)) == ["a1.mp4", "b1.mp4", "b2.mp4"]
+    assert [job.reused for job in result.jobs] == [True, False]
+    assert result.successful_count == 2
+    assert not [name for name in os.listdir(config.output_dir) if name.startswith("temp_")]
+
+def test_concurrent_batches_do_not_share_journal(tmp_path):
+    """测试不同输出目录的批次使用不同的日志，同一个日志被占用时另一个批次不会清空它"""
+    config_a = EngineConfig(str(tmp_path / "out_a"), data_dir=str(tmp_path / "data"))
+    config_b = EngineConfig(str(tmp_path / "out_b"), data_dir=str(tmp_path / "data"))
+    assert config_a.journal_path != config_b.journal_path
+    assert os.path.dirname(config_a.journal_path) == str(tmp_path / "data")
+
+    running = BatchJournal(config_a.journal_path).open()
+    running.append("batch_started", unified_output_dir="/out/batch")
+    running.append("started", "/src/a.zip", temp_dir="/tmp/temp_0_a", output_dir="/out/batch")
+    with pytest.raises(JournalLockedError):
+        BatchJournal(config_a.journal_path).open()
+
+    # 另一个批次输出到同一个目录：不写日志，正常处理
+    (tmp_path / "out_a").mkdir()
+    source = make_zip(tmp_path / "c.zip", {"c.mp4": b"C" * 100})
+    messages = []
+    result = ExtractionEngine(config_a, log=messages.append).run([source])
+    assert [os.path.basename(path) for path in result.mp4_files] == ["c.mp4"]
+    assert any("正被另一个批次使用" in message for message in messages)
+    running.close()
+
+    state = BatchJournal.load(config_a.journal_path)
+    assert state.entry("/src/a.zip").interrupted
+    assert state.entry(source) is None
+    BatchJournal(config_a.journal_path).open(append=True).close()  # 关闭后可以再次打开
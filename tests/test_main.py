@@ -33,7 +33,7 @@ def test_smart_format_detection():
             print(f"\n测试文件: {file_path}")
             
             # 测试格式检测
-            detected_format = app.detect_and_fix_format(file_path)
+            detected_format = app.detect_archive_format(file_path)
             print(f"检测到的格式: {detected_format}")
             
             # 测试智能格式检测和转换（该方法不接受参数，是批量处理方法）
@@ -75,6 +75,64 @@ def test_failed_file_tracking():
     print(f"失败文件列表: {app.failed_files}")
     print(f"失败原因: {app.failed_reasons}")
 
+def test_drain_log_queue():
+    """测试日志队列按批次取出"""
+    import queue
+    log_queue = queue.Queue()
+    for i in range(5):
+        log_queue.put(f"line {i}\n")
+    
+    assert DesktopAutomationTool.drain_log_queue(log_queue, 3) == ["line 0\n", "line 1\n", "line 2\n"]
+    assert DesktopAutomationTool.drain_log_queue(log_queue, 3) == ["line 3\n", "line 4\n"]
+    assert DesktopAutomationTool.drain_log_queue(log_queue, 3) == []
+
+def test_call_on_ui_thread():
+    """测试工作线程通过界面操作队列在GUI线程中执行函数并等待结果（不需要Tk）"""
+    import queue
+    import threading
+    
+    class FakeRoot:
+        def __init__(self):
+            self.scheduled = []
+        
+        def after(self, delay, callback, *args):
+            self.scheduled.append((callback, args))
+    
+    app = DesktopAutomationTool.__new__(DesktopAutomationTool)
+    app.ui_queue = queue.Queue()
+    app.ui_thread = threading.current_thread()
+    app.root = FakeRoot()
+    ui_threads = []
+    
+    def ask(name):
+        ui_threads.append(threading.current_thread())
+        if name == "bad":
+            raise ValueError(name)
+        return name.upper()
+    
+    results = []
+    
+    def worker():
+        results.append(app.call_on_ui_thread(ask, "pwd"))
+        try:
+            app.call_on_ui_thread(ask, "bad")
+        except ValueError as e:
+            results.append(str(e))
+    
+    thread = threading.Thread(target=worker)
+    thread.start()
+    while thread.is_alive():
+        # 模拟GUI线程的定时泵
+        app.run_ui_callbacks()
+        scheduled, app.root.scheduled = app.root.scheduled, []
+        for callback, args in scheduled:
+            callback(*args)
+        thread.join(0.01)
+    
+    assert results == ["PWD", "bad"]
+    assert ui_threads == [threading.current_thread()] * 2
+    assert app.call_on_ui_thread(ask, "direct") == "DIRECT"  # 在GUI线程中直接执行
+
 if __name__ == "__main__":
     print("开始测试新架构功能...")
     
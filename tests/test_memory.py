@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试解压内存预算、固定缓冲区复制和内存统计
+"""
+
+import sys
+import os
+import io
+import time
+import zipfile
+import tempfile
+import threading
+import pytest
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+from memory import MemoryBudget, sample_rss
+from backends import Py7zrBackend
+from engine import EngineConfig, ExtractionEngine
+
+def test_memory_budget_waits_and_borrows():
+    """测试预算不足时 reserve 等待、borrow 得到0，超过全部预算的请求单独运行"""
+    budget = MemoryBudget(100)
+    entered = threading.Event()
+    order = []
+
+    def second():
+        with budget.reserve(60):
+            order.append("second")
+        entered.set()
+
+    with budget.reserve(60):
+        thread = threading.Thread(target=second)
+        thread.start()
+        time.sleep(0.1)
+        assert not entered.is_set()  # 60 + 60 > 100，等待
+        with budget.borrow(50) as granted:
+            assert granted == 0
+        with budget.borrow(40) as granted:
+            assert granted == 40
+        order.append("first")
+    thread.join(timeout=5)
+    assert order == ["first", "second"]
+    assert budget.used == 0
+    assert budget.peak == 100
+
+    with budget.reserve(500) as granted:  # 没有其他占用时超额请求也能运行
+        assert granted == 500
+
+    unlimited = MemoryBudget()
+    with unlimited.reserve(10 ** 12) as granted, unlimited.borrow(10 ** 12) as borrowed:
+        assert granted == 0 and borrowed == 10 ** 12
+
+def test_copy_stream_reuses_fixed_buffer(tmp_path):
+    """测试分块复制使用固定大小的缓冲区，每块回报一次字节数"""
+    config = EngineConfig(str(tmp_path / "out"), data_dir=str(tmp_path / "data"), copy_buffer_size=4096)
+    engine = ExtractionEngine(config, log=lambda message: None)
+    reads = []
+
+    class Source(io.BytesIO):
+        def readinto(self, buffer):
+            reads.append(len(buffer))
+            return super().readinto(buffer)
+
+    data = os.urandom(10000)
+    target = io.BytesIO()
+    engine.copy_stream(Source(data), target)
+    assert target.getvalue() == data
+    assert set(reads) == {4096}
+    assert engine.copy_buffer() is engine.copy_buffer()
+
+def test_engine_with_memory_limit(tmp_path, monkeypatch):
+    """测试有内存上限时7z和内部ZIP都能正常解压，并记录每个压缩包的峰值内存"""
+    py7zr = pytest.importorskip("py7zr")
+    seven_zip = tmp_path / "a.7z"
+    with py7zr.SevenZipFile(seven_zip, 'w') as archive:
+        archive.writestr(b"V" * 50000, "video/a.mp4")
+    with Py7zrBackend().open(str(seven_zip)) as archive:
+        estimate = Py7zrBackend.decoder_memory(archive)
+    assert 50000 <= estimate < 1024 * 1024  # 字典和输出块都不超过解压后的大小
+
+    inner = io.BytesIO()
+    with zipfile.ZipFile(inner, 'w') as inner_zip:
+        inner_zip.writestr("b.mp4", os.urandom(3000))  # 不可压缩，内部ZIP大于内存上限
+    with zipfile.ZipFile(tmp_path / "b.zip", 'w') as outer_zip:
+        outer_zip.writestr("inner.zip", inner.getvalue())
+
+    config = EngineConfig(str(tmp_path / "out"), data_dir=str(tmp_path / "data"), check_scratch_space=False,
+                          benchmark_backends=False, backend_preferences={"7z": ["py7zr"]},
+                          memory_limit=1024, max_workers=2)  # 小于内部ZIP：改用磁盘缓冲
+    engine = ExtractionEngine(config, log=lambda message: None)
+    spool_files = []
+
+    def recording_spool_file(max_size):
+        spool = ExtractionEngine.spool_file(max_size)
+        spool_files.append((max_size, spool))
+        return spool
+
+    monkeypatch.setattr(engine, "spool_file", recording_spool_file)
+    result = engine.run([str(seven_zip), str(tmp_path / "b.zip")])
+
+    assert sorted(os.path.basename(path) for path in result.mp4_files) == ["a.mp4", "b.mp4"]
+    assert engine.memory_budget.used == 0
+    # 预算不足：内部ZIP直接缓冲到磁盘上的临时文件
+    assert [max_size for max_size, _ in spool_files] == [0]
+    assert not isinstance(spool_files[0][1], tempfile.SpooledTemporaryFile)
+    assert engine.memory_budget.peak >= estimate
+    if sample_rss() is not None:
+        assert all(job.peak_rss > 0 for job in result.jobs)
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试Prometheus文本格式的运行指标
+"""
+
+import sys
+import os
+import io
+import zipfile
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+from metrics import Counter, Histogram, ProcessingMetrics
+from engine import EngineConfig, ExtractionEngine
+
+def parse_samples(text):
+    """解析指标文件中的样本行：{名称和标签: 值}"""
+    samples = {}
+    for line in text.splitlines():
+        if line and not line.startswith('#'):
+            name, value = line.rsplit(' ', 1)
+            samples[name] = float(value)
+    return samples
+
+def test_metric_rendering(tmp_path):
+    """测试计数器和带标签的直方图的文本格式，以及限频的原子写入"""
+    counter = Counter("archives_processed_total", "处理完成的源压缩包数量")
+    counter.inc()
+    counter.inc(2)
+    assert counter.render() == [
+        "# HELP desktop_automation_archives_processed_total 处理完成的源压缩包数量",
+        "# TYPE desktop_automation_archives_processed_total counter",
+        "desktop_automation_archives_processed_total 3",
+    ]
+
+    histogram = Histogram("stage_duration_seconds", "各处理阶段的耗时（秒）", (0.1, 1), ("stage",))
+    histogram.observe(0.05, "extract")
+    histogram.observe(0.5, "extract")
+    histogram.observe(2.0, "extract")
+    samples = parse_samples("\n".join(histogram.render()))
+    assert samples['desktop_automation_stage_duration_seconds_bucket{stage="extract",le="0.1"}'] == 1
+    assert samples['desktop_automation_stage_duration_seconds_bucket{stage="extract",le="1"}'] == 2
+    assert samples['desktop_automation_stage_duration_seconds_bucket{stage="extract",le="+Inf"}'] == 3
+    assert samples['desktop_automation_stage_duration_seconds_count{stage="extract"}'] == 3
+    assert samples['desktop_automation_stage_duration_seconds_sum{stage="extract"}'] == 2.55
+
+    now = [100.0]
+    path = tmp_path / "textfile" / "desktop_automation.prom"
+    metrics = ProcessingMetrics(str(path), interval=15.0, clock=lambda: now[0])
+    metrics.scratch_add(300)
+    metrics.scratch_release(300)
+    metrics.scratch_add(100)
+    assert metrics.write()
+    assert not metrics.write()  # 不到 interval 秒
+    now[0] += 15
+    assert metrics.write()
+    samples = parse_samples(path.read_text(encoding='utf-8'))
+    assert samples["desktop_automation_scratch_high_water_bytes"] == 300
+    assert samples["desktop_automation_scratch_bytes"] == 100
+    assert os.listdir(path.parent) == ["desktop_automation.prom"]
+
+def test_engine_writes_metrics(tmp_path):
+    """测试处理批次后指标文件包含压缩包、字节数、MP4和阶段耗时"""
+    inner = io.BytesIO()
+    with zipfile.ZipFile(inner, 'w') as inner_zip:
+        inner_zip.writestr("b.mp4", b"B" * 300)
+    with zipfile.ZipFile(tmp_path / "a.zip", 'w') as outer_zip:
+        outer_zip.writestr("a.mp4", b"A" * 200)
+        outer_zip.writestr("inner.zip", inner.getvalue())
+    (tmp_path / "broken.zip").write_bytes(b"PK\x03\x04 not really a zip")
+
+    path = tmp_path / "metrics.prom"
+    config = EngineConfig(str(tmp_path / "out"), data_dir=str(tmp_path / "data"), check_scratch_space=False,
+                          max_workers=1, metrics_path=str(path))
+    engine = ExtractionEngine(config, log=lambda message: None)
+    engine.run([str(tmp_path / "a.zip"), str(tmp_path / "broken.zip")])
+
+    samples = parse_samples(path.read_text(encoding='utf-8'))
+    assert samples["desktop_automation_archives_processed_total"] == 1
+    assert samples["desktop_automation_archives_failed_total"] == 1
+    assert samples["desktop_automation_mp4_delivered_total"] == 2
+    assert samples["desktop_automation_mp4_delivered_bytes_total"] == 500
+    assert samples["desktop_automation_bytes_decompressed_total"] >= 500
+    assert samples["desktop_automation_scratch_high_water_bytes"] >= 500
+    assert samples["desktop_automation_scratch_bytes"] == 0
+    assert samples["desktop_automation_batches_total"] == 1
+    assert samples["desktop_automation_batches_running"] == 0
+    assert samples['desktop_automation_batch_archives{slot="0",state="completed"}'] == 2
+    assert samples['desktop_automation_stage_duration_seconds_count{stage="archive"}'] == 2
+    assert samples['desktop_automation_stage_duration_seconds_count{stage="deliver_mp4_files"}'] == 1
+
+    # 计数器在同一个引擎的多个批次之间累加
+    engine.run([str(tmp_path / "a.zip")])
+    samples = parse_samples(path.read_text(encoding='utf-8'))
+    assert samples["desktop_automation_archives_processed_total"] == 2
+    assert samples["desktop_automation_batches_total"] == 2
+
+def test_batch_gauges_per_slot(tmp_path):
+    """测试监视模式下同时运行的批次按 slot 分别记录批次量表，不互相覆盖"""
+    clock = iter(range(100, 200)).__next__
+    metrics = ProcessingMetrics(str(tmp_path / "metrics.prom"), clock=clock)
+    metrics.start_batch(3, "0")
+    metrics.scratch_add(500)
+    metrics.start_batch(5, "1")
+    metrics.finish_batch(7.0, "1")
+    metrics.scratch_release(500)
+    metrics.write(force=True)
+
+    samples = parse_samples(open(metrics.path, encoding='utf-8').read())
+    assert samples['desktop_automation_batch_archives{slot="0",state="total"}'] == 3
+    assert samples['desktop_automation_batch_archives{slot="1",state="total"}'] == 5
+    assert samples['desktop_automation_batch_start_timestamp_seconds{slot="0"}'] == 100
+    assert samples['desktop_automation_batch_start_timestamp_seconds{slot="1"}'] > 100
+    assert samples['desktop_automation_last_batch_duration_seconds{slot="1"}'] == 7
+    assert samples["desktop_automation_batches_running"] == 1
+    # 第二个批次开始时不清掉第一个批次的临时空间最高值
+    assert samples["desktop_automation_scratch_high_water_bytes"] == 500
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试密码命中统计存储
+"""
+
+import sys
+import os
+import stat
+import pytest
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+from password_stats import PasswordStatsStore
+
+def test_make_keys():
+    """测试统计键生成（数字替换为#）"""
+    keys = PasswordStatsStore.make_keys("/tmp/work/Video_2024_01.part3.7z", "/data/inbox/batch.zip")
+    assert keys[0] == "name:video_#_#"
+    assert keys[1].startswith("dir:")
+
+def test_rank_by_hit_rate(tmp_path):
+    """测试按命中率排序并跨实例持久化"""
+    store_path = str(tmp_path / "stats.json")
+    store = PasswordStatsStore(store_path)
+    keys = PasswordStatsStore.make_keys("movie_01.7z")
+    
+    candidates = ["chinatkclub.com", "123456", "admin"]
+    assert store.rank(candidates, keys) == candidates
+    
+    store.record_success(keys, "admin")
+    store.record_success(keys, "manual-pwd")
+    store.record_success(keys, "admin")
+    
+    # 重新加载，模拟重启
+    reloaded = PasswordStatsStore(store_path)
+    ranked = reloaded.rank(candidates, PasswordStatsStore.make_keys("movie_02.7z"))
+    assert ranked[0] == "admin"
+    assert ranked[1] == "manual-pwd"
+    assert ranked[2:] == ["chinatkclub.com", "123456"]
+
+def test_corrupt_store_is_ignored(tmp_path):
+    """测试统计文件损坏时从空数据开始"""
+    store_path = tmp_path / "stats.json"
+    store_path.write_text("{not json", encoding="utf-8")
+    store = PasswordStatsStore(str(store_path))
+    assert store.rank(["a", "b"], ["name:x"]) == ["a", "b"]
+
+@pytest.mark.skipif(os.name != 'posix', reason="只在POSIX系统上检查文件权限")
+def test_store_is_private(tmp_path):
+    """测试统计文件（明文密码）只有当前用户可以读写，残留的临时文件不会沿用原来的权限"""
+    store_path = tmp_path / "stats.json"
+    stale = tmp_path / "stats.json.tmp"
+    stale.write_text("{}")
+    stale.chmod(0o644)
+    old_umask = os.umask(0o022)
+    try:
+        PasswordStatsStore(str(store_path)).record_success(["name:a"], "secret")
+    finally:
+        os.umask(old_umask)
+
+    assert stat.S_IMODE(os.stat(store_path).st_mode) == 0o600
+    assert not stale.exists()
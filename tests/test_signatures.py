@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试文件头格式识别
+"""
+
+import sys
+import os
+import io
+import gzip
+import tarfile
+import zipfile
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+from signatures import FormatSniffer, sniff_header
+
+def make_tar_bytes():
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode='w') as archive:
+        info = tarfile.TarInfo("a.mp4")
+        info.size = 3
+        archive.addfile(info, io.BytesIO(b"abc"))
+    return buffer.getvalue()
+
+def test_sniff_header():
+    """测试各种压缩格式的魔数"""
+    assert sniff_header(b"PK\x03\x04rest") == 'zip'
+    assert sniff_header(b"Rar!\x1a\x07\x01\x00") == 'rar'
+    assert sniff_header(b"7z\xbc\xaf\x27\x1c\x00\x04") == '7z'
+    assert sniff_header(b"\x1f\x8b\x08") == 'gzip'
+    assert sniff_header(b"BZh91AY") == 'bzip2'
+    assert sniff_header(b"\xfd7zXZ\x00\x00") == 'xz'
+    assert sniff_header(b"\x28\xb5\x2f\xfd\x00") == 'zstd'
+    assert sniff_header(make_tar_bytes()[:512]) == 'tar'
+    assert sniff_header(b"\x00\x00\x00\x18ftypmp42") is None
+
+def test_sniffer_ignores_extension_and_caches(tmp_path):
+    """测试按内容识别（不看扩展名），结果缓存，文件变化后重新识别"""
+    disguised = tmp_path / "video.666z"
+    with zipfile.ZipFile(disguised, 'w') as archive:
+        archive.writestr("a.mp4", b"x")
+    tar_gz = tmp_path / "noext"
+    tar_gz.write_bytes(gzip.compress(make_tar_bytes()))
+    plain_gz = tmp_path / "notes.gz"
+    plain_gz.write_bytes(gzip.compress(b"just text" * 100))
+
+    sniffer = FormatSniffer()
+    assert sniffer.identify(str(disguised)) == ('zip', 'zip')
+    assert sniffer.identify(str(tar_gz)) == ('gzip', 'tar')
+    # 单个文件的gzip流不是TAR，没有可用的解压后端
+    assert sniffer.identify(str(plain_gz)) == ('gzip', None)
+    assert sniffer.identify(str(tmp_path / "missing")) == (None, None)
+
+    # 缓存命中时不再读取文件
+    os.chmod(disguised, 0)
+    try:
+        assert sniffer.archive_format(str(disguised)) == 'zip'
+    finally:
+        os.chmod(disguised, 0o644)
+
+    disguised.write_bytes(make_tar_bytes() + b"\x00" * 100)
+    assert sniffer.archive_format(str(disguised)) == 'tar'
+
+def test_sniffer_forget_tree(tmp_path):
+    """测试按目录删除缓存，不影响目录外（包括同名前缀目录）的文件"""
+    sniffer = FormatSniffer()
+    paths = []
+    for relative in ("temp_1/a.zip", "temp_1/sub/b.zip", "temp_10/c.zip", "d.zip"):
+        path = tmp_path / relative
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with zipfile.ZipFile(path, 'w') as archive:
+            archive.writestr("a.mp4", b"x")
+        paths.append(str(path))
+        sniffer.identify(str(path))
+
+    sniffer.forget_tree(str(tmp_path / "temp_1"))
+    assert sorted(sniffer._cache) == sorted(paths[2:])
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试处理阶段追踪和Chrome trace导出
+"""
+
+import sys
+import os
+import io
+import json
+import zipfile
+import threading
+import pytest
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+from tracing import Tracer
+from engine import EngineConfig, ExtractionEngine
+
+def test_tracer_chrome_trace_format():
+    """测试span导出为Chrome trace完整事件，异常记录在args中"""
+    now = [10.0]
+    tracer = Tracer(clock=lambda: now[0])
+    with tracer.span("extract", archive="a.zip", bytes_in=100) as span:
+        now[0] += 0.5
+        span.args["bytes_out"] = 300
+    with pytest.raises(ValueError):
+        with tracer.span("deliver"):
+            now[0] += 0.25
+            raise ValueError("磁盘已满")
+
+    events = tracer.to_chrome_trace()["traceEvents"]
+    spans = [event for event in events if event["ph"] == "X"]
+    assert [(event["name"], event["ts"], event["dur"]) for event in spans] == [
+        ("extract", 0.0, 500000.0), ("deliver", 500000.0, 250000.0)]
+    assert spans[0]["args"] == {"archive": "a.zip", "bytes_in": 100, "bytes_out": 300}
+    assert spans[1]["args"]["error"] == "磁盘已满"
+    assert spans[0]["tid"] == threading.get_ident()
+    assert any(event["ph"] == "M" and event["name"] == "thread_name" for event in events)
+
+    disabled = Tracer(enabled=False)
+    with disabled.span("extract") as span:
+        assert span is None
+    assert disabled.spans == []
+
+def test_engine_writes_trace_per_batch(tmp_path):
+    """测试开启追踪时每个批次导出一个包含各阶段span的trace文件"""
+    inner = io.BytesIO()
+    with zipfile.ZipFile(inner, 'w') as inner_zip:
+        inner_zip.writestr("b.mp4", b"B" * 300)
+    with zipfile.ZipFile(tmp_path / "a.zip", 'w') as outer_zip:
+        outer_zip.writestr("a.mp4", b"A" * 200)
+        outer_zip.writestr("inner.zip", inner.getvalue())
+
+    trace_dir = tmp_path / "traces"
+    config = EngineConfig(str(tmp_path / "out"), data_dir=str(tmp_path / "data"),
+                          check_scratch_space=False, stream_nested_archives=False, trace_dir=str(trace_dir))
+    ExtractionEngine(config, log=lambda message: None).run([str(tmp_path / "a.zip")])
+
+    traces = os.listdir(trace_dir)
+    assert len(traces) == 1
+    with open(trace_dir / traces[0], 'r', encoding='utf-8') as f:
+        spans = {event["name"]: event for event in json.load(f)["traceEvents"] if event["ph"] == "X"}
+    assert {"archive", "extract_single_archive", "process_internal_archives", "detect_formats",
+            "extract_archive_file", "deliver_mp4_files", "cleanup_temp", "final_cleanup"} <= set(spans)
+    assert spans["extract_single_archive"]["args"]["archive"] == "a.zip"
+    assert spans["extract_single_archive"]["args"]["bytes_in"] == os.path.getsize(tmp_path / "a.zip")
+    assert spans["extract_archive_file"]["args"]["archive"] == "inner.zip"
+    assert spans["deliver_mp4_files"]["args"]["bytes_out"] == 500
+
+    # 未开启追踪时不写文件
+    config.trace_dir = None
+    ExtractionEngine(config, log=lambda message: None).run([str(tmp_path / "a.zip")])
+    assert len(os.listdir(trace_dir)) == 1
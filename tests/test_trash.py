@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试临时目录的后台删除
+"""
+
+import sys
+import os
+import shutil
+import zipfile
+import threading
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+from trash import TrashBin
+from engine import EngineConfig, ExtractionEngine
+
+def test_trash_bin_discard_and_wait(tmp_path):
+    """测试目录改名移入回收区后在后台删除，删除失败在 wait() 中返回"""
+    release = threading.Event()
+    deleted = []
+
+    def slow_delete(path):
+        release.wait(5)
+        if path.endswith("_1"):
+            raise OSError("设备忙")
+        shutil.rmtree(path)
+        deleted.append(os.path.basename(path))
+
+    trash = TrashBin(str(tmp_path / ".trash"), workers=2, delete=slow_delete)
+    for name in ("temp_0_a", "temp_1_b"):
+        (tmp_path / name / "sub").mkdir(parents=True)
+        (tmp_path / name / "sub" / "file.bin").write_bytes(b"x" * 100)
+        assert trash.discard(str(tmp_path / name))
+        assert not (tmp_path / name).exists()  # 立即移走
+    assert not trash.discard(str(tmp_path / "missing"))
+    assert trash.pending == 2
+
+    release.set()
+    count, errors = trash.close()
+    assert count == 1
+    assert [os.path.basename(path) for path, _ in errors] == [f"temp_1_b_{os.getpid()}_1"]
+    assert deleted == [f"temp_0_a_{os.getpid()}_0"]
+
+def test_engine_deletes_temp_dirs_in_background(tmp_path):
+    """测试每个压缩包的临时目录在后台线程中删除，批次结束时全部删除完成"""
+    sources = []
+    for i in range(3):
+        path = tmp_path / f"a{i}.zip"
+        with zipfile.ZipFile(path, 'w') as archive:
+            archive.writestr(f"v{i}.mp4", b"V" * (100 + i))
+            archive.writestr(f"sub/v{i}_2.mp4", b"W" * (200 + i))
+        sources.append(str(path))
+
+    threads = []
+    scratch = tmp_path / "scratch"
+    scratch.mkdir()
+    config = EngineConfig(str(tmp_path / "out"), data_dir=str(tmp_path / "data"), check_scratch_space=False,
+                          scratch_dirs=[str(scratch)], max_workers=1, cleanup_workers=1)
+    engine = ExtractionEngine(config, log=lambda message: None)
+    original_delete = engine.delete_trash_tree
+
+    def recording_delete(path):
+        threads.append(threading.current_thread().name)
+        original_delete(path)
+
+    engine.delete_trash_tree = recording_delete
+    result = engine.run(sources)
+
+    assert len(result.mp4_files) == 6
+    assert len(threads) == 3
+    assert all(name.startswith("trash") for name in threads)
+    assert os.listdir(scratch) == []
+    assert engine.trash is None
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试分卷压缩包的识别、分组和拼接读取
+"""
+
+import sys
+import os
+import io
+import zipfile
+import pytest
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+from volumes import ConcatenatedFile, group_volumes, parse_volume, volume_parts
+from engine import EngineConfig, ExtractionEngine
+
+def split_file(data, directory, name, part_size):
+    """按字节切分为 name.001、name.002 ...，返回分卷路径"""
+    paths = []
+    for i in range(0, len(data), part_size):
+        path = directory / f"{name}.{i // part_size + 1:03d}"
+        path.write_bytes(data[i:i + part_size])
+        paths.append(str(path))
+    return paths
+
+def test_parse_and_group_volumes(tmp_path):
+    """测试分卷文件名解析和分组（每组只保留第一个分卷）"""
+    assert parse_volume("movie.7z.001") == ("movie.7z", 1, "numeric")
+    assert parse_volume("Movie.Part02.RAR") == ("movie", 2, "rar")
+    assert parse_volume("movie.mp4") is None
+
+    for name in ("a.7z.001", "a.7z.002", "a.7z.003", "b.part1.rar", "b.part2.rar", "c.zip", "d.7z.002"):
+        (tmp_path / name).write_bytes(b"x")
+    paths = [str(tmp_path / name) for name in ("a.7z.002", "a.7z.001", "b.part2.rar", "c.zip", "d.7z.002")]
+
+    selected, orphans = group_volumes(paths)
+
+    assert [os.path.basename(path) for path in selected] == ["a.7z.001", "b.part1.rar", "c.zip"]
+    assert [os.path.basename(path) for path in orphans] == ["d.7z.002"]
+    assert [os.path.basename(path) for path in volume_parts(str(tmp_path / "a.7z.001"))] == ["a.7z.001", "a.7z.002", "a.7z.003"]
+    assert volume_parts(str(tmp_path / "c.zip")) == [str(tmp_path / "c.zip")]
+
+def test_concatenated_file(tmp_path):
+    """测试拼接文件对象跨分卷读取和随机访问"""
+    data = bytes(range(256)) * 40
+    parts = split_file(data, tmp_path, "blob", 1000)
+
+    with ConcatenatedFile(parts) as source:
+        assert source.read() == data
+        source.seek(995)
+        assert source.read(10) == data[995:1005]
+        source.seek(-6, io.SEEK_END)
+        assert source.read(100) == data[-6:]
+        assert source.tell() == len(data)
+
+def test_engine_extracts_volume_set_once(tmp_path):
+    """测试分卷ZIP和嵌套的分卷7z只解压一次，不在磁盘上合并分卷"""
+    py7zr = pytest.importorskip("py7zr")
+    seven_zip = io.BytesIO()
+    with py7zr.SevenZipFile(seven_zip, 'w') as archive:
+        archive.writestr(os.urandom(5000), "inner.mp4")
+    (tmp_path / "nested").mkdir()
+    nested_parts = split_file(seven_zip.getvalue(), tmp_path / "nested", "inner.7z", 2000)
+
+    outer = io.BytesIO()
+    with zipfile.ZipFile(outer, 'w') as archive:
+        archive.writestr("top.mp4", os.urandom(3000))
+        for part in nested_parts:
+            archive.write(part, os.path.basename(part))
+    (tmp_path / "src").mkdir()
+    source_parts = split_file(outer.getvalue(), tmp_path / "src", "outer.zip", 4000)
+    (tmp_path / "out").mkdir()
+    messages = []
+
+    config = EngineConfig(str(tmp_path / "out"), data_dir=str(tmp_path / "data"), benchmark_backends=False,
+                          backend_preferences={'7z': ["py7zr"]})
+    result = ExtractionEngine(config, log=messages.append).run(list(reversed(source_parts)))
+
+    assert len(result.jobs) == 1 and result.jobs[0].source_file == source_parts[0]
+    assert result.failed_files == []
+    assert sorted(os.path.basename(path) for path in result.mp4_files) == ["inner.mp4", "top.mp4"]
+    assert any("后续分卷" in message for message in messages)
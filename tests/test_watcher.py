@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试监视文件夹模式
+"""
+
+import sys
+import os
+import json
+import zipfile
+import threading
+import pytest
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+from watcher import StabilityTracker, WatchDaemon
+from engine import EngineConfig
+
+def test_stability_tracker_waits_until_file_stops_growing(tmp_path):
+    """测试文件大小停止变化 settle_seconds 秒后才交出，之后不变时不再交出"""
+    now = [0.0]
+    tracker = StabilityTracker(settle_seconds=5.0, clock=lambda: now[0])
+    path = tmp_path / "a.zip"
+    path.write_bytes(b"x" * 10)
+    tracker.observe(str(path))
+
+    now[0] = 3.0
+    assert tracker.ready() == []
+    with open(path, 'ab') as f:
+        f.write(b"y" * 10)  # 还在写入，重新计时
+    assert tracker.ready() == []
+    now[0] = 7.0
+    assert tracker.ready() == []
+    now[0] = 8.5
+    assert tracker.ready() == [str(path)]
+
+    tracker.observe(str(path))
+    now[0] = 20.0
+    assert tracker.ready() == []
+
+@pytest.mark.parametrize("use_inotify", [True, False])
+def test_watch_daemon_processes_dropped_archive(tmp_path, use_inotify):
+    """测试放入收件目录的压缩包写完后被自动处理"""
+    inbox = tmp_path / "inbox"
+    inbox.mkdir()
+    config = EngineConfig(str(tmp_path / "out"), data_dir=str(tmp_path / "data"), check_scratch_space=False)
+    results = []
+    done = threading.Event()
+
+    def on_result(result):
+        results.append(result)
+        done.set()
+
+    daemon = WatchDaemon(config, [str(inbox)], settle_seconds=0.2, poll_interval=0.05, workers=2,
+                         use_inotify=use_inotify, on_result=on_result)
+    thread = threading.Thread(target=daemon.run)
+    thread.start()
+    try:
+        (inbox / "notes.txt").write_text("hi")
+        with zipfile.ZipFile(inbox / "drop.zip", 'w') as zf:
+            zf.writestr("clip.mp4", b"M" * 500)
+        assert done.wait(10)
+    finally:
+        daemon.stop()
+        thread.join(10)
+
+    assert [os.path.basename(path) for path in results[0].mp4_files] == ["clip.mp4"]
+    assert os.path.dirname(results[0].mp4_files[0]) == config.output_dir
+    assert daemon.processed_count == 1 and daemon.failed_count == 0
+
+def test_stability_tracker_forgets_removed_files(tmp_path):
+    """测试已交出的文件被删除后，prune() 会清除它的记录"""
+    now = [0.0]
+    tracker = StabilityTracker(settle_seconds=1.0, clock=lambda: now[0])
+    kept = tmp_path / "kept.zip"
+    removed = tmp_path / "removed.zip"
+    for path in (kept, removed):
+        path.write_bytes(b"x" * 10)
+        tracker.observe(str(path))
+    now[0] = 2.0
+    assert sorted(tracker.ready()) == [str(kept), str(removed)]
+
+    removed.unlink()
+    tracker.prune()
+    assert list(tracker.handled) == [str(kept)]
+
+def test_watch_daemon_shares_deduplicator(tmp_path):
+    """测试所有工作线程共用一个去重索引，不同工作线程处理的压缩包之间也去重"""
+    config = EngineConfig(str(tmp_path / "out"), data_dir=str(tmp_path / "data"), check_scratch_space=False,
+                          persistent_dedup=True)
+    daemon = WatchDaemon(config, [str(tmp_path)], workers=2, use_inotify=False)
+    assert daemon.deduplicator is not None
+    assert all(engine.shared_deduplicator is daemon.deduplicator for engine in daemon.engines)
+
+    sources = []
+    for name in ("a", "b"):
+        path = tmp_path / f"{name}.zip"
+        with zipfile.ZipFile(path, 'w') as archive:
+            archive.writestr(f"{name}.mp4", b"M" * 500)
+        sources.append(str(path))
+    first = daemon.engines[0].run([sources[0]])
+    second = daemon.engines[1].run([sources[1]])
+
+    assert len(first.mp4_files) == 1
+    assert second.mp4_files == []  # 与第一个工作线程输出的a.mp4内容相同
+    with open(tmp_path / "data" / "mp4_dedup_index.json", encoding='utf-8') as f:
+        assert len(json.load(f)) == 1
+
+    individual = EngineConfig(str(tmp_path / "out2"), data_dir=str(tmp_path / "data2"), output_mode="individual")
+    assert WatchDaemon(individual, [str(tmp_path)], use_inotify=False).deduplicator is None